@@ -0,0 +1,88 @@
+# Copyright (C) 2018  Gavin Shaughnessy
+#
+# Bit-Store is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" benchmark of DataStore reads with a 10k transaction wallet, comparing snapshot reads
+against the previous implementation (deep-copying all of the data, then the value, on every read).
+run from the root of the directory with: python -m benchmarks.bench_data
+"""
+
+import os
+import copy
+import tempfile
+import timeit
+
+from lib.core import config, data
+
+
+NUM_TRANSACTIONS = 10_000
+NUM_ADDRESSES = 50
+NUMBER = 20
+
+
+def _wallet_values():
+    addresses = [f'address{i}' for i in range(NUM_ADDRESSES)]
+
+    txns = [{
+        'txid': f'{i:064x}',
+        'date': '2018-01-01 00:00:00',
+        'block_height': 500000 + i,
+        'confirmations': NUM_TRANSACTIONS - i,
+        'fee': 1000,
+        'vsize': 225,
+        'inputs': [{'value': 20000, 'address': 'external', 'n': 0}],
+        'outputs': [{'value': 10000, 'address': addresses[i % NUM_ADDRESSES], 'n': 0, 'spent': False,
+                     'script': 'a914' + '00' * 20 + '87'},
+                    {'value': 9000, 'address': 'external', 'n': 1, 'spent': True, 'script': ''}],
+        'wallet_amount': 10000
+    } for i in range(NUM_TRANSACTIONS)]
+
+    return {
+        'TXNS': txns,
+        'UNSPENT_OUTS': [[t['txid'], 0, t['outputs'][0]['address'], '', 10000, 1] for t in txns],
+        'ADDRESSES_RECEIVING': addresses,
+        'DEFAULT_ADDRESSES': {'receiving': addresses, 'change': []},
+        'ADDRESS_WIF_KEYS': {'receiving': {a: 'wif key' for a in addresses}, 'change': {}}
+    }
+
+
+def _legacy_get_value(internal_data, key):
+    """ DataStore.get_value before snapshot reads (for a non-sensitive key) """
+    return copy.deepcopy(copy.deepcopy(internal_data)[key])
+
+
+def bench_reads():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'wallet_data')
+        data_store = data.DataStore.new_data_store(file_path, 'password', data_format=config.STANDARD_DATA_FORMAT,
+                                                   sensitive_keys=config.SENSITIVE_DATA)
+
+        write_time = timeit.timeit(lambda: data_store.write_values(**_wallet_values()), number=1)
+        print(f'{NUM_TRANSACTIONS} transactions written in {write_time:.2f}s')
+
+        # the data as it was kept in memory before (plain dicts and lists)
+        internal_data = data.thaw(data_store._data)
+
+        for key in ('TXNS', 'ADDRESSES_RECEIVING', 'GAP_LIMIT'):
+            assert _legacy_get_value(internal_data, key) == data_store.get_value(key)
+
+            legacy = timeit.timeit(lambda: _legacy_get_value(internal_data, key), number=NUMBER) / NUMBER
+            snapshot = timeit.timeit(lambda: data_store.get_value(key), number=NUMBER * 1000) / (NUMBER * 1000)
+
+            print(f'get_value({key!r}): legacy {legacy * 1e3:.2f}ms, snapshot {snapshot * 1e6:.2f}us '
+                  f'({legacy / snapshot:.0f}x)')
+
+
+if __name__ == '__main__':
+    bench_reads()
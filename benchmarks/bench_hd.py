@@ -0,0 +1,66 @@
+# Copyright (C) 2018  Gavin Shaughnessy
+#
+# Bit-Store is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" benchmarks for address derivation of watch-only (public) wallets.
+run from the root of the directory with: python -m benchmarks.bench_hd
+"""
+
+import time
+import multiprocessing
+
+from lib.core import hd
+
+
+MNEMONIC = 'lion harvest elbow beauty butter spirit park jungle dose need flock hobby'
+GAP_LIMITS = (20, 100, 500)
+
+
+def _time(func, setup, repeat=3):
+    """ returns the best time of repeat calls to func, each with a new object made by setup
+    (HDWallet keeps the addresses it has derived, so a reused object wouldn't derive them again)
+    """
+    times = []
+    for _ in range(repeat):
+        obj = setup()
+        start = time.perf_counter()
+        func(obj)
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def bench_public_derivation():
+    account_xpub = hd.HDWallet.from_mnemonic(MNEMONIC, "49'/0'/0'", gap_limit=1).account_public_key
+
+    # starting the worker processes is a one off cost, so it isn't included in the timings below
+    pool = hd.derivation_pool()
+    start = time.perf_counter()
+    pool.derive([(hd.HDWallet(account_xpub, 'm', gap_limit=1)._external_chain_ck, 'address', True, 0, 1)])
+    print(f'derivation pool startup ({pool.processes} processes): {time.perf_counter() - start:.3f}s\n')
+
+    print(f'{"gap limit":>10} {"serial":>10} {"parallel":>10} {"speedup":>8}')
+    for gap_limit in GAP_LIMITS:
+        serial = _time(hd.HDWallet.addresses,
+                       lambda: hd.HDWallet(account_xpub, 'm', gap_limit=gap_limit, multi_processing=False))
+        parallel = _time(hd.HDWallet.addresses,
+                         lambda: hd.HDWallet(account_xpub, 'm', gap_limit=gap_limit, multi_processing=True))
+
+        print(f'{gap_limit:>10} {serial:>9.3f}s {parallel:>9.3f}s {serial / parallel:>7.2f}x')
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    bench_public_derivation()
+    hd.shutdown_derivation_pool()
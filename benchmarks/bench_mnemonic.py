@@ -0,0 +1,81 @@
+# Copyright (C) 2018  Gavin Shaughnessy
+#
+# Bit-Store is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" micro-benchmark of mnemonic validation, comparing the indexed WORDLIST against
+the previous implementation (reading wordlist.txt and using list.index for every check).
+run from the root of the directory with: python -m benchmarks.bench_mnemonic
+"""
+
+import os
+import hashlib
+import binascii
+import timeit
+
+from lib.core import hd
+
+
+NUMBER = 1000
+
+
+def _legacy_wordlist():
+    wl = os.path.join(os.path.dirname(os.path.realpath(hd.__file__)), 'wordlist.txt')
+    with open(wl, 'r') as word_file:
+        return word_file.read().split()
+
+
+def _legacy_check_mnemonic(mnemonic):
+    """ HDWallet.check_mnemonic before the indexed wordlist was added """
+    wordlist = _legacy_wordlist()
+
+    mnemonic = mnemonic.split(' ')
+
+    if len(mnemonic) not in [12, 15, 18, 21, 24]:
+        return False
+
+    try:
+        idx = map(lambda x: bin(wordlist.index(x))[2:].zfill(11), mnemonic)
+        b = ''.join(idx)
+    except Exception:
+        return False
+
+    len_b = len(b)
+    d = b[:len_b // 33 * 32]
+    h = b[-len_b // 33:]
+    nd = binascii.unhexlify(hex(int(d, 2))[2:].rstrip('L').zfill(len_b // 33 * 8))
+    nh = bin(int(hashlib.sha256(nd).hexdigest(), 16))[2:].zfill(256)[:len_b // 33]
+
+    return h == nh
+
+
+def bench_check_mnemonic():
+    mnemonics = [hd.HDWallet.gen_mnemonic(length) for length in (12, 24)]
+
+    # both implementations have to agree before their timings mean anything
+    assert all(_legacy_check_mnemonic(m) == hd.WORDLIST.check_mnemonic(m) for m in mnemonics)
+
+    for m in mnemonics:
+        legacy = timeit.timeit(lambda: _legacy_check_mnemonic(m), number=NUMBER)
+        indexed = timeit.timeit(lambda: hd.WORDLIST.check_mnemonic(m), number=NUMBER)
+
+        print(f'{len(m.split())} words: legacy {legacy / NUMBER * 1e6:.1f}us, '
+              f'indexed {indexed / NUMBER * 1e6:.1f}us ({legacy / indexed:.1f}x)')
+
+    batch = mnemonics * 50
+    batch_time = timeit.timeit(lambda: hd.WORDLIST.validate_many(batch), number=NUMBER // 10)
+    print(f'validate_many ({len(batch)} mnemonics): {batch_time / (NUMBER // 10) * 1e3:.2f}ms')
+
+
+if __name__ == '__main__':
+    bench_check_mnemonic()
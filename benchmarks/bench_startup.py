@@ -0,0 +1,78 @@
+# Copyright (C) 2018  Gavin Shaughnessy
+#
+# Bit-Store is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" benchmark of opening a 10k transaction wallet's DataStore (as Wallet does), comparing the
+current open path against the previous one, which decrypted and parsed the file twice (once to
+check the password) and always rewrote it afterwards.
+run from the root of the directory with: python -m benchmarks.bench_startup
+"""
+
+import os
+import tempfile
+import timeit
+
+from lib.core import config, data
+from .bench_data import NUM_TRANSACTIONS, _wallet_values
+
+
+NUMBER = 5
+
+
+def _data_store(file_path, **kwargs):
+    data.DataStore._instances.pop(file_path, None)
+
+    return data.DataStore(file_path, 'password', data_format=config.STANDARD_DATA_FORMAT,
+                          sensitive_keys=config.SENSITIVE_DATA, journal=True, segments=config.DATA_SEGMENTS,
+                          **kwargs)
+
+
+def _legacy_open(file_path):
+    """ the DataStore open path before it was streamlined (key derivation, password check,
+    read, then an unconditional rewrite of the file)
+    """
+    data_file = data.DataFile(file_path, data.Crypto('password'), journal=True, segments=config.DATA_SEGMENTS)
+
+    data_file.read()
+    internal_data = data.freeze(data_file.read())
+    data_file.rewrite(internal_data)
+
+    return internal_data
+
+
+def bench_startup():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'wallet_data')
+        data_store = data.DataStore.new_data_store(file_path, 'password', data_format=config.STANDARD_DATA_FORMAT,
+                                                   sensitive_keys=config.SENSITIVE_DATA, journal=True,
+                                                   segments=config.DATA_SEGMENTS)
+        data_store.write_values(**_wallet_values())
+        data_store.data_file.rewrite(data_store._data)
+
+        print(f'{NUM_TRANSACTIONS} transaction wallet, {os.path.getsize(file_path) / 1e6:.1f}MB data file')
+
+        assert _legacy_open(file_path) == _data_store(file_path)._data
+
+        key = timeit.timeit(lambda: data.Crypto('password'), number=NUMBER) / NUMBER
+        legacy = timeit.timeit(lambda: _legacy_open(file_path), number=NUMBER) / NUMBER
+        current = timeit.timeit(lambda: _data_store(file_path), number=NUMBER) / NUMBER
+
+        print(f'key derivation: {key * 1e3:.0f}ms')
+        print(f'open: legacy {legacy * 1e3:.0f}ms, current {current * 1e3:.0f}ms ({legacy / current:.1f}x)')
+
+        data.DataStore._instances.pop(file_path, None)
+
+
+if __name__ == '__main__':
+    bench_startup()
@@ -10,12 +10,11 @@ import hashlib
 import ecdsa
 import struct
 import codecs
-from . import Base58
+from . import Base58, curve
 
 from hashlib import sha256
 from ecdsa.curves import SECP256k1
 from ecdsa.ecdsa import int_to_string, string_to_int
-from ecdsa.numbertheory import square_root_mod_prime as sqrt_mod
 
 MIN_ENTROPY_LEN = 128  # bits
 BIP32_HARDEN = 0x80000000  # choose from hardened set of child keys
@@ -32,6 +31,11 @@ EX_TEST_PUBLIC = [codecs.decode('043587CF', 'hex')]  # Version strings for testn
 
 class BIP32Key(object):
 
+    # keys are created in large numbers during address derivation, so instances
+    # are kept compact. _pub_key and _identifier memoize the serialized public
+    # key and its hash160, which every child derivation and address needs.
+    __slots__ = ('public', 'k', '_K', 'C', 'depth', 'index', 'parent_fpr', 'testnet', '_pub_key', '_identifier')
+
     # Static initializers to create from entropy or external formats
     #
     @staticmethod
@@ -95,15 +99,7 @@ class BIP32Key(object):
             secret = secret[1:]
         else:
             # Recover public curve point from compressed key
-            # Python3 FIX
-            lsb = secret[0] & 1 if type(secret[0]) == int else ord(secret[0]) & 1
-            x = string_to_int(secret[1:])
-            ys = (x ** 3 + 7) % FIELD_ORDER  # y^2 = x^3 + 7 mod p
-            y = sqrt_mod(ys, FIELD_ORDER)
-            if y & 1 != lsb:
-                y = FIELD_ORDER - y
-            point = ecdsa.ellipticcurve.Point(SECP256k1.curve, x, y)
-            secret = ecdsa.VerifyingKey.from_public_point(point, curve=SECP256k1)
+            secret = curve.decompress(secret)
 
         key = BIP32Key(secret=secret, chain=chain, depth=depth, index=child, fpr=fpr, public=is_pubkey,
                        testnet=is_testnet)
@@ -117,8 +113,8 @@ class BIP32Key(object):
         Create a public or private BIP32Key using key material and chain code.
 
         secret   This is the source material to generate the keypair, either a
-                 32-byte string representation of a private key, or the ECDSA
-                 library object representing a public key.
+                 32-byte string representation of a private key, or the affine
+                 (x, y) curve point of a public key.
 
         chain    This is a 32-byte string representation of the chain code
 
@@ -134,11 +130,14 @@ class BIP32Key(object):
 
         self.public = public
         if public is False:
-            self.k = ecdsa.SigningKey.from_string(secret, curve=SECP256k1)
-            self.K = self.k.get_verifying_key()
+            if len(secret) != 32 or not 0 < string_to_int(secret) < CURVE_ORDER:
+                raise ValueError("Invalid private key")
+            self.k = secret
+            # public point is only computed when it is first needed (see K)
+            self._K = None
         else:
             self.k = None
-            self.K = secret
+            self._K = secret
 
         self.C = chain
         self.depth = depth
@@ -146,6 +145,16 @@ class BIP32Key(object):
         self.parent_fpr = fpr
         self.testnet = testnet
 
+        self._pub_key = None
+        self._identifier = None
+
+    @property
+    def K(self):
+        "Affine (x, y) public key point, derived from the private key on first access"
+        if self._K is None:
+            self._K = curve.get_backend().generator_multiply(string_to_int(self.k))
+        return self._K
+
     # Internal methods not intended to be called externally
     #
     def hmac(self, data):
@@ -172,7 +181,7 @@ class BIP32Key(object):
 
         # Data to HMAC
         if i & BIP32_HARDEN:
-            data = b'\0' + self.k.to_string() + i_str
+            data = b'\0' + self.k + i_str
         else:
             data = self.PublicKey() + i_str
         # Get HMAC of data
@@ -182,7 +191,7 @@ class BIP32Key(object):
         Il_int = string_to_int(Il)
         if Il_int > CURVE_ORDER:
             return None
-        pvt_int = string_to_int(self.k.to_string())
+        pvt_int = string_to_int(self.k)
         k_int = (Il_int + pvt_int) % CURVE_ORDER
         if (k_int == 0):
             return None
@@ -216,15 +225,12 @@ class BIP32Key(object):
         Il_int = string_to_int(Il)
         if Il_int >= CURVE_ORDER:
             return None
-        point = Il_int * CURVE_GEN + self.K.pubkey.point
-        if point == INFINITY:
+        point = curve.get_backend().tweak_add(Il_int, self.K)
+        if point is None:
             return None
 
-        # Retrieve public key based on curve point
-        K_i = ecdsa.VerifyingKey.from_public_point(point, curve=SECP256k1)
-
         # Construct and return a new BIP32Key
-        return BIP32Key(secret=K_i, chain=Ir, depth=self.depth + 1, index=i, fpr=self.Fingerprint(), public=True,
+        return BIP32Key(secret=point, chain=Ir, depth=self.depth + 1, index=i, fpr=self.Fingerprint(), public=True,
                         testnet=self.testnet)
 
     # Public methods
@@ -241,8 +247,52 @@ class BIP32Key(object):
         else:
             return self.CKDpub(i)
 
+    def ChildKeys(self, indexes):
+        """
+        Create and return a list of child keys, one for each index in 'indexes'.
+
+        Equivalent to [self.ChildKey(i) for i in indexes], but the curve work of
+        the whole batch is shared, so the public points of all children are
+        converted to affine coordinates with a single field inversion.
+        """
+        indexes = list(indexes)
+
+        if self.public is False:
+            children = [self.CKDpriv(i) for i in indexes]
+            valid = [c for c in children if c is not None]
+            points = curve.get_backend().batch_generator_multiply(string_to_int(c.k) for c in valid)
+            for child, point in zip(valid, points):
+                child._K = point
+            return children
+
+        if any(i & BIP32_HARDEN for i in indexes):
+            raise Exception("Cannot create a hardened child key using public child derivation")
+
+        pub_key = self.PublicKey()
+        fpr = self.Fingerprint()
+
+        tweaks, chains = [], []
+        for i in indexes:
+            (Il, Ir) = self.hmac(pub_key + struct.pack(">L", i))
+            tweaks.append(string_to_int(Il))
+            chains.append(Ir)
+
+        # invalid tweaks are given a placeholder of 1 and discarded below
+        points = curve.get_backend().batch_tweak_add([t if t < CURVE_ORDER else 1 for t in tweaks], self.K)
+
+        children = []
+        for i, tweak, point, chain in zip(indexes, tweaks, points, chains):
+            if tweak >= CURVE_ORDER or point is None:
+                children.append(None)
+            else:
+                children.append(BIP32Key(secret=point, chain=chain, depth=self.depth + 1, index=i, fpr=fpr,
+                                          public=True, testnet=self.testnet))
+        return children
+
     def SetPublic(self):
         "Convert a private BIP32Key into a public one"
+        # the public point has to be derived before the private key is dropped
+        _ = self.K
         self.k = None
         self.public = True
 
@@ -251,47 +301,49 @@ class BIP32Key(object):
         if self.public:
             raise Exception("Publicly derived deterministic keys have no private half")
         else:
-            return self.k.to_string()
+            return self.k
 
     def PublicKey(self):
         "Return compressed public key encoding"
-        padx = (b'\0' * 32 + int_to_string(self.K.pubkey.point.x()))[-32:]
-        if self.K.pubkey.point.y() & 1:
-            ck = b'\3' + padx
-        else:
-            ck = b'\2' + padx
-        return ck
+        if self._pub_key is None:
+            self._pub_key = curve.compress(self.K)
+        return self._pub_key
 
     def ChainCode(self):
         "Return chain code as string"
         return self.C
 
     def Identifier(self):
-        "Return key identifier as string"
-        cK = self.PublicKey()
-        return hashlib.new('ripemd160', sha256(cK).digest()).digest()
+        "Return key identifier (hash160 of the compressed public key) as string"
+        if self._identifier is None:
+            self._identifier = hashlib.new('ripemd160', sha256(self.PublicKey()).digest()).digest()
+        return self._identifier
 
     def Fingerprint(self):
         "Return key fingerprint as string"
         return self.Identifier()[:4]
 
-    def Address(self):
-        "Return compressed public key address"
+    def Address(self, encoded=True):
+        "Return compressed public key address, optionally Base58Check encoded"
         addressversion = b'\x00' if not self.testnet else b'\x6f'
         vh160 = addressversion + self.Identifier()
+        if not encoded:
+            return vh160
         return Base58.check_encode(vh160)
 
-    def P2WPKHoP2SHAddress(self):
-        "Return P2WPKH over P2SH segwit address"
+    def P2WPKHoP2SHAddress(self, encoded=True):
+        "Return P2WPKH over P2SH segwit address, optionally Base58Check encoded"
         pk_bytes = self.PublicKey()
         assert len(pk_bytes) == 33 and (pk_bytes.startswith(b"\x02") or pk_bytes.startswith(b"\x03")), \
             "Only compressed public keys are compatible with p2sh-p2wpkh addresses. " \
             "See https://github.com/bitcoin/bips/blob/master/bip-0049.mediawiki."
-        pk_hash = hashlib.new('ripemd160', sha256(pk_bytes).digest()).digest()
+        pk_hash = self.Identifier()
         push_20 = bytes.fromhex('0014')
         script_sig = push_20 + pk_hash
         address_bytes = hashlib.new('ripemd160', sha256(script_sig).digest()).digest()
         prefix = b"\xc4" if self.testnet else b"\x05"
+        if not encoded:
+            return prefix + address_bytes
         return Base58.check_encode(prefix + address_bytes)
 
     def P2WPKHAddress(self):
@@ -313,7 +365,7 @@ class BIP32Key(object):
         if self.public:
             raise Exception("Publicly derived deterministic keys have no private half")
         addressversion = b'\x80' if not self.testnet else b'\xef'
-        raw = addressversion + self.k.to_string() + b'\x01'  # Always compressed
+        raw = addressversion + self.k + b'\x01'  # Always compressed
         return Base58.check_encode(raw)
 
     def ExtendedKey(self, private=True, encoded=True):
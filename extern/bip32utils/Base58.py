@@ -7,69 +7,63 @@
 from hashlib import sha256
 
 __base58_alphabet = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
-__base58_alphabet_bytes = b'123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
 __base58_radix = len(__base58_alphabet)
+__base58_index = {c: i for i, c in enumerate(__base58_alphabet)}
 
-
-def __string_to_int(data):
-    "Convert string of bytes Python integer, MSB"
-    val = 0
-   
-    # Python 2.x compatibility
-    if type(data) == str:
-        data = bytearray(data)
-
-    for (i, c) in enumerate(data[::-1]):
-        val += (256**i)*c
-    return val
+# every 2 character string, used to encode two base58 digits per divmod
+__base58_pairs = [a + b for a in __base58_alphabet for b in __base58_alphabet]
+__base58_pair_radix = __base58_radix ** 2
 
 
 def encode(data):
     "Encode bytes into Bitcoin base58 string"
-    enc = ''
-    val = __string_to_int(data)
-    while val >= __base58_radix:
-        val, mod = divmod(val, __base58_radix)
-        enc = __base58_alphabet[mod] + enc
-    if val:
-        enc = __base58_alphabet[val] + enc
+    val = int.from_bytes(data, 'big')
+
+    pairs = []
+    while val:
+        val, mod = divmod(val, __base58_pair_radix)
+        pairs.append(__base58_pairs[mod])
+    enc = ''.join(reversed(pairs)).lstrip(__base58_alphabet[0])
 
     # Pad for leading zeroes
-    n = len(data)-len(data.lstrip(b'\0'))
-    return __base58_alphabet[0]*n + enc
+    n = len(data) - len(data.lstrip(b'\0'))
+    return __base58_alphabet[0] * n + enc
 
 
 def check_encode(raw):
     "Encode raw bytes into Bitcoin base58 string with checksum"
-    chk = sha256(sha256(raw).digest()).digest()[:4]
-    return encode(raw+chk)
+    return encode(raw + checksum(raw))
+
+
+def check_encode_many(raws):
+    "Encode a list of raw byte strings (e.g. address payloads) into base58 strings with checksums"
+    return [check_encode(raw) for raw in raws]
 
 
 def decode(data):
     "Decode Bitcoin base58 format string to bytes"
-    # Python 2.x compatability
-    if bytes != str:
-        data = bytes(data, 'ascii')
-
     val = 0
-    for (i, c) in enumerate(data[::-1]):
-        val += __base58_alphabet_bytes.find(c) * (__base58_radix**i)
+    try:
+        for c in data:
+            val = val * __base58_radix + __base58_index[c]
+    except KeyError as ex:
+        raise ValueError("invalid base58 character: %r" % ex.args[0]) from None
+
+    # Leading '1's are leading zero bytes
+    n = len(data) - len(data.lstrip(__base58_alphabet[0]))
+    return b'\0' * n + val.to_bytes((val.bit_length() + 7) // 8, 'big')
 
-    dec = bytearray()
-    while val >= 256:
-        val, mod = divmod(val, 256)
-        dec.append(mod)
-    if val:
-        dec.append(val)
 
-    return bytes(dec[::-1])
+def checksum(raw):
+    "Return the 4 byte double sha256 checksum of raw bytes"
+    return sha256(sha256(raw).digest()).digest()[:4]
 
 
 def check_decode(enc):
     "Decode bytes from Bitcoin base58 string and test checksum"
     dec = decode(enc)
     raw, chk = dec[:-4], dec[-4:]
-    if chk != sha256(sha256(raw).digest()).digest()[:4]:
+    if chk != checksum(raw):
         raise ValueError("base58 decoding checksum error")
     else:
         return raw
@@ -0,0 +1,296 @@
+# Copyright (C) 2018  Gavin Shaughnessy
+#
+# Bit-Store is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+secp256k1 point arithmetic backends used by BIP32Key.
+
+Points are passed in and out of a backend as affine (x, y) int tuples, with
+None standing in for the point at infinity. The 'ecdsa' backend uses the ecdsa
+package's affine arithmetic (a modular inversion per addition). The 'jacobian'
+backend keeps points in Jacobian coordinates while working on them, multiplies
+the generator using a precomputed table of windowed multiples of G (additions
+only, no doublings), and converts batches of results back to affine with a
+single inversion (Montgomery's trick).
+
+The backend is chosen at runtime with set_backend().
+"""
+
+import threading
+
+import ecdsa
+from ecdsa.curves import SECP256k1
+
+
+FIELD_ORDER = SECP256k1.curve.p()
+CURVE_ORDER = SECP256k1.order
+GENERATOR = (SECP256k1.generator.x(), SECP256k1.generator.y())
+
+
+def compress(point):
+    """ returns the 33 byte compressed encoding of an affine point """
+    x, y = point
+    return (b'\3' if y & 1 else b'\2') + x.to_bytes(32, 'big')
+
+
+def decompress(data):
+    """ returns the affine point of a 33 byte compressed public key """
+    if len(data) != 33 or data[0] not in (2, 3):
+        raise ValueError('Invalid compressed public key')
+
+    x = int.from_bytes(data[1:], 'big')
+    if x >= FIELD_ORDER:
+        raise ValueError('Invalid compressed public key')
+
+    # y^2 = x^3 + 7 mod p, and as p % 4 == 3 the square root is a single pow()
+    ys = (pow(x, 3, FIELD_ORDER) + 7) % FIELD_ORDER
+    y = pow(ys, (FIELD_ORDER + 1) // 4, FIELD_ORDER)
+    if y * y % FIELD_ORDER != ys:
+        raise ValueError('Public key is not on the secp256k1 curve')
+
+    if y & 1 != data[0] & 1:
+        y = FIELD_ORDER - y
+
+    return x, y
+
+
+class _CurveBackend:
+    """ sub-classes need to implement generator_multiply and tweak_add. The batch
+    methods can be overridden where a backend can share work between points.
+    """
+
+    name = None
+
+    def generator_multiply(self, k):
+        """ returns k*G """
+        raise NotImplementedError
+
+    def tweak_add(self, tweak, point):
+        """ returns tweak*G + point """
+        raise NotImplementedError
+
+    def batch_generator_multiply(self, scalars):
+        return [self.generator_multiply(k) for k in scalars]
+
+    def batch_tweak_add(self, tweaks, point):
+        return [self.tweak_add(t, point) for t in tweaks]
+
+
+class EcdsaBackend(_CurveBackend):
+    """ affine arithmetic from the ecdsa package (original bip32utils behaviour) """
+
+    name = 'ecdsa'
+
+    @staticmethod
+    def _to_tuple(point):
+        if point == ecdsa.ellipticcurve.INFINITY:
+            return None
+
+        return point.x(), point.y()
+
+    def generator_multiply(self, k):
+        return self._to_tuple(k * ecdsa.ecdsa.generator_secp256k1)
+
+    def tweak_add(self, tweak, point):
+        ecdsa_point = ecdsa.ellipticcurve.Point(SECP256k1.curve, point[0], point[1])
+        return self._to_tuple(tweak * ecdsa.ecdsa.generator_secp256k1 + ecdsa_point)
+
+
+class JacobianBackend(_CurveBackend):
+    """ Jacobian coordinate arithmetic with a precomputed generator table.
+
+    The table holds j * 2^(window*i) * G for every window position i and every
+    non-zero window value j, so k*G is one mixed addition per window of k. It
+    is built on first use (and only once per process).
+    """
+
+    name = 'jacobian'
+
+    def __init__(self, window=8):
+        if not 1 <= window <= 16:
+            raise ValueError('Window size must be between 1 and 16 bits')
+
+        self.window = window
+        self._windows = -(-CURVE_ORDER.bit_length() // window)
+        self._table = None
+        self._table_lock = threading.Lock()
+
+    @staticmethod
+    def _double(point):
+        """ Jacobian point doubling (a = 0) """
+        if point is None:
+            return None
+
+        x, y, z = point
+        if y == 0:
+            return None
+
+        p = FIELD_ORDER
+        yy = y * y % p
+        s = 4 * x * yy % p
+        m = 3 * x * x % p
+        x3 = (m * m - 2 * s) % p
+        y3 = (m * (s - x3) - 8 * yy * yy) % p
+        z3 = 2 * y * z % p
+
+        return x3, y3, z3
+
+    @classmethod
+    def _add_affine(cls, point, affine):
+        """ mixed addition of a Jacobian point and an affine point """
+        if affine is None:
+            return point
+        if point is None:
+            return affine[0], affine[1], 1
+
+        p = FIELD_ORDER
+        x1, y1, z1 = point
+        x2, y2 = affine
+
+        z1z1 = z1 * z1 % p
+        u2 = x2 * z1z1 % p
+        s2 = y2 * z1 * z1z1 % p
+        h = (u2 - x1) % p
+        r = (s2 - y1) % p
+
+        if h == 0:
+            # same x coordinate, so the points are either equal or inverses
+            return cls._double(point) if r == 0 else None
+
+        hh = h * h % p
+        hhh = h * hh % p
+        v = x1 * hh % p
+        x3 = (r * r - hhh - 2 * v) % p
+        y3 = (r * (v - x3) - y1 * hhh) % p
+        z3 = z1 * h % p
+
+        return x3, y3, z3
+
+    @staticmethod
+    def _batch_to_affine(points):
+        """ converts Jacobian points to affine using one field inversion (Montgomery's trick) """
+        p = FIELD_ORDER
+
+        prefix = []
+        acc = 1
+        for point in points:
+            if point is not None:
+                acc = acc * point[2] % p
+            prefix.append(acc)
+
+        inv = pow(acc, p - 2, p)
+
+        affine = [None] * len(points)
+        for i in range(len(points) - 1, -1, -1):
+            point = points[i]
+            if point is None:
+                continue
+
+            z_inv = inv * (prefix[i - 1] if i else 1) % p
+            inv = inv * point[2] % p
+
+            zz_inv = z_inv * z_inv % p
+            affine[i] = (point[0] * zz_inv % p, point[1] * zz_inv * z_inv % p)
+
+        return affine
+
+    def _build_table(self):
+        """ returns a list of rows, row i holding j * 2^(window*i) * G for j in [1, 2^window) """
+        table = []
+        base = GENERATOR
+
+        for _ in range(self._windows):
+            row = []
+            cur = None
+            for _ in range((1 << self.window) - 1):
+                cur = self._add_affine(cur, base)
+                row.append(cur)
+
+            # (2^window - 1) * base + base is the base of the next row. It is normalized
+            # along with this row so that it can be used in mixed additions.
+            *row, base = self._batch_to_affine(row + [self._add_affine(cur, base)])
+            table.append(row)
+
+        return table
+
+    @property
+    def table(self):
+        if self._table is None:
+            with self._table_lock:
+                if self._table is None:
+                    self._table = self._build_table()
+
+        return self._table
+
+    def _generator_multiply_jacobian(self, k):
+        k %= CURVE_ORDER
+        mask = (1 << self.window) - 1
+
+        point = None
+        for row in self.table:
+            if not k:
+                break
+
+            digit = k & mask
+            if digit:
+                point = self._add_affine(point, row[digit - 1])
+
+            k >>= self.window
+
+        return point
+
+    def generator_multiply(self, k):
+        return self._batch_to_affine([self._generator_multiply_jacobian(k)])[0]
+
+    def tweak_add(self, tweak, point):
+        return self.batch_tweak_add([tweak], point)[0]
+
+    def batch_generator_multiply(self, scalars):
+        return self._batch_to_affine([self._generator_multiply_jacobian(k) for k in scalars])
+
+    def batch_tweak_add(self, tweaks, point):
+        return self._batch_to_affine([self._add_affine(self._generator_multiply_jacobian(t), point)
+                                      for t in tweaks])
+
+
+BACKENDS = {
+    'ecdsa': EcdsaBackend,
+    'jacobian': JacobianBackend
+}
+
+DEFAULT_BACKEND = 'jacobian'
+
+# instances are kept so that switching back to a backend doesn't rebuild its tables
+_backend_instances = {}
+_backend = None
+
+
+def set_backend(name):
+    """ sets the backend used for all following BIP32Key curve operations """
+    global _backend
+
+    if name not in BACKENDS:
+        raise ValueError(f'{name} is not a valid curve backend (choose from {", ".join(BACKENDS)})')
+
+    if name not in _backend_instances:
+        _backend_instances[name] = BACKENDS[name]()
+
+    _backend = _backend_instances[name]
+
+
+def get_backend():
+    if _backend is None:
+        set_backend(DEFAULT_BACKEND)
+
+    return _backend
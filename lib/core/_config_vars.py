@@ -57,7 +57,17 @@ DEFAULT_CONFIG = {
     'USE_LOCALTIME': True,
     'BLOCKCHAIN_API_REFRESH': 10,
     'FEE_API_REFRESH': 60,
-    'PRICE_API_REFRESH': 60
+    'PRICE_API_REFRESH': 60,
+    # storage backend of new wallets' data files, 'file' or 'sqlite' (see data.BACKENDS)
+    'DATA_STORE_BACKEND': 'file',
+    # seconds that wallet data may be kept in memory before it is written to file
+    'DATA_FLUSH_LATENCY': 0.5,
+    # seconds that decrypted wif keys are kept in memory after signing, 0 to not keep them
+    'WIF_KEY_CACHE_TTL': 60,
+    # times a failed api GET request is retried (broadcasts never are),
+    # and the maximum concurrent requests to an api host
+    'HTTP_MAX_RETRIES': 3,
+    'HTTP_MAX_CONNECTIONS_PER_HOST': 4
 
 }
 
@@ -82,7 +92,13 @@ STANDARD_DATA_FORMAT = {
     'UNSPENT_OUTS': list,
     'PASSWORD_HASH': str,
     'ADDRESS_WIF_KEYS': dict,
-    'DEFAULT_ADDRESSES': dict
+    'DEFAULT_ADDRESSES': dict,
+    # derivation cache: the receiving/change chain extended keys and the highest index derived on each chain
+    'CHAIN_XPRIVS': dict,
+    'CHAIN_XPUBS': dict,
+    'DERIVED_INDEXES': dict,
+    # where the last incremental sync of TXNS got up to (see blockchain.BlockchainInfo.set_sync_state)
+    'SYNC_CURSOR': dict
 
 }
 
@@ -92,10 +108,21 @@ STANDARD_DATA_FORMAT = {
 SENSITIVE_DATA = [
     'MNEMONIC',
     'XPRIV',
-    'ADDRESS_WIF_KEYS'
+    'ADDRESS_WIF_KEYS',
+    'CHAIN_XPRIVS'
 ]
 
 
+# DataStore file segments, each encrypted separately so that writing e.g api data doesn't
+# re-encrypt wallet secrets (keys that aren't listed are kept in a default segment)
+DATA_SEGMENTS = {
+    'secrets': ['MNEMONIC', 'XPRIV', 'ADDRESS_WIF_KEYS', 'CHAIN_XPRIVS'],
+    'keys': ['XPUB', 'ACCOUNT_XPUB', 'PATH', 'GAP_LIMIT', 'SEGWIT', 'ADDRESSES_RECEIVING', 'ADDRESSES_CHANGE',
+             'ADDRESSES_USED', 'DEFAULT_ADDRESSES', 'CHAIN_XPUBS', 'DERIVED_INDEXES'],
+    'api': ['TXNS', 'UNSPENT_OUTS', 'ADDRESS_BALS', 'PRICE', 'ESTIMATED_FEES', 'WALLET_BAL', 'SYNC_CURSOR']
+}
+
+
 # amounts satoshis have to be multiplied by to get other units
 UNIT_FACTORS = {
     'BTC': 1e8,
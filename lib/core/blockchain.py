@@ -16,23 +16,30 @@
 import time
 import math
 import json
+import hashlib
 import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import requests
 
-from . import utils, config
+from . import utils, config, http_client
 
 
 class BlockchainConnectionError(Exception):
     pass
 
 
+class TransactionsChangedError(BlockchainConnectionError):
+    """ the transactions of the addresses changed while their pages were being requested """
+
+
 # TODO: ADD MORE API SOURCES
 def broadcast_transaction(hex_transaction):
     url = 'https://chain.so/api/v2/send_tx/BTC'
 
     try:
-        request = requests.post(url=url, data={'tx_hex': hex_transaction}, timeout=10)
+        request = http_client.client().post(url, data={'tx_hex': hex_transaction}, timeout=10)
 
     except requests.RequestException:
         return False, None
@@ -40,11 +47,8 @@ def broadcast_transaction(hex_transaction):
     return request.ok, request.status_code
 
 
-def blockchain_api(source, addresses, refresh_rate, timeout=10):
-
-    if not isinstance(addresses, list):
-        raise TypeError('Address(es) must be in a list')
-
+def blockchain_api_class(source):
+    """ returns the _BlockchainBaseClass sub-class that implements source """
     sources = {
         'blockchain.info': BlockchainInfo,
         'blockexplorer.com': BlockExplorer
@@ -56,7 +60,15 @@ def blockchain_api(source, addresses, refresh_rate, timeout=10):
     if source.lower() not in sources:
         raise NotImplementedError(f'{source} is an invalid source')
 
-    source_cls = sources[source]
+    return sources[source]
+
+
+def blockchain_api(source, addresses, refresh_rate, timeout=10):
+
+    if not isinstance(addresses, list):
+        raise TypeError('Address(es) must be in a list')
+
+    source_cls = blockchain_api_class(source)
 
     if not utils.validate_addresses(addresses, allow_bech32=source_cls.bech32_support):
         raise ValueError('Invalid Address entered')
@@ -117,6 +129,12 @@ class _EstimateFeeBaseClass:
 
         return wrapper
 
+    def refresh(self):
+        """ makes the next all_priorities request the api, even if refresh_rate hasn't passed
+        (see _BlockchainBaseClass.refresh)
+        """
+        self.last_request_time = 0
+
     @property
     def low_priority(self):
         return self.all_priorities[0]
@@ -144,7 +162,7 @@ class BitcoinFeesEarn(_EstimateFeeBaseClass):
         url = 'https://bitcoinfees.earn.com/api/v1/fees/recommended'
 
         try:
-            request = requests.get(url, timeout=self.timeout)
+            request = http_client.client().get(url, timeout=self.timeout)
             request.raise_for_status()
             data = request.json()
 
@@ -156,6 +174,58 @@ class BitcoinFeesEarn(_EstimateFeeBaseClass):
         return fee_info
 
 
+class AddressShardPlanner:
+    """ splits a wallet's addresses into shards that are requested separately (and concurrently),
+    so that requests stay under url length limits and don't make slow queries. Shards have up
+    to self.size addresses, which adapts to the latency of the requests (see record_latency)
+    """
+
+    def __init__(self, max_size=100, min_size=10, max_length=4000, target_latency=2.0):
+        """
+        :param max_size: maximum, and starting, number of addresses in a shard
+        :param min_size: minimum number of addresses in a shard
+        :param max_length: maximum length of a shard's addresses (plus a separator for each),
+        so that a shard can be put in a url
+        :param target_latency: seconds that a shard's request should take
+        """
+        self.max_size = max_size
+        self.min_size = min_size
+        self.max_length = max_length
+        self.target_latency = target_latency
+
+        self.size = max_size
+        self._lock = threading.Lock()
+
+    def shards(self, addresses):
+        """ returns addresses split into shards, in order """
+        shards = []
+        shard, length = [], 0
+
+        for address in addresses:
+            if shard and (len(shard) >= self.size or length + len(address) + 1 > self.max_length):
+                shards.append(shard)
+                shard, length = [], 0
+
+            shard.append(address)
+            length += len(address) + 1
+
+        if shard:
+            shards.append(shard)
+
+        return shards
+
+    def record_latency(self, latency):
+        """ halves the shard size (down to min_size) if a request took longer than target_latency,
+        and grows it by a quarter (up to max_size) if it took less than half of that
+        """
+        with self._lock:
+            if latency > self.target_latency:
+                self.size = max(self.min_size, self.size // 2)
+
+            elif latency < self.target_latency / 2:
+                self.size = min(self.max_size, self.size + max(1, self.size // 4))
+
+
 class _BlockchainBaseClass:
     """ subclasses need to overwrite transactions property and make
      sure it returns transactions in data format seen in doc-string of the property
@@ -176,6 +246,11 @@ class _BlockchainBaseClass:
         self.last_transactions = None
         self.blockchain_data_updated = True
 
+        # set by sub-classes that sync incrementally, see set_sync_state
+        self.sync_cursor = None
+
+        self.shard_planner = AddressShardPlanner()
+
     def limit_requests(func):
         """ limits a function call to once every self.refresh_rate seconds,
         used for methods that make api calls
@@ -203,6 +278,39 @@ class _BlockchainBaseClass:
 
         return wrapper
 
+    def refresh(self):
+        """ makes the next api call request the api again, even if refresh_rate hasn't passed.
+        Used by callers that schedule the calls themselves (i.e the wallet's api data updater),
+        so that requests aren't held back a second time by limit_requests
+        """
+        self.last_request_time = 0
+
+    def _map_shards(self, func):
+        """ returns the results of func called with each shard of self.addresses
+        (see AddressShardPlanner), which are requested concurrently
+        """
+        shards = self.shard_planner.shards(self.addresses)
+
+        if len(shards) == 1:
+            return [func(shards[0])]
+
+        with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+            return list(executor.map(func, shards))
+
+    def _timed_get(self, url, **kwargs):
+        """ makes a get request, recording its latency with self.shard_planner """
+        start = time.perf_counter()
+        request = http_client.client().get(url, **kwargs)
+        self.shard_planner.record_latency(time.perf_counter() - start)
+
+        return request
+
+    def set_sync_state(self, transactions, sync_cursor):
+        """ sets transactions from an earlier sync, and the sync_cursor it ended with, so that
+        sub-classes that sync incrementally only request what changed since then. Sub-classes
+        that don't are left to request all transactions
+        """
+
     @property
     def transactions(self):
         """ format: [ {
@@ -276,19 +384,22 @@ class _BlockchainBaseClass:
 
         return [balance, unconfirmed_balance]
 
-    def txn_wallet_amount(self, transaction):
+    def txn_wallet_amount(self, transaction, addresses=None):
         """ finding the wallet_amount, + or -, for the txn (wallet being all
         addresses in self.addresses) i.e the overall change in wallet funds
-        after the txn.
+        after the txn. addresses can be a set of self.addresses, for faster lookups
         """
+        if addresses is None:
+            addresses = self.addresses
+
         # transaction in standard format shown in transactions property docstring
         # (minus wallet_amount of course.)
         amount = 0
         for i in transaction['inputs']:
-            if i['address'] in self.addresses:
+            if i['address'] in addresses:
                 amount -= i['value']
         for o in transaction['outputs']:
-            if o['address'] in self.addresses:
+            if o['address'] in addresses:
                 amount += o['value']
 
         return amount
@@ -297,17 +408,27 @@ class _BlockchainBaseClass:
 class BlockchainInfo(_BlockchainBaseClass):
     bech32_support = False
 
-    @property
-    @_BlockchainBaseClass.limit_requests
-    def _blockchain_data(self):
-        url = 'https://blockchain.info/multiaddr?active='
+    url = 'https://blockchain.info/multiaddr'
 
-        for address in self.addresses:
-            url += f'{address}|'
-        url += '&n=100'  # show up to 100 (max) transactions
+    # maximum number of transactions blockchain.info returns per request
+    page_size = 100
+    # number of pages that are requested at the same time
+    max_concurrent_pages = 4
+
+    # blocks below the block height of the last sync that are requested again by each
+    # incremental sync, as their transactions could have changed blocks in a reorg
+    reorg_depth = 6
+
+    # number of times a full sync of a shard is started if its transactions keep
+    # changing while its pages are being requested
+    max_sync_attempts = 3
+
+    def _get_page(self, addresses, offset):
+        """ returns the api data of addresses with page_size transactions, starting at offset (newest first) """
+        params = {'active': '|'.join(addresses), 'n': self.page_size, 'offset': offset}
 
         try:
-            request = requests.get(url, timeout=self.timeout)
+            request = self._timed_get(self.url, params=params, timeout=self.timeout)
             data = request.json()
             request.raise_for_status()
 
@@ -316,86 +437,366 @@ class BlockchainInfo(_BlockchainBaseClass):
 
         return data
 
-    @property
-    def transactions(self):
-        """ returns all txns associated with the entered addresses in standard format"""
-        # called first as self.blockchain_data_updated will be updated here to
-        # see if there is a need to remake transaction dict
-        data = self._blockchain_data
+    def _addresses_hash(self):
+        return hashlib.sha256('|'.join(sorted(self.addresses)).encode('utf-8')).hexdigest()
 
-        if not self.blockchain_data_updated and self.last_transactions is not None:
-            return self.last_transactions
+    def set_sync_state(self, transactions, sync_cursor):
+        """ sync_cursor is the block height, number of transactions, unconfirmed txids and addresses
+        of the last sync. It is ignored if it doesn't match transactions or self.addresses
+        (e.g if addresses were added since), in which case all transactions are requested
+        """
+        if not sync_cursor or sync_cursor['addresses'] != self._addresses_hash():
+            return
 
-        transactions = []
+        unconfirmed = {t['txid'] for t in transactions if t['block_height'] is None}
 
-        for tx in data['txs']:
+        if sync_cursor['n_tx'] != len(transactions) or set(sync_cursor['unconfirmed']) != unconfirmed:
+            return
 
-            transaction = dict()
+        self._synced = {
+            'block_height': sync_cursor['block_height'],
+            'n_tx': sync_cursor['n_tx'],
+            'unconfirmed': sorted(unconfirmed),
+            'transactions': transactions
+        }
+        self.sync_cursor = sync_cursor
 
-            transaction['txid'] = tx['hash']
+    @property
+    @_BlockchainBaseClass.limit_requests
+    def _blockchain_data(self):
+        """ returns the block height, number of transactions, unconfirmed txids and the transactions
+        of the addresses in standard format. After the first sync, only the transactions that
+        could have changed since are requested (see self._incremental_sync)
+        """
+        data = None
 
-            transaction['date'] = utils.datetime_str_from_timestamp(tx['time'],
-                                                                    config.DATETIME_FORMAT,
-                                                                    utc=not config.get('USE_LOCALTIME'))
+        if getattr(self, '_synced', None) is not None:
+            data = self._incremental_sync(self._synced)
 
-            try:
-                transaction['block_height'] = tx['block_height']
-            except KeyError:
-                transaction['block_height'] = None
+        if data is None:
+            data = self._full_sync()
+
+        self._synced = data
+        self.sync_cursor = {
+            'block_height': data['block_height'],
+            'n_tx': data['n_tx'],
+            'unconfirmed': data['unconfirmed'],
+            'addresses': self._addresses_hash()
+        }
 
-            blockchain_height = self._blockchain_data['info']['latest_block']['height']
+        return data
 
-            # if a block isn't confirmed yet, there will be no block_height key
+    @staticmethod
+    def _merge_shards(shard_transactions, blockchain_height):
+        """ returns the transactions of each shard as one list without duplicates (a transaction
+        with addresses in more than one shard is in each of them), newest first
+        """
+        if len(shard_transactions) == 1:
+            return shard_transactions[0]
+
+        transactions = {}
+        for t in (t for shard in shard_transactions for t in shard):
+            if t['txid'] not in transactions:
+                # shards could have been requested either side of a new block
+                if t['block_height'] is not None:
+                    t = {**t, 'confirmations': blockchain_height - t['block_height'] + 1}
+
+                transactions[t['txid']] = t
+
+        # sort is stable, so transactions in the same block stay in the order they were in
+        return sorted(transactions.values(),
+                      key=lambda t: (t['block_height'] is not None, -(t['block_height'] or 0)))
+
+    def _full_sync(self):
+        """ requests all of the transactions of each shard of the addresses """
+        shards = self._map_shards(self._full_sync_shard)
+
+        blockchain_height = max(s['block_height'] for s in shards)
+        transactions = self._merge_shards([s['transactions'] for s in shards], blockchain_height)
+
+        return {
+            'block_height': blockchain_height,
+            'n_tx': len(transactions),
+            'unconfirmed': [t['txid'] for t in transactions if t['block_height'] is None],
+            'transactions': transactions
+        }
+
+    def _full_sync_shard(self, addresses):
+        """ requests all of the transactions of addresses, starting again from the first
+        page (up to max_sync_attempts times) if they change part way through
+        """
+        for attempt in range(1, self.max_sync_attempts + 1):
             try:
-                transaction['confirmations'] = (blockchain_height - tx['block_height']) + 1  # blockchains start at 0
-            except KeyError:
-                transaction['confirmations'] = 0
+                return self._request_shard(addresses)
+            except TransactionsChangedError:
+                if attempt == self.max_sync_attempts:
+                    raise
 
-            transaction['fee'] = tx['fee']
-            # vsize should be the same as size for legacy txns
-            transaction['vsize'] = math.ceil(tx['weight'] / 4)  # bitcoin core recommends rounding up
+    def _request_shard(self, addresses):
+        """ requests all of the transactions of addresses.
 
-            ins = []
-            for input_ in tx['inputs']:
-                i = dict()
+        The first page is requested on its own to find the number of transactions, then the
+        rest are requested concurrently. Each page is parsed in the thread that requested it,
+        so only one raw page per thread is in memory at a time, not the whole raw history.
+        """
+        first_page = self._get_page(addresses, 0)
 
-                i['value'] = input_['prev_out']['value']
-                i['address'] = input_['prev_out']['addr']
-                i['n'] = input_['prev_out']['n']
+        blockchain_height = first_page['info']['latest_block']['height']
+        n_tx = first_page['wallet']['n_tx']
 
-                ins.append(i)
+        pages = {0: self._parse_transactions(first_page['txs'], blockchain_height)}
+        del first_page
 
-            # for some reason blockchain.info doesnt always show all outputs
-            # (I presume it could happen to inputs), so we make sure the user
-            # knows not all ins/outs are retrieved by adding an entry anyway
-            for _ in range(tx['vin_sz'] - len(ins)):
-                ins.append({'value': 0, 'address': 'Error: Cannot find TX-IN', 'n': 0})
+        def get_transactions(offset):
+            page = self._get_page(addresses, offset)
+            self._check_page(page, n_tx)
 
-            transaction['inputs'] = ins
+            return self._parse_transactions(page['txs'], blockchain_height)
 
-            outs = []
-            for output in tx['out']:
-                o = dict()
+        offsets = range(self.page_size, n_tx, self.page_size)
 
-                o['value'] = output['value']
-                o['address'] = output['addr']
-                o['n'] = output['n']
-                o['spent'] = output['spent']
-                o['script'] = output['script']
+        if offsets:
+            with ThreadPoolExecutor(max_workers=self.max_concurrent_pages) as executor:
+                futures = {executor.submit(get_transactions, o): o for o in offsets}
 
-                outs.append(o)
+                try:
+                    for future in as_completed(futures):
+                        pages[futures[future]] = future.result()
+
+                except BlockchainConnectionError:
+                    # the pages that haven't been requested yet aren't needed
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+        return {
+            'block_height': blockchain_height,
+            'transactions': [t for o in sorted(pages) for t in pages[o]]
+        }
+
+    @staticmethod
+    def _check_page(page, n_tx):
+        # if a transaction was made while the pages were being requested, the offsets
+        # of the pages after the first one have moved, so transactions could be missed
+        if page['wallet']['n_tx'] != n_tx:
+            raise TransactionsChangedError('Transactions changed while they were being requested')
+
+    def _recent_transactions(self, addresses, since_height):
+        """ returns the block height, number of transactions, address balances, and transactions
+        newer than since_height (or unconfirmed) of addresses. Pages are requested (newest first)
+        until a transaction older than that is reached
+        """
+        recent = []
+        offset = 0
 
-            # for some reason blockchain.info doesnt always show all outputs
-            # so we make sure the user knows not all ins/outs were retrieved
-            # by adding an entry anyway
-            for _ in range(tx['vout_sz'] - len(outs)):
-                outs.append({'value': 0, 'address': 'Error: Cannot find TX-OUT', 'n': 0, 'spent': None, 'script': ''})
+        while True:
+            page = self._get_page(addresses, offset)
 
-            transaction['outputs'] = outs
+            if offset == 0:
+                blockchain_height = page['info']['latest_block']['height']
+                n_tx = page['wallet']['n_tx']
+                balances = {a['address']: a['final_balance'] for a in page['addresses']}
+            else:
+                self._check_page(page, n_tx)
 
-            transaction['wallet_amount'] = self.txn_wallet_amount(transaction)
+            txs = [tx for tx in page['txs'] if tx.get('block_height', math.inf) > since_height]
+            recent.extend(self._parse_transactions(txs, blockchain_height))
 
-            transactions.append(transaction)
+            offset += self.page_size
+
+            # transactions are newest first, so the rest were synced already
+            if len(txs) < len(page['txs']) or offset >= n_tx:
+                break
+
+        return {
+            'addresses': addresses,
+            'block_height': blockchain_height,
+            'n_tx': n_tx,
+            'balances': balances,
+            'transactions': recent
+        }
+
+    @staticmethod
+    def _shard_counts_match(transactions, shards):
+        """ returns True if the number of transactions with addresses in each shard
+        matches the shard's number of transactions from the api
+        """
+        if len(shards) == 1:
+            return len(transactions) == shards[0]['n_tx']
+
+        shard_of = {a: i for i, s in enumerate(shards) for a in s['addresses']}
+        counts = [0] * len(shards)
+
+        for t in transactions:
+            for i in {shard_of[io['address']] for io in (*t['inputs'], *t['outputs']) if io['address'] in shard_of}:
+                counts[i] += 1
+
+        return counts == [s['n_tx'] for s in shards]
+
+    def _incremental_sync(self, synced):
+        """ updates the transactions of the last sync (synced), only requesting the transactions
+        that are new or could have changed since: unconfirmed transactions, and transactions in
+        the last reorg_depth blocks (see self._recent_transactions). The confirmations of older
+        transactions are worked out from the new block height instead.
+
+        Older outputs spent by new transactions are marked as spent. If the result doesn't match
+        the api's number of transactions and address balances (or a spent output can't be found
+        exactly), None is returned and all transactions have to be requested again.
+        """
+        since_height = synced['block_height'] - self.reorg_depth
+
+        shards = self._map_shards(lambda addresses: self._recent_transactions(addresses, since_height))
+
+        blockchain_height = max(s['block_height'] for s in shards)
+        recent = self._merge_shards([s['transactions'] for s in shards], blockchain_height)
+
+        older = [t for t in synced['transactions']
+                 if t['block_height'] is not None and t['block_height'] <= since_height]
+
+        if blockchain_height != synced['block_height']:
+            older = [{**t, 'confirmations': blockchain_height - t['block_height'] + 1} for t in older]
+
+        older = self._mark_spent_outputs(recent, older)
+        if older is None:
+            return None
+
+        transactions = recent + older
+
+        if not self._shard_counts_match(transactions, shards):
+            return None
+
+        api_balances = {a: b for s in shards for a, b in s['balances'].items()}
+
+        balances = dict.fromkeys(self.addresses, 0)
+        for t in transactions:
+            for o in t['outputs']:
+                if o['spent'] is False and o['address'] in balances:
+                    balances[o['address']] += o['value']
+
+        if any(api_balances[a] != b for a, b in balances.items() if a in api_balances):
+            return None
+
+        return {
+            'block_height': blockchain_height,
+            'n_tx': len(transactions),
+            'unconfirmed': [t['txid'] for t in recent if t['block_height'] is None],
+            'transactions': transactions
+        }
+
+    def _mark_spent_outputs(self, recent, older):
+        """ returns older with the outputs spent by the wallet inputs of recent marked as spent,
+        or None if an output can't be matched to exactly one input (outputs are only matched by
+        address, n and value, as inputs don't include the txid of the output they spend)
+        """
+        addresses = set(self.addresses)
+        spends = [(i['address'], i['n'], i['value']) for t in recent for i in t['inputs']
+                  if i['address'] in addresses]
+
+        if not spends:
+            return older
+
+        outputs = {}
+        for txns in (recent, older):
+            for t_index, t in enumerate(txns):
+                for o_index, o in enumerate(t['outputs']):
+                    if o['address'] in addresses:
+                        outputs.setdefault((o['address'], o['n'], o['value']), []).append((txns, t_index, o_index))
+
+        older = list(older)
+
+        for spend in spends:
+            matches = outputs.get(spend, [])
+            if len(matches) != 1:
+                return None
+
+            txns, t_index, o_index = matches[0]
+
+            # outputs of recent transactions are already up to date
+            if txns is recent or older[t_index]['outputs'][o_index]['spent']:
+                continue
+
+            t = older[t_index]
+            outs = list(t['outputs'])
+            outs[o_index] = {**outs[o_index], 'spent': True}
+            older[t_index] = {**t, 'outputs': outs}
+
+        return older
+
+    def _parse_transactions(self, txs, blockchain_height):
+        """ returns the blockchain.info txs in standard format """
+        addresses = set(self.addresses)
+        return [self._parse_transaction(tx, blockchain_height, addresses) for tx in txs]
+
+    def _parse_transaction(self, tx, blockchain_height, addresses):
+        transaction = dict()
+
+        transaction['txid'] = tx['hash']
+
+        transaction['date'] = utils.datetime_str_from_timestamp(tx['time'],
+                                                                config.DATETIME_FORMAT,
+                                                                utc=not config.get('USE_LOCALTIME'))
+
+        try:
+            transaction['block_height'] = tx['block_height']
+        except KeyError:
+            transaction['block_height'] = None
+
+        # if a block isn't confirmed yet, there will be no block_height key
+        try:
+            transaction['confirmations'] = (blockchain_height - tx['block_height']) + 1  # blockchains start at 0
+        except KeyError:
+            transaction['confirmations'] = 0
+
+        transaction['fee'] = tx['fee']
+        # vsize should be the same as size for legacy txns
+        transaction['vsize'] = math.ceil(tx['weight'] / 4)  # bitcoin core recommends rounding up
+
+        ins = []
+        for input_ in tx['inputs']:
+            i = dict()
+
+            i['value'] = input_['prev_out']['value']
+            i['address'] = input_['prev_out']['addr']
+            i['n'] = input_['prev_out']['n']
+
+            ins.append(i)
+
+        # for some reason blockchain.info doesnt always show all outputs
+        # (I presume it could happen to inputs), so we make sure the user
+        # knows not all ins/outs are retrieved by adding an entry anyway
+        for _ in range(tx['vin_sz'] - len(ins)):
+            ins.append({'value': 0, 'address': 'Error: Cannot find TX-IN', 'n': 0})
+
+        transaction['inputs'] = ins
+
+        outs = []
+        for output in tx['out']:
+            o = dict()
+
+            o['value'] = output['value']
+            o['address'] = output['addr']
+            o['n'] = output['n']
+            o['spent'] = output['spent']
+            o['script'] = output['script']
+
+            outs.append(o)
+
+        # for some reason blockchain.info doesnt always show all outputs
+        # so we make sure the user knows not all ins/outs were retrieved
+        # by adding an entry anyway
+        for _ in range(tx['vout_sz'] - len(outs)):
+            outs.append({'value': 0, 'address': 'Error: Cannot find TX-OUT', 'n': 0, 'spent': None, 'script': ''})
+
+        transaction['outputs'] = outs
+
+        transaction['wallet_amount'] = self.txn_wallet_amount(transaction, addresses)
+
+        return transaction
+
+    @property
+    def transactions(self):
+        """ returns all txns associated with the entered addresses in standard format"""
+        transactions = self._blockchain_data['transactions']
 
         self.last_transactions = transactions
         return transactions
@@ -404,22 +805,11 @@ class BlockchainInfo(_BlockchainBaseClass):
 class BlockExplorer(_BlockchainBaseClass):
     bech32_support = False
 
-    @property
-    @_BlockchainBaseClass.limit_requests
-    def _blockchain_data(self):
-        url = 'https://blockexplorer.com/api/addrs/'
-
-        for address in self.addresses:
-            # for trailing comma
-            if address != self.addresses[-1]:
-                url += f'{address},'
-            else:
-                url += address
-
-        url += '/txs?from=0&to=50'
+    def _get_shard(self, addresses):
+        url = 'https://blockexplorer.com/api/addrs/' + ','.join(addresses) + '/txs?from=0&to=50'
 
         try:
-            request = requests.get(url, timeout=self.timeout)
+            request = self._timed_get(url, timeout=self.timeout)
             data = request.json()
             request.raise_for_status()
 
@@ -433,6 +823,25 @@ class BlockExplorer(_BlockchainBaseClass):
 
         return data
 
+    @property
+    @_BlockchainBaseClass.limit_requests
+    def _blockchain_data(self):
+        """ returns the items of each shard of the addresses (see AddressShardPlanner),
+        without duplicates, as a transaction can have addresses in more than one shard
+        """
+        shards = self._map_shards(self._get_shard)
+
+        if len(shards) == 1:
+            return shards[0]
+
+        items = {}
+        for shard in shards:
+            for item in shard['items']:
+                items.setdefault(item['txid'], item)
+
+        # unconfirmed first (which have a block height of -1), then newest first
+        return {'items': sorted(items.values(), key=lambda i: (i['blockheight'] >= 0, -i['blockheight']))}
+
     @property
     def transactions(self):
         if not self.blockchain_data_updated and self.last_transactions is not None:
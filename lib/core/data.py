@@ -14,22 +14,132 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import os
+import hmac
 import hashlib
 import base64
 import json
-import copy
+import shutil
+import sqlite3
+import struct
+import sys
 import threading
+import weakref
+import zlib
+from contextlib import suppress
 
 import cryptography.fernet as fernet
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
 from ..core import utils
 from ..exceptions.data_exceptions import *
 
 
+def _immutable(self, *args, **kwargs):
+    raise TypeError(f'{self.__class__.__name__} is read-only, make a copy of it to modify it')
+
+
+class FrozenDict(dict):
+    """ read-only dict, used for DataStore values so that they can be shared between
+    threads without being copied. copy.deepcopy() returns a mutable copy (see thaw)
+    """
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __reduce__(self):
+        return self.__class__, (dict(self),)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+
+class FrozenList(list):
+    """ read-only list, see FrozenDict """
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _immutable
+    append = extend = insert = pop = remove = clear = sort = reverse = _immutable
+
+    def __reduce__(self):
+        return self.__class__, (list(self),)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+
+def freeze(value):
+    """ returns value with all of its (nested) dicts and lists made read-only """
+    if isinstance(value, dict):
+        return value if isinstance(value, FrozenDict) else FrozenDict((k, freeze(v)) for k, v in value.items())
+
+    if isinstance(value, list):
+        return value if isinstance(value, FrozenList) else FrozenList(freeze(v) for v in value)
+
+    return value
+
+
+def _freeze_json_object(pairs):
+    """ json object_pairs_hook that makes objects read-only as they are parsed, nested
+    objects are already frozen when their parent is, so only lists need to be walked
+    """
+    return FrozenDict((k, freeze(v) if type(v) is list else v) for k, v in pairs)
+
+
+def frozen_json_loads(string):
+    """ json.loads, with all dicts and lists read-only (as freeze(json.loads(string))) """
+    return freeze(json.loads(string, object_pairs_hook=_freeze_json_object))
+
+
+def thaw(value):
+    """ returns a mutable copy of a frozen value """
+    if isinstance(value, dict):
+        return {k: thaw(v) for k, v in value.items()}
+
+    if isinstance(value, list):
+        return [thaw(v) for v in value]
+
+    return value
+
+
 class Crypto:
+    """ envelope encryption. Data is encrypted with a random data key (AES-GCM), and only the
+    data key is encrypted (wrapped) with the key derived from the password, so changing the
+    password only needs the data key to be wrapped again. A new Crypto has a new data key,
+    which is replaced by a file's own data key when it is read (see unwrap_data_key).
+
+    Values encrypted by previous versions, directly with the password's key (fernet tokens),
+    can still be decrypted.
+    """
+
+    # prefix of tokens encrypted with the data key. '.' isn't in the (urlsafe base64)
+    # alphabet of fernet tokens, so they can't be mistaken for each other
+    TOKEN_PREFIX = 'dk.'
+
+    NONCE_SIZE = 12
 
     def __init__(self, password):
-        self._fernet = fernet.Fernet(self.key_from_password(password))
+        self.set_password(password)
+        self.set_data_key(AESGCM.generate_key(bit_length=256))
+
+    def set_password(self, password):
+        """ changes the key that the data key is wrapped with, the data key itself is unchanged """
+        key = self.key_from_password(password)
+        self._wrapping_key = AESGCM(hashlib.sha256(b'key-wrap' + key).digest())
+
+        # for values encrypted before envelope encryption
+        self._fernet = fernet.Fernet(key)
+
+    def set_data_key(self, data_key):
+        self._data_key = data_key
+        self._aes_gcm = AESGCM(data_key)
+        # separate key for blind_index, derived from the data key
+        self._index_key = hashlib.sha256(b'index' + data_key).digest()
+
+    def wrap_data_key(self):
+        """ returns the data key encrypted with the password's key """
+        return self._encrypt(self._wrapping_key, self._data_key, b'data key')
+
+    def unwrap_data_key(self, wrapped_key):
+        """ sets the data key from wrap_data_key's output, raises fernet.InvalidToken if the password is wrong """
+        self.set_data_key(self._decrypt(self._wrapping_key, wrapped_key, b'data key'))
 
     @staticmethod
     def key_from_password(password, iterations=100_000):
@@ -38,47 +148,803 @@ class Crypto:
         b_key = hashlib.pbkdf2_hmac('sha256', b_password, b'', iterations)
         return base64.urlsafe_b64encode(b_key)
 
+    def _encrypt(self, aes_gcm, data, associated_data=None, nonce=None):
+        nonce = nonce or os.urandom(self.NONCE_SIZE)
+        return nonce + aes_gcm.encrypt(nonce, data, associated_data)
+
+    def _decrypt(self, aes_gcm, data, associated_data=None):
+        try:
+            return aes_gcm.decrypt(data[:self.NONCE_SIZE], data[self.NONCE_SIZE:], associated_data)
+        except InvalidTag:
+            raise fernet.InvalidToken from None
+
     def encrypt(self, string):
-        token = self._fernet.encrypt(string.encode('utf-8'))
-        return token.decode('utf-8')
+        """ returns string encrypted with the data key, as a string token """
+        token = base64.urlsafe_b64encode(self._encrypt(self._aes_gcm, string.encode('utf-8')))
+        return self.TOKEN_PREFIX + token.decode('ascii')
+
+    def encrypt_many(self, strings):
+        """ returns a list of strings encrypted as with encrypt, in one batch """
+        nonces = os.urandom(self.NONCE_SIZE * len(strings))
+        b64encode = base64.urlsafe_b64encode
+
+        return [self.TOKEN_PREFIX + b64encode(self._encrypt(self._aes_gcm, s.encode('utf-8'),
+                                                            nonce=nonces[i:i + self.NONCE_SIZE])).decode('ascii')
+                for i, s in zip(range(0, len(nonces), self.NONCE_SIZE), strings)]
 
     def decrypt(self, string_token):
+        """ raises fernet.InvalidToken if string_token can't be decrypted """
+        if string_token.startswith(self.TOKEN_PREFIX):
+            data = base64.urlsafe_b64decode(string_token[len(self.TOKEN_PREFIX):])
+            return self._decrypt(self._aes_gcm, data).decode('utf-8')
+
         str_bytes = self._fernet.decrypt(string_token.encode('utf-8'))
         return str_bytes.decode('utf-8')
 
+    def decrypt_many(self, string_tokens):
+        return [self.decrypt(t) for t in string_tokens]
+
+    def encrypt_bytes(self, data, associated_data=None):
+        """ returns data encrypted with the data key (nonce, then ciphertext and tag). Unlike
+        encrypt, the result is binary, so it is a fixed 28 bytes longer than data
+        """
+        return self._encrypt(self._aes_gcm, data, associated_data)
+
+    def decrypt_bytes(self, data, associated_data=None):
+        """ raises fernet.InvalidToken if data can't be decrypted (as decrypt does) """
+        return self._decrypt(self._aes_gcm, data, associated_data)
+
+    def blind_index(self, string):
+        """ returns a keyed hash of string, for looking up encrypted values by e.g txid without storing the txid """
+        return hmac.new(self._index_key, string.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+class DataFile:
+    """ encrypted storage of a DataStore's data.
+
+    file_path holds a snapshot of all of the data, split into segments that are each
+    encrypted separately (segments maps segment names to their keys, other keys are kept in
+    the DEFAULT_SEGMENT). A snapshot only re-encrypts the segments whose values changed since
+    the last one, so e.g api data can be written without re-encrypting wallet secrets.
+
+    Files are in a binary container format: HEADER, the wrapped data key (see Crypto), the
+    snapshot's base (see below), then each segment's name and payload, each prefixed by its
+    length. A payload is the segment's
+    values as compact json, zlib compressed, then encrypted with Crypto.encrypt_bytes (so it
+    isn't base64 expanded). Files from before the container format (one fernet token of all
+    of the data, encrypted with the password's key) are rewritten in it when read.
+
+    Without journal mode,
+    every write rewrites the snapshot. In journal mode, a write appends an encrypted (and so
+    authenticated) record of only the changed keys to file_path + '.journal' (after HEADER and
+    the sha256 of the snapshot the journal follows, length prefixed payloads as above), and the
+    journal is compacted into a new snapshot in a background thread once it grows past
+    compact_size bytes. Reading the data replays the journal onto the snapshot, so a journal is
+    picked up whatever the mode is.
+
+    A record's associated data is its index in the journal and the snapshot's hash, so records
+    can't be replayed twice, reordered or moved onto another snapshot. A record that can't be
+    decrypted (i.e a write torn by a crash, or a gap) and everything after it is truncated from
+    the journal when it is read.
+
+    Compacting writes the new snapshot before the journal's compacted records are removed. The
+    snapshot's base is the hash of the snapshot it was compacted from and how many of that
+    journal's records it includes, so after a crash in between the records that follow them
+    are still replayed (and the data is rewritten).
+    """
+
+    DEFAULT_SEGMENT = 'data'
+
+    # magic bytes and format version of data files and journals
+    MAGIC = b'BSDF'
+    VERSION = 1
+    HEADER = MAGIC + bytes([VERSION])
+
+    # associated data of journal records (followed by the snapshot's hash and the record's
+    # index), segments use their names
+    JOURNAL_AD = b'journal'
+
+    HASH_SIZE = 32
+    # the base of snapshots that weren't compacted from a journal
+    NO_SNAPSHOT = bytes(HASH_SIZE)
+
+    COMPRESSION_LEVEL = 6
+
+    def __init__(self, file_path, crypto, journal=False, compact_size=1_048_576, segments=None):
+        self.file_path = file_path
+        self.journal_path = file_path + '.journal'
+        self.crypto = crypto
+        self.journal = journal
+        self.compact_size = compact_size
+
+        self._key_segments = {k: name for name, keys in (segments or {}).items() for k in keys}
+        # segment name: (payload, values) of the last snapshot read or written
+        self._segments = {}
+
+        # hashes of the last snapshot read or written and of the snapshot the journal follows
+        # (which differ while a compaction is running)
+        self._snapshot_hash = self.NO_SNAPSHOT
+        self._journal_hash = self.NO_SNAPSHOT
+        self._journal_records = 0
+        self._journal_size = 0
+        self._journal_lock = threading.Lock()
+        self._compaction_thread = None
+
+        self.bytes_written = 0
+
+    def _encode(self, values, associated_data):
+        """ returns values serialised, compressed and encrypted """
+        serialised = json.dumps(values, separators=(',', ':')).encode('utf-8')
+        return self.crypto.encrypt_bytes(zlib.compress(serialised, self.COMPRESSION_LEVEL), associated_data)
+
+    def _decode(self, payload, associated_data):
+        return frozen_json_loads(zlib.decompress(self.crypto.decrypt_bytes(payload, associated_data)))
+
+    def _journal_ad(self, snapshot_hash, index):
+        return self.JOURNAL_AD + snapshot_hash + struct.pack('>I', index)
+
+    def _read_journal(self, base_hash, base_records):
+        """ returns the journal's records that aren't part of the snapshot, truncating any torn
+        or corrupt records at its end. A journal that follows neither the snapshot nor its base
+        is truncated entirely
+        """
+        self._journal_hash = self._snapshot_hash
+        self._journal_records = 0
+        self._journal_size = 0
+
+        if not os.path.exists(self.journal_path):
+            return []
+
+        with open(self.journal_path, 'rb') as f:
+            content = f.read()
+
+        # a journal shorter than its header is a torn first write
+        header_size = len(self.HEADER) + self.HASH_SIZE
+        pos = header_size if len(content) >= header_size and content.startswith(self.MAGIC) else 0
+        journal_hash = content[len(self.HEADER):pos]
+        skip = 0
+
+        if pos:
+            self._check_version(content)
+
+            # the journal of the snapshot this one was compacted from, if the
+            # compaction didn't finish, else a journal of another snapshot
+            if journal_hash == base_hash != self.NO_SNAPSHOT:
+                skip = base_records
+            elif journal_hash != self._snapshot_hash:
+                pos = 0
+
+        records = []
+        index = 0
+        while pos:
+            if pos + 4 > len(content):
+                break
+
+            length, = struct.unpack_from('>I', content, pos)
+            end = pos + 4 + length
+            # the record's write never finished
+            if end > len(content):
+                break
+
+            try:
+                record = self._decode(content[pos + 4:end], self._journal_ad(journal_hash, index))
+            except (fernet.InvalidToken, zlib.error, ValueError):
+                break
+
+            if index >= skip:
+                records.append(record)
+
+            index += 1
+            pos = end
+
+        if pos != len(content):
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(pos)
+                os.fsync(f.fileno())
+
+        if pos:
+            self._journal_hash = journal_hash
+            self._journal_records = index
+            self._journal_size = pos
+
+        return records
+
+    def _check_version(self, content):
+        """ raises InvalidFileFormat if content isn't in a container version that can be read """
+        version = content[len(self.MAGIC)]
+        if version != self.VERSION:
+            raise InvalidFileFormat(f'Unsupported data file version ({version})')
+
+    def _read_snapshot(self, content):
+        """ returns the snapshot's data and base """
+        self._check_version(content)
+        self._snapshot_hash = hashlib.sha256(content).digest()
+
+        data = {}
+        self._segments = {}
+
+        pos = len(self.HEADER)
+        key_length = content[pos]
+        self.crypto.unwrap_data_key(content[pos + 1:pos + 1 + key_length])
+        pos += 1 + key_length
+
+        base_hash = content[pos:pos + self.HASH_SIZE]
+        base_records, = struct.unpack_from('>I', content, pos + self.HASH_SIZE)
+        pos += self.HASH_SIZE + 4
+
+        while pos < len(content):
+            name_length = content[pos]
+            name = content[pos + 1:pos + 1 + name_length]
+            pos += 1 + name_length
+
+            length, = struct.unpack_from('>I', content, pos)
+            payload = content[pos + 4:pos + 4 + length]
+            pos += 4 + length
+
+            values = self._decode(payload, name)
+            data.update(values)
+
+            self._segments[name.decode('utf-8')] = (payload, values)
+
+        return data, (base_hash, base_records)
+
+    def _read_legacy_snapshot(self, content):
+        """ returns the data of a file from before the container format, which is one fernet
+        token of all of the data (new files were written with json.dump, so in quotes)
+        """
+        content = content.decode('utf-8').strip()
+        self._segments = {}
+        self._snapshot_hash = self.NO_SNAPSHOT
+
+        if content.startswith('"'):
+            content = json.loads(content)
+
+        return dict(frozen_json_loads(self.crypto.decrypt(content)))
+
+    def read(self):
+        """ returns the data (with read-only values), raises fernet.InvalidToken if it can't be decrypted """
+        with open(self.file_path, 'rb') as d:
+            content = d.read()
+
+        current_format = content.startswith(self.MAGIC)
+        if current_format:
+            data, base = self._read_snapshot(content)
+        else:
+            data, base = self._read_legacy_snapshot(content), (self.NO_SNAPSHOT, 0)
+
+        for record in self._read_journal(*base):
+            data.update(record)
+
+        # (the journal only follows another snapshot if a compaction didn't finish)
+        if not current_format or self._journal_hash != self._snapshot_hash:
+            self.rewrite(data)
+
+        return data
+
+    def _segment_values(self, data):
+        """ returns data split into a dict of segment names and their values """
+        segments = {}
+        for k, v in data.items():
+            segments.setdefault(self._key_segments.get(k, self.DEFAULT_SEGMENT), {})[k] = v
+
+        return segments
+
+    def _write_snapshot(self, data, base=None):
+        segments = {}
+
+        for name, values in self._segment_values(data).items():
+            payload, prev_values = self._segments.get(name, (None, None))
+
+            # values are usually frozen values that are replaced when written, so
+            # the identity check finds unchanged values without comparing them
+            if prev_values is None or prev_values.keys() != values.keys() or \
+                    not all(v is prev_values[k] or v == prev_values[k] for k, v in values.items()):
+                payload = self._encode(values, name.encode('utf-8'))
+
+            segments[name] = (payload, values)
+
+        self._write_file(segments, base)
+        self._segments = segments
+
+    def _write_file(self, segments, base=None):
+        wrapped_key = self.crypto.wrap_data_key()
+        base_hash, base_records = base or (self.NO_SNAPSHOT, 0)
+
+        snapshot = [self.HEADER, bytes([len(wrapped_key)]), wrapped_key, base_hash, struct.pack('>I', base_records)]
+        for name, (payload, _) in segments.items():
+            b_name = name.encode('utf-8')
+            snapshot += [bytes([len(b_name)]), b_name, struct.pack('>I', len(payload)), payload]
+
+        snapshot = b''.join(snapshot)
+        utils.atomic_file_write(data=snapshot, file_path=self.file_path)
+        self.bytes_written += len(snapshot)
+        self._snapshot_hash = hashlib.sha256(snapshot).digest()
+
+    def _remove_journal(self):
+        with suppress(FileNotFoundError):
+            os.remove(self.journal_path)
+
+        self._journal_hash = self._snapshot_hash
+        self._journal_records = 0
+        self._journal_size = 0
+
+    def write(self, data, changes):
+        """ data is all of the data after changes (the keys/values written) are applied.
+        data must not be modified afterwards, as it may be used by a background compaction
+        """
+        if not self.journal:
+            self.rewrite(data)
+            return
+
+        with self._journal_lock:
+            payload = self._encode(changes, self._journal_ad(self._journal_hash, self._journal_records))
+            record = struct.pack('>I', len(payload)) + payload
+
+            if not self._journal_size:
+                record = self.HEADER + self._journal_hash + record
+
+            with open(self.journal_path, 'ab') as f:
+                f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._journal_size += len(record)
+            self._journal_records += 1
+            self.bytes_written += len(record)
+
+            if self._journal_size > self.compact_size and self._compaction_thread is None:
+                args = (data, self._journal_hash, self._journal_records, self._journal_size)
+                self._compaction_thread = threading.Thread(target=self._compact, args=args,
+                                                           daemon=True, name='DATA_COMPACTION_THREAD')
+                self._compaction_thread.start()
+
+    def _compact(self, data, journal_hash, journal_records, journal_size):
+        """ writes data as the new snapshot, then removes the first journal_records records (the
+        first journal_size bytes) of the journal, which are already included in data
+        """
+        try:
+            self._write_snapshot(data, base=(journal_hash, journal_records))
+
+            with self._journal_lock:
+                with open(self.journal_path, 'rb') as f:
+                    f.seek(journal_size)
+                    remaining = f.read()
+
+                # records written since the compaction started are encrypted again for the new snapshot
+                journal = [self.HEADER, self._snapshot_hash]
+                pos = 0
+                for index in range(self._journal_records - journal_records):
+                    length, = struct.unpack_from('>I', remaining, pos)
+                    compressed = self.crypto.decrypt_bytes(remaining[pos + 4:pos + 4 + length],
+                                                           self._journal_ad(journal_hash, journal_records + index))
+                    payload = self.crypto.encrypt_bytes(compressed, self._journal_ad(self._snapshot_hash, index))
+
+                    journal += [struct.pack('>I', len(payload)), payload]
+                    pos += 4 + length
+
+                journal = b''.join(journal)
+                tmp_path = self.journal_path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(journal)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                os.replace(tmp_path, self.journal_path)
+                self._journal_hash = self._snapshot_hash
+                self._journal_records -= journal_records
+                self._journal_size = len(journal)
+                self.bytes_written += len(journal)
+
+        finally:
+            self._compaction_thread = None
+
+    def wait_for_compaction(self):
+        thread = self._compaction_thread
+        if thread is not None:
+            thread.join()
+
+    def rewrite(self, data):
+        """ writes all of data as the snapshot and empties the journal """
+        self.wait_for_compaction()
+
+        with self._journal_lock:
+            self._write_snapshot(data)
+            self._remove_journal()
+
+    def write_key(self, data, changes):
+        """ rewrites the whole file with data (changes included) and the data key wrapped with the
+        crypto's current password key, and empties the journal. The data key is the same, so
+        the payloads of segments that haven't changed are reused rather than encrypted again
+        """
+        self.rewrite(data)
+
+    def close(self):
+        self.wait_for_compaction()
+
+
+class SQLiteDataFile:
+    """ encrypted storage of a DataStore's data in an sqlite database.
+
+    The lists of transactions, utxos and address balances (TABLE_KEYS) are stored a row per
+    item, so a write only encrypts the items that changed, and they can be queried through
+    indexes without reading the rest of the data. The other keys are stored a row per key.
+
+    Every value is encrypted separately with the data key (field level encryption), which is
+    stored wrapped in the info table (see Crypto). Rows are looked up by the blind index
+    (Crypto.blind_index) of their txid or address, so these aren't stored in plain text
+    either. The position column keeps the order of the lists, which transaction pages are
+    read in, rows that don't change keep their position (see _positions).
+    """
+
+    # data keys stored in tables, and the table each is stored in
+    TABLE_KEYS = {
+        'TXNS': 'transactions',
+        'UNSPENT_OUTS': 'utxos',
+        'ADDRESS_BALS': 'addresses'
+    }
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS info (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS data_values (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+
+        CREATE TABLE IF NOT EXISTS transactions (row_index TEXT PRIMARY KEY, position INTEGER NOT NULL,
+                                                 value TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS transactions_position ON transactions (position);
+
+        CREATE TABLE IF NOT EXISTS transaction_io (txid_index TEXT NOT NULL, address_index TEXT NOT NULL,
+                                                   is_output INTEGER NOT NULL, n INTEGER);
+        CREATE INDEX IF NOT EXISTS transaction_io_txid ON transaction_io (txid_index);
+        CREATE INDEX IF NOT EXISTS transaction_io_address ON transaction_io (address_index);
+
+        CREATE TABLE IF NOT EXISTS utxos (row_index TEXT PRIMARY KEY, position INTEGER NOT NULL,
+                                          address_index TEXT NOT NULL, value TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS utxos_address ON utxos (address_index);
+
+        CREATE TABLE IF NOT EXISTS addresses (row_index TEXT PRIMARY KEY, position INTEGER NOT NULL,
+                                              value TEXT NOT NULL);
+    """
+
+    # first bytes of every sqlite database file
+    HEADER = b'SQLite format 3\x00'
+
+    def __init__(self, file_path, crypto, **kwargs):
+        # other kwargs are DataFile options (e.g journal), which don't apply to a database
+        self.file_path = file_path
+        self.crypto = crypto
+
+        # key: {row index: (position, item)} of the rows last read or written
+        self._rows = {}
+
+        # encrypted values written, not including the database's own overhead
+        self.bytes_written = 0
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(file_path, check_same_thread=False)
+        self._connection.execute('PRAGMA synchronous = FULL')
+
+        with self._lock, self._connection:
+            self._connection.executescript(self.SCHEMA)
+
+    @classmethod
+    def is_database(cls, file_path):
+        with open(file_path, 'rb') as f:
+            return f.read(len(cls.HEADER)) == cls.HEADER
+
+    def _encrypt(self, value):
+        token = self.crypto.encrypt(json.dumps(value))
+        self.bytes_written += len(token)
+        return token
+
+    def _decrypt(self, token):
+        return frozen_json_loads(self.crypto.decrypt(token))
+
+    def _row_index(self, key, item):
+        if key == 'TXNS':
+            return self.crypto.blind_index(item['txid'])
+
+        if key == 'UNSPENT_OUTS':
+            # [txid, output_num, address, ...]
+            return self.crypto.blind_index(f'{item[0]}:{item[1]}')
+
+        # ADDRESS_BALS items are [address, balance]
+        return self.crypto.blind_index(item[0])
+
+    def read(self):
+        """ returns the data (with read-only values), raises fernet.InvalidToken if it can't be decrypted """
+        with self._lock:
+            wrapped_key = self._connection.execute("SELECT value FROM info WHERE name = 'data_key'").fetchone()
+            if not wrapped_key:
+                raise InvalidFileFormat('Database has no data key')
+
+            self.crypto.unwrap_data_key(base64.b64decode(wrapped_key[0]))
+
+            data = {k: self._decrypt(v) for k, v in self._connection.execute('SELECT key, value FROM data_values')}
+
+            table_keys = self._connection.execute("SELECT value FROM info WHERE name = 'table_keys'").fetchone()
+            self._rows = {}
+
+            for key in json.loads(table_keys[0]) if table_keys else []:
+                rows = self._connection.execute(f'SELECT row_index, position, value FROM {self.TABLE_KEYS[key]} '
+                                                f'ORDER BY position')
+                self._rows[key] = {i: (p, self._decrypt(v)) for i, p, v in rows}
+
+                items = [item for _, item in self._rows[key].values()]
+                data[key] = {a: b for a, b in items} if key == 'ADDRESS_BALS' else items
+
+        return data
+
+    @staticmethod
+    def _positions(indexes, prev_rows, unchanged):
+        """ returns the positions of the rows with indexes, in order. Unchanged rows keep their
+        previous position where it's still in order, and the other rows are given positions
+        around them, so adding items to the start or end of a list doesn't move the rest.
+        Every row is only given a new position if there's no room left between two rows
+        """
+        positions = [None] * len(indexes)
+        last = None
+
+        for i, index in enumerate(indexes):
+            if index in unchanged:
+                position = prev_rows[index][0]
+                if last is None or position > last:
+                    positions[i] = last = position
+
+        i = 0
+        while i < len(indexes):
+            if positions[i] is not None:
+                i += 1
+                continue
+
+            j = i
+            while j < len(indexes) and positions[j] is None:
+                j += 1
+
+            lower = positions[i - 1] if i > 0 else None
+            upper = positions[j] if j < len(indexes) else None
+
+            if lower is None:
+                start = 0 if upper is None else upper - (j - i)
+            elif upper is None or upper - lower > j - i:
+                start = lower + 1
+            else:
+                return list(range(len(indexes)))
+
+            positions[i:j] = range(start, start + j - i)
+            i = j
+
+        return positions
+
+    def _write_table(self, key, value):
+        """ writes the rows of value that changed since the last read or write """
+        table = self.TABLE_KEYS[key]
+        items = [[*item] for item in value.items()] if key == 'ADDRESS_BALS' else value
+        indexes = [self._row_index(key, item) for item in items]
+
+        prev_rows = self._rows.get(key, {})
+
+        # items are usually frozen values that are replaced when written, so
+        # the identity check finds unchanged items without comparing them
+        unchanged = set()
+        for index, item in zip(indexes, items):
+            prev_item = prev_rows.get(index, (None, None))[1]
+            if prev_item is not None and (item is prev_item or item == prev_item):
+                unchanged.add(index)
+
+        rows = {}
+
+        for index, item, position in zip(indexes, items, self._positions(indexes, prev_rows, unchanged)):
+            rows[index] = (position, item)
+
+            if index in unchanged:
+                if position != prev_rows[index][0]:
+                    self._connection.execute(f'UPDATE {table} SET position = ? WHERE row_index = ?',
+                                             (position, index))
+                continue
+
+            self._delete_rows(key, [index])
+
+            if key == 'UNSPENT_OUTS':
+                self._connection.execute('INSERT OR REPLACE INTO utxos VALUES (?, ?, ?, ?)',
+                                         (index, position, self.crypto.blind_index(item[2]), self._encrypt(item)))
+            else:
+                self._connection.execute(f'INSERT OR REPLACE INTO {table} VALUES (?, ?, ?)',
+                                         (index, position, self._encrypt(item)))
+
+            if key == 'TXNS':
+                self._connection.executemany(
+                    'INSERT INTO transaction_io VALUES (?, ?, ?, ?)',
+                    [(index, self.crypto.blind_index(io['address']), is_output, io.get('n'))
+                     for is_output, io_list in enumerate((item['inputs'], item['outputs']))
+                     for io in io_list]
+                )
+
+        self._delete_rows(key, prev_rows.keys() - rows.keys())
+        self._rows[key] = rows
+
+    def _delete_rows(self, key, indexes):
+        indexes = [(i,) for i in indexes]
+        self._connection.executemany(f'DELETE FROM {self.TABLE_KEYS[key]} WHERE row_index = ?', indexes)
+
+        if key == 'TXNS':
+            self._connection.executemany('DELETE FROM transaction_io WHERE txid_index = ?', indexes)
+
+    def _write_changes(self, data, changes):
+        for k, v in changes.items():
+            if k in self.TABLE_KEYS:
+                self._write_table(k, v)
+            else:
+                self._connection.execute('INSERT OR REPLACE INTO data_values VALUES (?, ?)', (k, self._encrypt(v)))
+
+        table_keys = [k for k in self.TABLE_KEYS if k in data]
+        self._connection.execute("INSERT OR REPLACE INTO info VALUES ('table_keys', ?)", (json.dumps(table_keys),))
+
+    def write(self, data, changes):
+        """ writes changes (the keys/values changed in data) in one database transaction """
+        with self._lock, self._connection:
+            self._write_changes(data, changes)
+
+    def _write_key(self):
+        wrapped_key = base64.b64encode(self.crypto.wrap_data_key()).decode('ascii')
+        self._connection.execute("INSERT OR REPLACE INTO info VALUES ('data_key', ?)", (wrapped_key,))
+
+    def rewrite(self, data):
+        """ replaces everything stored with data, every row is encrypted again """
+        with self._lock, self._connection:
+            for table in ('info', 'data_values', 'transaction_io', *self.TABLE_KEYS.values()):
+                self._connection.execute(f'DELETE FROM {table}')
+
+            self._rows = {}
+            self._write_key()
+            self._write_changes(data, data)
+
+    def write_key(self, data, changes):
+        """ writes changes along with the data key, wrapped with the crypto's current password key """
+        with self._lock, self._connection:
+            self._write_key()
+            self._write_changes(data, changes)
+
+    def wait_for_compaction(self):
+        pass
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def transactions_page(self, offset=0, limit=50):
+        """ returns limit transactions, starting at offset, in the order that they are stored """
+        with self._lock:
+            rows = self._connection.execute('SELECT value FROM transactions ORDER BY position LIMIT ? OFFSET ?',
+                                            (limit, offset)).fetchall()
+
+        return [self._decrypt(v) for v, in rows]
+
+    def transaction(self, txid):
+        """ returns the transaction with txid, or None if it isn't stored """
+        with self._lock:
+            row = self._connection.execute('SELECT value FROM transactions WHERE row_index = ?',
+                                           (self.crypto.blind_index(txid),)).fetchone()
+
+        return self._decrypt(row[0]) if row else None
+
+    def address_transactions(self, address):
+        """ returns the transactions with address in their inputs or outputs """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT value FROM transactions WHERE row_index IN '
+                '(SELECT txid_index FROM transaction_io WHERE address_index = ?) ORDER BY position',
+                (self.crypto.blind_index(address),)
+            ).fetchall()
+
+        return [self._decrypt(v) for v, in rows]
+
+    def address_utxos(self, address):
+        """ returns the unspent outputs of address """
+        with self._lock:
+            rows = self._connection.execute('SELECT value FROM utxos WHERE address_index = ? ORDER BY position',
+                                            (self.crypto.blind_index(address),)).fetchall()
+
+        return [self._decrypt(v) for v, in rows]
+
+
+# DataStore storage backends
+BACKENDS = {
+    'file': DataFile,
+    'sqlite': SQLiteDataFile
+}
+
+
+def open_data_file(file_path, crypto, backend=None, **kwargs):
+    """ returns the storage backend instance for file_path. If backend is None, it is
+    the backend that file_path was written with (which must exist)
+    """
+    if backend is None:
+        backend = 'sqlite' if SQLiteDataFile.is_database(file_path) else 'file'
+
+    if backend not in BACKENDS:
+        raise ValueError(f'Invalid backend ({backend}), it must be one of {list(BACKENDS)}')
+
+    return BACKENDS[backend](file_path, crypto, **kwargs)
+
+
+def migrate_data_file(file_path, password, backend, segments=None):
+    """ converts the DataStore file at file_path to backend, keeping a copy of the
+    original file at file_path + '.bak'. The file mustn't be in use by a DataStore.
+    """
+    crypto = Crypto(password)
+
+    source = open_data_file(file_path, crypto)
+    try:
+        data = source.read()
+    except fernet.InvalidToken:
+        raise IncorrectPasswordError('Entered password is incorrect')
+    finally:
+        source.close()
+
+    tmp_path = file_path + '.tmp'
+    with suppress(FileNotFoundError):
+        os.remove(tmp_path)
+
+    target = open_data_file(tmp_path, crypto, backend, segments=segments)
+    try:
+        target.rewrite(data)
+    finally:
+        target.close()
+
+    shutil.copy2(file_path, file_path + '.bak')
+    os.replace(tmp_path, file_path)
+
+    # the journal's records are part of the migrated data
+    with suppress(FileNotFoundError):
+        os.remove(file_path + '.journal')
+
 
 class DataStore:
 
-    # dict of file paths and instances of DataStore.
-    _instances = {}
+    # file paths and open instances of DataStore. The references are weak, so a store
+    # (and all of its decrypted data) is dropped once nothing uses it anymore, or
+    # as soon as it is closed (see self.close)
+    _instances = weakref.WeakValueDictionary()
 
     # if the same file_path is used, the same object will be returned.
     # any file should only have one DataStore object associated with them
     # as it could get messy with multiple objects writing to the same file
-    # (especially when dealing with threads).
+    # (especially when dealing with threads). Each open has to be closed, the
+    # store is only closed once everything that opened it has closed it
     def __new__(cls, file_path, *args, **kwargs):
-        if file_path in cls._instances:
-            return cls._instances[file_path]
-        else:
-            new_cls = super().__new__(cls)
-            cls._instances[file_path] = new_cls
+        instance = cls._instances.get(file_path)
+
+        if instance is None:
+            instance = super().__new__(cls)
+            cls._instances[file_path] = instance
 
-            return new_cls
+        return instance
 
     @classmethod
-    def new_data_store(cls, file_path, password, data_format, sensitive_keys=None):
+    def open_stores(cls):
+        """ returns a dict of file paths and the DataStore of each file that is open """
+        return dict(cls._instances.items())
+
+    @classmethod
+    def memory_report(cls):
+        """ returns a dict of file paths and the memory_usage of each open DataStore """
+        return {path: store.memory_usage for path, store in cls.open_stores().items()}
+
+    @classmethod
+    def new_data_store(cls, file_path, password, data_format, sensitive_keys=None, journal=False, segments=None,
+                       backend='file', flush_latency=None):
         """ alternative constructor for DataStore that creates and formats new file """
 
         # format for file, setting data format keys to their instantiated types
-        json_blank_template = json.dumps({k: v() for k, v in data_format.items()})
-        crypto = Crypto(password)
+        blank_template = {k: v() for k, v in data_format.items()}
 
-        with open(file_path, 'w') as f:
-            json.dump(crypto.encrypt(json_blank_template), f)
+        data_file = open_data_file(file_path, Crypto(password), backend, segments=segments)
+        data_file.rewrite(blank_template)
+        data_file.close()
 
-        return cls(file_path, password, data_format, sensitive_keys)
+        return cls(file_path, password, data_format, sensitive_keys, journal, segments, flush_latency)
 
-    def __init__(self, file_path, password, data_format, sensitive_keys=None):
+    def __init__(self, file_path, password, data_format, sensitive_keys=None, journal=False, segments=None,
+                 flush_latency=None):
         """
         :param file_path: path to data file
         :param password: password to encrypt data with
@@ -86,7 +952,24 @@ class DataStore:
         to new instance of allowed type when writing)
         :param sensitive_keys: a list of data_format keys that should have their values encrypted
         on top of regular file encryption
+        :param journal: if True, writes are appended to a journal instead of rewriting the file (see DataFile)
+        :param segments: a dictionary of segment names and the data_format keys stored (and encrypted)
+        together in that segment of the file (see DataFile)
+        :param flush_latency: if not None, writes are only made in memory, and are written to file
+        together up to flush_latency seconds later (see self.flush)
+
+        The file's backend (see BACKENDS) is detected from the file, journal and segments only apply to DataFile
         """
+        # __init__ runs again when an open instance is returned by __new__, which only
+        # checks the password, so that a wrong one can't replace the key of the open store
+        if getattr(self, '_open_count', 0) > 0:
+            if not self.validate_password(password):
+                raise IncorrectPasswordError('Entered password is incorrect')
+
+            with self.write_lock:
+                self._open_count += 1
+            return
+
         self.file_path = file_path
         self.data_format = data_format
         self.sensitive_keys = sensitive_keys if sensitive_keys is not None else []
@@ -94,25 +977,45 @@ class DataStore:
 
         self.write_lock = threading.Lock()
 
+        self.flush_latency = flush_latency
+        # keys/values written in memory but not yet to file, when flush_latency is set
+        self._pending = {}
+        self._flush_timer = None
+        # held while writing to file, so that data is written in the order it was changed
+        self._flush_lock = threading.Lock()
+
+        # size of the current snapshot of the data, see self.memory_usage
+        self._memory_usage = None
+
+        self.write_count = 0
+        # writes made in memory that were written to file together with an earlier write
+        self.writes_coalesced = 0
+        self.flush_count = 0
+
         if not data_format:
             raise ValueError('Data format must be specified')
 
         if not os.path.exists(self.file_path):
             raise FileNotFoundError(f'{self.file_path} does not exist!')
 
-        if not self._check_password():
-            raise IncorrectPasswordError('Entered password is incorrect')
+        self.data_file = open_data_file(file_path, self.crypto, journal=journal, segments=segments)
 
         if not all(self.data_format[k] in (str, dict) for k in self.sensitive_keys):
             raise ValueError('Sensitive key values must be either a string or a dict')
 
         # data will be stored in memory and accessed from there after first read
-        # but data will constantly be written to file as it updates
-        self._internal_data = self._read_file()
+        # but data will constantly be written to file as it updates.
+        # (the file is only decrypted once, which also checks the password)
+        try:
+            self._internal_data = self._read_file()
+        except fernet.InvalidToken:
+            raise IncorrectPasswordError('Entered password is incorrect')
 
         # if there are any new keys in the data format that aren't present in the file, create them
         self._write_new_keys()
 
+        self._upgrade_sensitive_values()
+
         # TODO: make a password a requirement for decryption of sensitive keys,
         # TODO: not this simple hash verification
         # Storing password hash for password validation independent of
@@ -121,14 +1024,20 @@ class DataStore:
             # use internal write values as thread not started yet
             self.write_values(PASSWORD_HASH=hashlib.sha256(password.encode('utf-8')).hexdigest())
 
+        # number of opens that haven't been closed yet (see self.close)
+        self._open_count = 1
+
     @property
     def _data(self):
-        """ returns copy of data
-        self._internel_data is only accessed directly by self._write_data_to_file.
-        This is to ensure the internal object state is consistent, especially
-        when threads are being used to modify data.
+        """ returns a snapshot of the data.
+        self._internal_data is a FrozenDict of frozen values that is never modified, writes
+        replace it with an updated copy (see self._write_data_to_file). So a snapshot stays
+        consistent, and it can be shared between threads without copying it.
         """
-        return copy.deepcopy(self._internal_data)
+        if self._internal_data is None:
+            raise DataStoreClosedError(f'{self.file_path} has been closed')
+
+        return self._internal_data
 
     def _write_new_keys(self):
         """ if there are any keys present in self.data_format that
@@ -140,21 +1049,11 @@ class DataStore:
             if k not in self._data:
                 data[k] = self.data_format[k]()
 
-        self._write_data_to_file(data)
-
-    def _check_password(self):
-        try:
-            # tries to decrypt data
-            _ = self._read_file()
-            return True
-
-        except fernet.InvalidToken:
-            return False
+        if data:
+            self._write_data_to_file(data)
 
     def _read_file(self):
-        with open(self.file_path, 'r') as d:
-            data = self.crypto.decrypt(d.read())
-            return json.loads(data)
+        return freeze(self.data_file.read())
 
     def _write_data_to_file(self, data):
         """ data should be a dict of self.data_format key/values to be updated in the file """
@@ -164,29 +1063,216 @@ class DataStore:
         # if data is invalid for json.dumps it will raise exception here before file is overwritten
         json.dumps(data)
 
+        # frozen outside of the lock, as it copies the values
+        data = {k: freeze(v) for k, v in data.items()}
+
         with self.write_lock:
-            # update data in memory
-            self._internal_data.update(data)
+            # new data in memory (the current snapshot may still be in use by readers)
+            internal_data = FrozenDict({**self._data, **data})
+            self.write_count += 1
+
+            if self.flush_latency is None:
+                self.data_file.write(internal_data, data)
+                self.flush_count += 1
+
+            else:
+                if self._pending:
+                    self.writes_coalesced += 1
+
+                self._pending.update(data)
+                self._start_flush_timer()
+
+            self._internal_data = internal_data
+            self._memory_usage = None
+
+    def _start_flush_timer(self):
+        """ must be called with self.write_lock held """
+        if self._flush_timer is None:
+            # not a daemon thread, so that pending writes are still written if the program exits
+            self._flush_timer = threading.Timer(self.flush_latency, self.flush)
+            self._flush_timer.name = 'DATA_FLUSH_THREAD'
+            self._flush_timer.start()
+
+    def flush(self):
+        """ writes any writes that were only made in memory (see flush_latency) to file.
+        Should be called before the program exits, and before anything that depends on
+        data being on disk (DataStore can also be used as a context manager that flushes on exit)
+        """
+        with self._flush_lock:
+            with self.write_lock:
+                pending, self._pending = self._pending, {}
+                data = self._internal_data
+                self._flush_timer = None
+
+            if not pending:
+                return
+
+            try:
+                self.data_file.write(data, pending)
+                self.flush_count += 1
+
+            except BaseException:
+                # kept to be written again by the next flush
+                with self.write_lock:
+                    self._pending = {**pending, **self._pending}
+                    self._start_flush_timer()
+                raise
+
+    def close(self):
+        """ closes one open of the store. Once every open has been closed, any pending writes
+        are written to file, the file is closed and the store is removed from the open stores,
+        dropping its data from memory. The store can't be used after that (DataStoreClosedError),
+        a new DataStore has to be opened instead
+        """
+        with self.write_lock:
+            if self._internal_data is None:
+                return
+
+            self._open_count -= 1
+            if self._open_count > 0:
+                return
+
+            flush_timer = self._flush_timer
+
+        self.flush()
+
+        if flush_timer is not None:
+            flush_timer.cancel()
+
+        with self._flush_lock, self.write_lock:
+            self.data_file.close()
+            self._internal_data = None
+            self._memory_usage = None
+
+        # a store opened for the same path after this one was closed isn't removed
+        if self._instances.get(self.file_path) is self:
+            with suppress(KeyError):
+                del self._instances[self.file_path]
+
+    @property
+    def closed(self):
+        return self._internal_data is None
+
+    @staticmethod
+    def _deep_sizeof(obj):
+        """ returns the size in bytes of obj and of all of the dicts, lists and values in it.
+        Objects that are in obj more than once (e.g interned strings) are only counted once
+        """
+        seen = set()
+        size = 0
+        stack = [obj]
+
+        while stack:
+            o = stack.pop()
+            if id(o) in seen:
+                continue
+
+            seen.add(id(o))
+            size += sys.getsizeof(o)
 
-            utils.atomic_file_write(data=self.crypto.encrypt(json.dumps(self._internal_data)),
-                                    file_path=self.file_path)
+            if isinstance(o, dict):
+                stack.extend(o.keys())
+                stack.extend(o.values())
+            elif isinstance(o, (list, tuple)):
+                stack.extend(o)
+
+        return size
+
+    @property
+    def memory_usage(self):
+        """ approximate number of bytes used by the data of the store, which is all kept in
+        memory (see self._data). It is only counted again after the data has changed
+        """
+        snapshot = self._data
+        memory_usage = self._memory_usage
+
+        if memory_usage is None or memory_usage[0] is not snapshot:
+            memory_usage = (snapshot, self._deep_sizeof(snapshot))
+
+            with self.write_lock:
+                # not cached if the data changed while it was being counted
+                if self._internal_data is snapshot:
+                    self._memory_usage = memory_usage
+
+        return memory_usage[1]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+
+    @property
+    def stats(self):
+        """ counters of writes in memory, writes coalesced into one write to file,
+        writes to file, and the number of bytes written to file
+        """
+        return {
+            'writes': self.write_count,
+            'writes_coalesced': self.writes_coalesced,
+            'flushes': self.flush_count,
+            'bytes_written': self.data_file.bytes_written
+        }
+
+    @staticmethod
+    def _map_dict_string_values(dict_, func):
+        """ returns a copy of dict_ with all string values, and all string values in nested dicts,
+        replaced by the values of func, which is called once with a list of all of the strings
+        """
+        strings = []
+
+        def collect(d):
+            for v in d.values():
+                if isinstance(v, str):
+                    strings.append(v)
+                elif isinstance(v, dict):
+                    collect(v)
+
+        collect(dict_)
+        values = iter(func(strings))
+
+        def replace(d):
+            return {k: next(values) if isinstance(v, str) else replace(v) if isinstance(v, dict) else v
+                    for k, v in d.items()}
+
+        return replace(dict_)
 
     def _encrypt_dict_string_values(self, dict_):
-        """ goes through a dict and encrypts all string values, and all string values in nested dicts """
+        """ returns a copy of dict_ with all string values, and all string values in nested dicts,
+        encrypted (in one batch, see Crypto.encrypt_many)
+        """
+        return self._map_dict_string_values(dict_, self.crypto.encrypt_many)
+
+    def _upgrade_sensitive_values(self):
+        """ encrypts sensitive values that were encrypted with the password's key (before the
+        data key) with the data key, so that they don't depend on the password anymore
+        """
+        def upgrade(token):
+            if token.startswith(Crypto.TOKEN_PREFIX):
+                return token
+
+            # values that can't be decrypted are left as they are
+            with suppress(fernet.InvalidToken):
+                return self.crypto.encrypt(self.crypto.decrypt(token))
+
+            return token
 
-        # work with copy of dict that will overwrite dict_, to prevent a half encrypted dict left
-        # after a possible max recursion depth exception
-        # (need deepcopy to copy dicts and not references to same dict)
-        copy_dict = copy.deepcopy(dict_)
+        data = {}
+        for k in self.sensitive_keys:
+            value = self._data.get(k)
 
-        for k, v in copy_dict.items():
-            if isinstance(v, str):
-                copy_dict.update({k: self.crypto.encrypt(v)})
+            if isinstance(value, str) and value:
+                upgraded = upgrade(value)
+            elif isinstance(value, dict):
+                upgraded = self._map_dict_string_values(value, lambda strings: [upgrade(t) for t in strings])
+            else:
+                continue
 
-            elif isinstance(v, dict):
-                self._encrypt_dict_string_values(v)
+            if upgraded != value:
+                data[k] = upgraded
 
-        dict_.update(copy_dict)
+        if data:
+            self._write_data_to_file(data)
 
     def write_values(self, **kwargs):
         data = {}
@@ -209,8 +1295,7 @@ class DataStore:
                     # to limit its exposure in ram, unencrypted
                     if k in self.sensitive_keys:
                         if isinstance(v, dict):
-                            self._encrypt_dict_string_values(v)
-                            data.update({k: v})
+                            data[k] = self._encrypt_dict_string_values(v)
 
                         elif isinstance(v, str):
                             data[k] = self.crypto.encrypt(v)
@@ -232,17 +1317,53 @@ class DataStore:
             return self.crypto.decrypt(value)
 
         else:
-            # return deepcopy for other types than immutable string (dicts mainly)
-            return copy.deepcopy(value)
+            # dicts and lists are frozen, so they can be returned without copying them.
+            # (callers that need to modify a value should use list()/dict() or thaw())
+            return value
+
+    def _flush_transactions(self):
+        """ the sqlite queries only see what is on disk, so TXNS that are
+        still waiting to be written (see flush_latency) are written first
+        """
+        with self.write_lock:
+            pending = 'TXNS' in self._pending
+
+        if pending:
+            self.flush()
+
+    def transactions_page(self, offset=0, limit=50):
+        """ returns limit of the TXNS, starting at offset """
+        if isinstance(self.data_file, SQLiteDataFile):
+            self._flush_transactions()
+            return self.data_file.transactions_page(offset, limit)
+
+        return self.get_value('TXNS')[offset:offset + limit]
+
+    def address_transactions(self, address):
+        """ returns the TXNS with address in their inputs or outputs """
+        if isinstance(self.data_file, SQLiteDataFile):
+            self._flush_transactions()
+            return self.data_file.address_transactions(address)
+
+        return [t for t in self.get_value('TXNS')
+                if any(io['address'] == address for io in (*t['inputs'], *t['outputs']))]
 
     def change_password(self, new_password):
-        data = {}
-        # make new fernet key from password
-        self.crypto._fernet = fernet.Fernet(self.crypto.key_from_password(new_password))
-        # store new password hash
-        data['PASSWORD_HASH'] = hashlib.sha256(new_password.encode('utf-8')).hexdigest()
-        # write data to file (will encrypt data using new fernet key)
-        self._write_data_to_file(data)
+        self.flush()
+
+        with self._flush_lock:
+            # only the key that the data key is wrapped with changes, so nothing
+            # has to be encrypted again, apart from the new password hash
+            self.crypto.set_password(new_password)
+            data = {'PASSWORD_HASH': hashlib.sha256(new_password.encode('utf-8')).hexdigest()}
+
+            # written together with the new wrapped key, so the file can't be left
+            # with the password hash of one password and the key of another
+            with self.write_lock:
+                internal_data = FrozenDict({**self._data, **data})
+                self.data_file.write_key(internal_data, data)
+                self._internal_data = internal_data
+                self._memory_usage = None
 
     # for use outside this class, where the password isn't actually used
     # to decrypt the file, but still needs to be verified for security
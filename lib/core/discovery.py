@@ -0,0 +1,238 @@
+# Copyright (C) 2018  Gavin Shaughnessy
+#
+# Bit-Store is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" BIP44 account discovery, for finding which accounts of a seed have been used,
+across BIP44 (p2pkh), BIP49 (p2sh-p2wpkh) and BIP84 (p2wpkh) derivation paths
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import NamedTuple
+
+from extern.bip32utils.BIP32Key import BIP32Key, BIP32_HARDEN
+
+from . import blockchain, config, structs
+from .hd import HDWallet, AddressStream, chain_addresses
+from ..exceptions.hd_exceptions import PublicHDWalletObjectError
+
+
+# address type of each purpose (the first level of the derivation path)
+PURPOSES = {
+    44: 'p2pkh',
+    49: 'p2sh-p2wpkh',
+    84: 'p2wpkh'
+}
+
+
+class DiscoveredAccount(NamedTuple):
+    """ a used account found by AccountDiscovery """
+    purpose: int
+    account: int
+    path: str
+    account_public_key: str
+    address_type: str
+    # index after the last used address of each chain, i.e the number of
+    # addresses a wallet needs to derive to see all of the account's funds
+    receiving_index: int
+    change_index: int
+    tx_count: int
+    # [confirmed, unconfirmed] balance in satoshis
+    balance: list
+
+    @property
+    def has_funds(self):
+        return any(self.balance)
+
+
+class _ChainScan:
+    """ gap limit scan of an account's receiving or change chain. The chain's addresses come
+    from an endless AddressStream, which is only derived as far as the scan gets
+    """
+
+    def __init__(self, chain_ck, purpose, gap_limit):
+        self.gap_limit = gap_limit
+        self.stream = AddressStream(partial(chain_addresses, chain_ck, PURPOSES[purpose]))
+
+        self.next_index = 0
+        self.last_used = -1
+
+    @property
+    def done(self):
+        """ True once gap_limit unused addresses in a row have been checked """
+        return self.next_index - self.last_used - 1 >= self.gap_limit
+
+    def next_batch(self):
+        """ returns the addresses needed to reach the gap limit from the last used address """
+        return [a for _, a in self.stream.take(self.last_used + 1 + self.gap_limit - self.next_index)]
+
+    def update(self, addresses, used_addresses):
+        """ addresses must be the last batch returned by next_batch """
+        for i, address in enumerate(addresses, self.next_index):
+            if address in used_addresses:
+                self.last_used = i
+
+        self.next_index += len(addresses)
+
+
+class _AccountScan:
+
+    def __init__(self, purpose, account, path, account_ck, gap_limit):
+        self.purpose = purpose
+        self.account = account
+        self.path = path
+        self.account_ck = account_ck
+
+        self.receiving = _ChainScan(account_ck.ChildKey(0), purpose, gap_limit)
+        self.change = _ChainScan(account_ck.ChildKey(1), purpose, gap_limit)
+
+        self.txids = set()
+        self.balance = [0, 0]
+
+        self.next_started = False
+
+    @property
+    def is_used(self):
+        """ as per BIP44, an account is only used if its receiving chain has transactions """
+        return self.receiving.last_used >= 0
+
+    @property
+    def done(self):
+        # the change chain of an unused account doesn't need to be finished
+        return self.receiving.done and (self.change.done or not self.is_used)
+
+    def result(self):
+        return DiscoveredAccount(purpose=self.purpose,
+                                 account=self.account,
+                                 path=self.path,
+                                 account_public_key=self.account_ck.ExtendedKey(private=False),
+                                 address_type=PURPOSES[self.purpose],
+                                 receiving_index=self.receiving.last_used + 1,
+                                 change_index=self.change.last_used + 1,
+                                 tx_count=len(self.txids),
+                                 balance=self.balance)
+
+
+class AccountDiscovery:
+    """ finds the used accounts of a master private key, following the BIP44 account
+    discovery rules: accounts of each purpose are scanned in order, each chain is scanned
+    until gap_limit unused addresses in a row are found, and the scan of a purpose stops
+    at the first account whose receiving chain has no transactions.
+
+    Every round, the next batch of addresses of each chain being scanned is requested
+    from the blockchain api concurrently (one request per batch). All accounts that
+    can be scanned at the same time are, i.e an account is started as soon as the
+    receiving chain of the account before it is found to be used.
+
+    api_factory is called with a list of addresses and must return a _BlockchainBaseClass
+    instance for them. It defaults to the configured BLOCKCHAIN_API_SOURCE. BIP84 is only
+    scanned when the api supports bech32 addresses.
+    """
+
+    def __init__(self, master_key, purposes=tuple(PURPOSES), gap_limit=20, max_accounts=20,
+                 api_factory=None, bech32_support=False, max_workers=4):
+
+        if not HDWallet.check_xkey(master_key):
+            raise ValueError(f'Invalid Extended Key: ({master_key})')
+
+        if master_key[1:4] == 'pub':
+            raise PublicHDWalletObjectError('Account keys cannot be derived from a public key')
+
+        if gap_limit <= 0:
+            raise ValueError('Gap limit must be a positive int')
+
+        if any(p not in PURPOSES for p in purposes):
+            raise ValueError(f'Purposes must be in {list(PURPOSES)}')
+
+        if api_factory is None:
+            source = config.get('BLOCKCHAIN_API_SOURCE')
+            api_factory = partial(blockchain.blockchain_api, source, refresh_rate=config.get('BLOCKCHAIN_API_REFRESH'))
+            bech32_support = blockchain.blockchain_api_class(source).bech32_support
+
+        self.master_ck = BIP32Key.fromExtendedKey(master_key)
+        self.purposes = [p for p in purposes if p != 84 or bech32_support]
+        self.gap_limit = gap_limit
+        self.max_accounts = max_accounts
+        self.api_factory = api_factory
+        self.max_workers = max_workers
+
+        # BIP44 coin type
+        self.coin = 1 if self.master_ck.testnet else 0
+
+    def _account_scan(self, purpose, account):
+        path = f"{purpose}'/{self.coin}'/{account}'"
+
+        ck = self.master_ck
+        for i in (purpose, self.coin, account):
+            ck = ck.ChildKey(i + BIP32_HARDEN)
+
+        return _AccountScan(purpose, account, path, ck, self.gap_limit)
+
+    def _query(self, addresses):
+        """ returns the used addresses, txids and [confirmed, unconfirmed] balance of addresses """
+        api = self.api_factory(addresses)
+
+        txn_list = api.transactions
+        used_addresses = structs.Transactions.from_list(txn_list).find_address_with_txns(set(addresses))
+        txids = {t['txid'] for t in txn_list}
+
+        utxos = [structs.UTXOData(*u) for u in api.unspent_outputs]
+        balance = [sum(u.value for u in utxos if u.is_confirmed()),
+                   sum(u.value for u in utxos if not u.is_confirmed())]
+
+        return used_addresses, txids, balance
+
+    def discover(self):
+        """ returns a list of DiscoveredAccount for every used account, sorted by purpose and account.
+        BlockchainConnectionError is raised if the api cannot be reached
+        """
+        scans = [self._account_scan(p, 0) for p in self.purposes]
+        found = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while scans:
+                work = [(scan, chain) for scan in scans for chain in (scan.receiving, scan.change)
+                        if not chain.done]
+                batches = [chain.next_batch() for _, chain in work]
+
+                for (scan, chain), addresses, result in zip(work, batches, executor.map(self._query, batches)):
+                    used_addresses, txids, balance = result
+
+                    chain.update(addresses, used_addresses)
+                    scan.txids |= txids
+                    scan.balance = [a + b for a, b in zip(scan.balance, balance)]
+
+                next_scans = []
+                for scan in scans:
+                    # the next account is started as soon as this one is known to be used
+                    if scan.is_used and not scan.next_started and scan.account + 1 < self.max_accounts:
+                        scan.next_started = True
+                        next_scans.append(self._account_scan(scan.purpose, scan.account + 1))
+
+                    if scan.done:
+                        if scan.is_used:
+                            found.append(scan.result())
+                    else:
+                        next_scans.append(scan)
+
+                scans = next_scans
+
+        return sorted(found, key=lambda a: (a.purpose, a.account))
+
+
+def discover_accounts(mnemonic, passphrase='', testnet=False, **kwargs):
+    """ returns the used accounts of a mnemonic (see AccountDiscovery) """
+    hd_obj = HDWallet.from_mnemonic(mnemonic, 'm', passphrase, testnet=testnet, multi_processing=False)
+
+    return AccountDiscovery(hd_obj.master_private_key, **kwargs).discover()
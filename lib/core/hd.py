@@ -14,22 +14,301 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import os
+import atexit
+import bisect
 import hashlib
-import binascii
 import string
+import threading
 import multiprocessing
-from operator import itemgetter
-from functools import lru_cache
+import collections
+from functools import lru_cache, partial
 from contextlib import suppress
 
-import bitstring
-import base58
+from extern.bip32utils import Base58
 from extern.bip32utils.BIP32Key import BIP32Key, BIP32_HARDEN
 
-from .utils import IterableQueue
 from ..exceptions.hd_exceptions import *
 
 
+def chain_addresses(chain_ck, address_type, start, stop):
+    """ returns the addresses of chain_ck's children in range(start, stop), address_type
+    is 'p2pkh', 'p2sh-p2wpkh' or 'p2wpkh'
+    """
+    # ChildKeys derives the whole range together, sharing the curve work between keys
+    keys = chain_ck.ChildKeys(range(start, stop))
+
+    if address_type == 'p2wpkh':
+        return [k.P2WPKHAddress() for k in keys]
+
+    if address_type == 'p2sh-p2wpkh':
+        payloads = [k.P2WPKHoP2SHAddress(encoded=False) for k in keys]
+    elif address_type == 'p2pkh':
+        payloads = [k.Address(encoded=False) for k in keys]
+    else:
+        raise ValueError(f'Unknown address type: {address_type}')
+
+    return Base58.check_encode_many(payloads)
+
+
+def _derive_range(chain_ck, kind, segwit, start, stop):
+    """ returns the addresses (kind='address') or WIF keys (kind='wif') of
+    chain_ck's children in range(start, stop)
+    """
+    if kind == 'wif':
+        return [chain_ck.ChildKey(i).WalletImportFormat() for i in range(start, stop)]
+
+    return chain_addresses(chain_ck, 'p2sh-p2wpkh' if segwit else 'p2pkh', start, stop)
+
+
+# chain keys that a DerivationPool worker process has already parsed, keyed by extended key
+_worker_chain_keys = collections.OrderedDict()
+
+
+def _derive_chunk(task):
+    """ DerivationPool task, run in a worker process """
+    chain_xkey, kind, segwit, start, stop = task
+
+    chain_ck = _worker_chain_keys.pop(chain_xkey, None)
+    if chain_ck is None:
+        chain_ck = BIP32Key.fromExtendedKey(chain_xkey)
+
+    # only keep the most recently used keys, so workers don't hold on to every wallet's keys
+    _worker_chain_keys[chain_xkey] = chain_ck
+    while len(_worker_chain_keys) > DerivationPool.worker_cache_size:
+        _worker_chain_keys.popitem(last=False)
+
+    return _derive_range(chain_ck, kind, segwit, start, stop)
+
+
+class DerivationPool:
+    """ long-lived process pool for deriving addresses and WIF keys.
+
+    Jobs are split into index ranges of self.chunk_size. A task only carries the chain's
+    extended key and its range (workers parse each chain key once and keep it), and results
+    are returned in order through imap, so no Manager process or queue is needed.
+    The process pool itself is only started on first use.
+    """
+
+    # number of chain keys each worker keeps parsed
+    worker_cache_size = 4
+
+    def __init__(self, processes=None, chunk_size=16):
+        self.processes = processes if processes is not None else multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(processes=self.processes)
+
+            return self._pool
+
+    def derive(self, jobs):
+        """ jobs is a list of (chain_ck, kind, segwit, start, stop) tuples (see _derive_range).
+        Returns a list with the result list of each job
+        """
+        tasks = []
+        tasks_per_job = []
+
+        for chain_ck, kind, segwit, start, stop in jobs:
+            chain_xkey = chain_ck.ExtendedKey(private=not chain_ck.public)
+            job_tasks = [(chain_xkey, kind, segwit, i, min(i + self.chunk_size, stop))
+                         for i in range(start, stop, self.chunk_size)]
+
+            tasks.extend(job_tasks)
+            tasks_per_job.append(len(job_tasks))
+
+        results = self._get_pool().imap(_derive_chunk, tasks)
+
+        return [[v for _ in range(n) for v in next(results)] for n in tasks_per_job]
+
+    def shutdown(self):
+        """ stops the worker processes. The pool will be restarted if it is used again """
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
+
+
+_derivation_pool = None
+_derivation_pool_lock = threading.Lock()
+
+
+def derivation_pool():
+    """ returns the DerivationPool shared by all HDWallet instances """
+    global _derivation_pool
+
+    with _derivation_pool_lock:
+        if _derivation_pool is None:
+            _derivation_pool = DerivationPool()
+            atexit.register(_derivation_pool.shutdown)
+
+        return _derivation_pool
+
+
+def shutdown_derivation_pool():
+    if _derivation_pool is not None:
+        _derivation_pool.shutdown()
+
+
+class Bip39Wordlist:
+    """ the BIP39 english wordlist, read from file once, with a word to index dict
+    for fast mnemonic validation. Use the module level WORDLIST instance.
+    """
+
+    # md5 of the concatenated words, for checking the integrity of the word list file
+    md5_hash = '2a80fc2c95f3a4b0a5769764df251820'
+
+    # mnemonic length (in words) vs initial entropy length in bytes
+    entropy_lengths = {
+        12: 16,
+        15: 20,
+        18: 24,
+        21: 28,
+        24: 32
+    }
+
+    def __init__(self, file_path):
+        with open(file_path, 'r') as word_file:
+            self.words = tuple(word_file.read().split())
+
+        self.word_indexes = {w: i for i, w in enumerate(self.words)}
+        self.is_valid = self.md5_hash == hashlib.md5(''.join(self.words).encode()).hexdigest()
+
+        # the english list is already sorted, but prefix lookups rely on it so don't assume
+        self._sorted_words = sorted(self.words)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.word_indexes
+
+    def prefix_matches(self, prefix, limit=None):
+        """ returns the words starting with prefix in alphabetical order (for autocompletion) """
+        i = bisect.bisect_left(self._sorted_words, prefix)
+
+        matches = []
+        while i < len(self._sorted_words) and self._sorted_words[i].startswith(prefix):
+            if limit is not None and len(matches) >= limit:
+                break
+
+            matches.append(self._sorted_words[i])
+            i += 1
+
+        return matches
+
+    def mnemonic_from_entropy(self, entropy):
+        """ returns the mnemonic of the entropy bytes """
+        if len(entropy) not in self.entropy_lengths.values():
+            raise ValueError('Entropy must be either 16, 20, 24, 28 or 32 bytes long')
+
+        if not self.is_valid:
+            raise Exception('ERROR: Wordlist is not BIP39 valid '
+                            '(INVALID MD5 HASH)')
+
+        # checksum is the first (entropy bits / 32) bits of the entropy's hash
+        cs_len = len(entropy) // 4
+        checksum = hashlib.sha256(entropy).digest()[0] >> (8 - cs_len)
+        bits = int.from_bytes(entropy, 'big') << cs_len | checksum
+
+        # split bits into groups of 11, each being a word index
+        num_words = (len(entropy) * 8 + cs_len) // 11
+        return ' '.join(self.words[(bits >> (11 * i)) & 0x7FF] for i in reversed(range(num_words)))
+
+    def check_mnemonic(self, mnemonic):
+        """ Returns True if mnemonic is valid and vice-versa """
+        words = mnemonic.split(' ')
+
+        if len(words) not in self.entropy_lengths:
+            return False
+
+        bits = 0
+        for w in words:
+            try:
+                bits = bits << 11 | self.word_indexes[w]
+            except KeyError:
+                return False
+
+        ent_len = self.entropy_lengths[len(words)]
+        cs_len = ent_len // 4
+
+        entropy = (bits >> cs_len).to_bytes(ent_len, 'big')
+        checksum = bits & ((1 << cs_len) - 1)
+
+        return hashlib.sha256(entropy).digest()[0] >> (8 - cs_len) == checksum
+
+    def validate_many(self, mnemonics):
+        """ returns a list of bools, whether each mnemonic in mnemonics is valid """
+        return [self.check_mnemonic(m) for m in mnemonics]
+
+
+WORDLIST = Bip39Wordlist(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'wordlist.txt'))
+
+
+class AddressStream:
+    """ iterator that lazily derives (index, value) tuples of one chain, a small batch at a time.
+    self.cursor is the index of the next value to be yielded, so a stream can be stored and
+    resumed later with e.g HDWallet.iter_addresses(chain, start=cursor)
+    """
+
+    def __init__(self, derive_batch, start=0, stop=None, batch_size=10):
+        """
+        :param derive_batch: function taking (start, stop) that returns the list of
+        values for indexes in range(start, stop)
+        :param stop: index to stop at (exclusive), or None for an endless stream
+        """
+        if start < 0 or (stop is not None and stop < start):
+            raise ValueError('Invalid stream range')
+
+        self.cursor = start
+        self.stop = stop
+
+        self._derive_batch = derive_batch
+        self._batch_size = batch_size
+        self._buffer = collections.deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.stop is not None and self.cursor >= self.stop:
+            raise StopIteration
+
+        if not self._buffer:
+            batch_stop = self.cursor + self._batch_size
+            if self.stop is not None:
+                batch_stop = min(batch_stop, self.stop)
+
+            self._buffer.extend(self._derive_batch(self.cursor, batch_stop))
+
+        item = (self.cursor, self._buffer.popleft())
+        self.cursor += 1
+
+        return item
+
+    def take(self, count):
+        """ returns a list of the next count (index, value) tuples (fewer if the stream stops first),
+        deriving the ones that aren't already derived in one batch, whatever the batch size
+        """
+        if self.stop is not None:
+            count = min(count, self.stop - self.cursor)
+
+        count = max(count, 0)
+
+        if len(self._buffer) < count:
+            self._buffer.extend(self._derive_batch(self.cursor + len(self._buffer), self.cursor + count))
+
+        items = [(i, self._buffer.popleft()) for i in range(self.cursor, self.cursor + count)]
+        self.cursor += count
+
+        return items
+
+
 class HDWallet:
     """ implementation of the hierarchical deterministic wallet, implementing the BIP39 standard """
 
@@ -51,6 +330,47 @@ class HDWallet:
         return cls(BIP32Key.fromEntropy(seed, testnet=testnet).ExtendedKey(),
                    path, segwit, mnemonic, gap_limit, multi_processing, force_public)
 
+    @classmethod
+    def from_chain_keys(cls, receiving_key, change_key, segwit=True, gap_limit=20, multi_processing=True):
+        """ Generates a HDWallet class straight from the extended keys of its receiving and change
+        chains (see chain_keys method), which skips the seed stretching and the derivation of the
+        path. The master and account keys are unknown, so only address/WIF key derivation can be done
+        """
+        if gap_limit <= 0:
+            raise ValueError('Gap limit must be a positive int')
+
+        for key in (receiving_key, change_key):
+            if not cls.check_xkey(key):
+                raise ValueError(f'Invalid Extended Key: ({key})')
+
+        if receiving_key[1:4] != change_key[1:4]:
+            raise ValueError('Chain keys must both be either public or private')
+
+        self = cls.__new__(cls)
+
+        self.is_private = receiving_key[1:4] != 'pub'
+        self.is_segwit = segwit
+        self.bip32 = None
+        self.path = None
+
+        self.master_private_key = None
+        self.master_public_key = None
+        self.account_public_key = None
+
+        self.mnemonic = None
+        self.gap_limit = gap_limit
+        self.multi_processed = multi_processing
+
+        self._external_chain_ck = BIP32Key.fromExtendedKey(receiving_key)
+        self._internal_chain_ck = BIP32Key.fromExtendedKey(change_key)
+
+        self.is_testnet = self._external_chain_ck.testnet
+
+        self._addresses = {}
+        self._precomputed_wif_keys = None
+
+        return self
+
     def __init__(self, key, path, segwit=True, mnemonic=None, gap_limit=20, multi_processing=True,
                  force_public=False):
 
@@ -89,97 +409,35 @@ class HDWallet:
         # in the standard testnet format
         self.is_testnet = self.bip32.testnet
 
+        # public chains are derived in the pool the same way as private ones, as
+        # workers are only sent the chain's extended key (see DerivationPool)
         self.multi_processed = multi_processing
 
-        # multiprocessing currently causes issues when deriving keys from public keys.
-        # But due to the fact that only addresses can be generated from a public key,
-        # the performance hit is tolerable. If a watch only wallet is ever implemented
-        # using this class, the slight performance hit at creation is acceptable
-        if not self.is_private:
-            self.multi_processed = False
-
         self._external_chain_ck = self._account_ck.ChildKey(0)
         self._internal_chain_ck = self._account_ck.ChildKey(1)
 
-        # for multiprocessing gen of addresses/wif_keys
-        _manager = multiprocessing.Manager()
-        self._address_queue = _manager.Queue()
-        self._wif_key_queue = _manager.Queue()
+        # results of addresses(), keyed by (start_idx, gap_limit). WIF keys are never kept,
+        # apart from the ones derived by precompute(), which are handed over to the first
+        # wif_keys() call and then dropped
+        self._addresses = {}
+        self._precomputed_wif_keys = None
 
     @staticmethod
     def wordlist():
-        wl = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'wordlist.txt')
-        with open(wl, 'r') as word_file:
-            return word_file.read().split()
+        return list(WORDLIST.words)
 
-    @classmethod
-    def gen_mnemonic(cls, length=12):
+    @staticmethod
+    def gen_mnemonic(length=12):
         """ Returns a new mnemonic"""
-        wordlist = cls.wordlist()
-
-        if length not in [12, 15, 18, 21, 24]:
+        if length not in WORDLIST.entropy_lengths:
             raise ValueError('Mnemonic must be either 12, 15, 18, 21 or 24 words long')
 
-        # length of mnemonic vs initial entropy length in bytes
-        len_v_byte_size = {
-            12: 16,
-            15: 20,
-            18: 24,
-            21: 28,
-            24: 32
-        }
-
-        # Checking integrity of word list file
-        wl_hash = '2a80fc2c95f3a4b0a5769764df251820'
-        if wl_hash != hashlib.md5(''.join(wordlist).encode()).hexdigest():
-            raise Exception('ERROR: Wordlist is not BIP39 valid '
-                            '(INVALID MD5 HASH)')
-
-        # length of initial entropy in bytes
-        ent_len = len_v_byte_size[length]
-        ent = bitstring.BitArray(bytes=os.urandom(ent_len))
-
-        # gets the checksum of the original ENT
-        cs = bitstring.BitArray(bytes=hashlib.sha256(ent.bytes).digest()).bin[:len(ent.bin) // 32]
-
-        ent_cs_bits = ent.bin + cs
+        return WORDLIST.mnemonic_from_entropy(os.urandom(WORDLIST.entropy_lengths[length]))
 
-        # split bits into groups of 11
-        split_bits = [ent_cs_bits[i:i + 11] for i in range(0, len(ent_cs_bits), 11)]
-
-        word_indexes = [int(b, 2) for b in split_bits]
-
-        mnemonic = []
-        for i in word_indexes:
-            mnemonic.append(wordlist[i])
-
-        # Returns the mnemonic in string format
-        return ' '.join(mnemonic)
-
-    # Adapted from <https://tinyurl.com/ycxfjmd6>
-    @classmethod
-    def check_mnemonic(cls, mnemonic):
+    @staticmethod
+    def check_mnemonic(mnemonic):
         """ Returns True if mnemonic is valid and vice-versa"""
-        wordlist = cls.wordlist()
-
-        mnemonic = mnemonic.split(' ')
-
-        if len(mnemonic) not in [12, 15, 18, 21, 24]:
-            return False
-
-        try:
-            idx = map(lambda x: bin(wordlist.index(x))[2:].zfill(11), mnemonic)
-            b = ''.join(idx)
-        except Exception:
-            return False
-
-        len_b = len(b)
-        d = b[:len_b // 33 * 32]
-        h = b[-len_b // 33:]
-        nd = binascii.unhexlify(hex(int(d, 2))[2:].rstrip('L').zfill(len_b // 33 * 8))
-        nh = bin(int(hashlib.sha256(nd).hexdigest(), 16))[2:].zfill(256)[:len_b // 33]
-
-        return h == nh
+        return WORDLIST.check_mnemonic(mnemonic)
 
     @staticmethod
     def check_xkey(xkey, allow_testnet=True):
@@ -189,7 +447,7 @@ class HDWallet:
             xkey_version_bytes += ('043587CF', '04358394')
 
         with suppress(ValueError, TypeError):
-            if base58.b58decode_check(xkey)[:4].hex().upper() in xkey_version_bytes:
+            if Base58.check_decode(xkey)[:4].hex().upper() in xkey_version_bytes:
                 return True
 
         return False
@@ -250,97 +508,129 @@ class HDWallet:
 
         return ck
 
-    @lru_cache(maxsize=None)
-    def _gen_addresses(self, idx):
-        """ used with multiprocessing """
-        if self.is_segwit:
-            r_address = self._external_chain_ck.ChildKey(idx).P2WPKHoP2SHAddress()
-            c_address = self._internal_chain_ck.ChildKey(idx).P2WPKHoP2SHAddress()
-        else:
-            r_address = self._external_chain_ck.ChildKey(idx).Address()
-            c_address = self._internal_chain_ck.ChildKey(idx).Address()
-
-        self._address_queue.put((idx, r_address, c_address))
-
     def _multi_processed_addresses(self, start_idx=0):
         """ Returns a tuple of receiving and change addresses up to the limit specified"""
-        receiving = []
-        change = []
+        return tuple(derivation_pool().derive([
+            (self._external_chain_ck, 'address', self.is_segwit, start_idx, self.gap_limit),
+            (self._internal_chain_ck, 'address', self.is_segwit, start_idx, self.gap_limit)
+        ]))
 
-        pool = multiprocessing.Pool(processes=multiprocessing.cpu_count())
-        pool.map(self._gen_addresses, range(start_idx, self.gap_limit))
-        pool.close()
-
-        sorted_addresses = sorted(IterableQueue(self._address_queue), key=itemgetter(0))
-        for a in sorted_addresses:
-            receiving.append(a[1])
-            change.append(a[2])
+    def _non_multi_processed_addresses(self, start_idx=0):
+        receiving = [a for _, a in self.iter_addresses('receiving', start_idx, self.gap_limit)]
+        change = [a for _, a in self.iter_addresses('change', start_idx, self.gap_limit)]
 
         return receiving, change
 
-    def _non_multi_processed_addresses(self, start_idx=0):
-        """ deriving from a public key does not currently work with multiprocessing"""
-        receiving = []
-        change = []
-
-        for i in range(start_idx, self.gap_limit):
-            if self.is_segwit:
-                receiving.append(self._external_chain_ck.ChildKey(i).P2WPKHoP2SHAddress())
-                change.append(self._internal_chain_ck.ChildKey(i).P2WPKHoP2SHAddress())
-            else:
-                receiving.append(self._external_chain_ck.ChildKey(i).Address())
-                change.append(self._internal_chain_ck.ChildKey(i).Address())
+    def _multi_processed_wif_keys(self, start_idx=0):
+        """ Returns a tuple of receiving and change WIF keys up to the limit specified """
+        return tuple(derivation_pool().derive([
+            (self._external_chain_ck, 'wif', self.is_segwit, start_idx, self.gap_limit),
+            (self._internal_chain_ck, 'wif', self.is_segwit, start_idx, self.gap_limit)
+        ]))
+
+    def _non_multi_processed_wif_keys(self, start_idx=0):
+        receiving = [w for _, w in self.iter_wif_keys('receiving', start_idx, self.gap_limit)]
+        change = [w for _, w in self.iter_wif_keys('change', start_idx, self.gap_limit)]
 
         return receiving, change
 
-    @lru_cache(maxsize=None)
-    def _gen_wif_keys(self, idx):
-        """ used with multiprocessing """
-        r_keys = self._external_chain_ck.ChildKey(idx).WalletImportFormat()
-        c_keys = self._internal_chain_ck.ChildKey(idx).WalletImportFormat()
+    def _chain_ck(self, chain):
+        """ returns the chain key of chain ('receiving' or 'change') """
+        chains = {
+            'receiving': self._external_chain_ck,
+            'change': self._internal_chain_ck
+        }
 
-        self._wif_key_queue.put((idx, r_keys, c_keys))
+        if chain not in chains:
+            raise ValueError(f'{chain} is an invalid chain (must be "receiving" or "change")')
 
-    def _multi_processed_wif_keys(self, start_idx=0):
-        """ Returns a tuple of receiving and change WIF keys up to the limit specified """
-        receiving = []
-        change = []
+        return chains[chain]
 
-        pool = multiprocessing.Pool(processes=multiprocessing.cpu_count())
-        pool.map(self._gen_wif_keys, range(start_idx, self.gap_limit))
-        pool.close()
+    def _stream(self, chain, kind, start, stop):
+        chain_ck = self._chain_ck(chain)
 
-        sorted_keys = sorted(IterableQueue(self._wif_key_queue), key=itemgetter(0))
-        for w in sorted_keys:
-            receiving.append(w[1])
-            change.append(w[2])
+        if self.multi_processed:
+            pool = derivation_pool()
 
-        return receiving, change
+            def derive_batch(batch_start, batch_stop):
+                return pool.derive([(chain_ck, kind, self.is_segwit, batch_start, batch_stop)])[0]
 
-    def _non_multi_processed_wif_keys(self, start_idx=0):
-        receiving = []
-        change = []
+            # enough indexes per batch to give every worker a chunk
+            return AddressStream(derive_batch, start, stop, batch_size=pool.chunk_size * pool.processes)
 
-        for i in range(start_idx, self.gap_limit):
-            receiving.append(self._external_chain_ck.ChildKey(i).WalletImportFormat())
-            change.append(self._internal_chain_ck.ChildKey(i).WalletImportFormat())
+        return AddressStream(partial(_derive_range, chain_ck, kind, self.is_segwit), start, stop)
 
-        return receiving, change
+    def iter_addresses(self, chain, start=0, stop=None):
+        """ returns an AddressStream of (index, address) tuples for chain ('receiving' or 'change'),
+        starting at index start. If stop is None, the stream never ends (unlike self.addresses(),
+        self.gap_limit doesn't apply), so callers can stop consuming it whenever they have enough.
+        """
+        return self._stream(chain, 'address', start, stop)
+
+    def iter_wif_keys(self, chain, start=0, stop=None):
+        """ same as iter_addresses, but for WIF keys. Returns None for public wallets """
+        if not self.is_private:
+            return None
+
+        return self._stream(chain, 'wif', start, stop)
+
+    def chain_keys(self, private=True):
+        """ returns a dict of the receiving and change chains' extended keys """
+        if private and not self.is_private:
+            raise PublicHDWalletObjectError('Cannot export private chain keys from a public key')
+
+        return {'receiving': self._external_chain_ck.ExtendedKey(private=private),
+                'change': self._internal_chain_ck.ExtendedKey(private=private)}
+
+    def precompute(self, cancelled=None):
+        """ derives the addresses and WIF keys that addresses() and wif_keys() return ahead of time,
+        a batch at a time, stopping early if the cancelled event gets set. Returns True if
+        everything was derived
+        """
+        kinds = ('address', 'wif') if self.is_private else ('address',)
+
+        for kind in kinds:
+            chains = []
+            for chain in ('receiving', 'change'):
+                values = []
+                for _, value in self._stream(chain, kind, 0, self.gap_limit):
+                    if cancelled is not None and cancelled.is_set():
+                        return False
+
+                    values.append(value)
+
+                chains.append(values)
+
+            if kind == 'address':
+                self._addresses[(0, self.gap_limit)] = tuple(chains)
+            else:
+                self._precomputed_wif_keys = (self.gap_limit, tuple(chains))
+
+        return True
 
     def addresses(self, start_idx=0):
-        if self.multi_processed:
-            return self._multi_processed_addresses(start_idx)
-        else:
-            return self._non_multi_processed_addresses(start_idx)
+        key = (start_idx, self.gap_limit)
+
+        if key not in self._addresses:
+            if self.multi_processed:
+                self._addresses[key] = self._multi_processed_addresses(start_idx)
+            else:
+                self._addresses[key] = self._non_multi_processed_addresses(start_idx)
+
+        return self._addresses[key]
 
     def wif_keys(self, start_idx=0):
         if not self.is_private:
             return None
 
+        precomputed, self._precomputed_wif_keys = self._precomputed_wif_keys, None
+        if precomputed is not None and start_idx == 0 and precomputed[0] == self.gap_limit:
+            return precomputed[1]
+
         if self.multi_processed:
             return self._multi_processed_wif_keys(start_idx)
-        else:
-            return self._non_multi_processed_wif_keys(start_idx)
+
+        return self._non_multi_processed_wif_keys(start_idx)
 
     def address_wifkey_pairs(self, start_idx=0):
         """ Returns a dict with addresses mapped to their WIF keys """
@@ -352,3 +642,91 @@ class HDWallet:
 
         return {'receiving': {k: v for k, v in zip(addresses[0], wif_keys[0])},
                 'change': {k: v for k, v in zip(addresses[1], wif_keys[1])}}
+
+
+class _PrecomputeTask:
+
+    def __init__(self, params):
+        self.params = params
+
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self.result = None
+
+    def run(self):
+        mnemonic, path, passphrase, segwit, kwargs = self.params
+
+        try:
+            hd_obj = HDWallet.from_mnemonic(mnemonic, path, passphrase, segwit, **dict(kwargs))
+
+            if not self.cancelled.is_set() and hd_obj.precompute(self.cancelled):
+                self.result = hd_obj
+
+        # the build is only speculative, so errors are left for the caller's own
+        # (non-speculative) build to raise
+        except Exception:
+            pass
+
+        finally:
+            self.done.set()
+
+
+class HDWalletPrecompute:
+    """ builds HDWallet.from_mnemonic objects in a background thread, including the seed
+    stretching and the derivation of their addresses and WIF keys, so that the work can be
+    done speculatively (e.g while the user is still filling in a form). Only one build is
+    kept: requesting different params cancels the current build.
+    """
+
+    def __init__(self):
+        self._task = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _params(mnemonic, path, passphrase, segwit, kwargs):
+        return mnemonic, path, passphrase, segwit, tuple(sorted(kwargs.items()))
+
+    def request(self, mnemonic, path, passphrase='', segwit=True, **kwargs):
+        """ starts building a HDWallet with the same params as HDWallet.from_mnemonic. Returns
+        False (and cancels the current build) if the mnemonic or path is invalid
+        """
+        if not HDWallet.check_mnemonic(mnemonic) or not HDWallet.check_path(path):
+            self.cancel()
+            return False
+
+        params = self._params(mnemonic, path, passphrase, segwit, kwargs)
+
+        with self._lock:
+            if self._task is not None and self._task.params == params:
+                return True
+
+            if self._task is not None:
+                self._task.cancelled.set()
+
+            self._task = _PrecomputeTask(params)
+            threading.Thread(target=self._task.run, daemon=True, name='HD_PRECOMPUTE_THREAD').start()
+
+        return True
+
+    def get(self, mnemonic, path, passphrase='', segwit=True, **kwargs):
+        """ returns the HDWallet built for these params, waiting for the build to finish if
+        it is still running. Returns None if no build was requested with the same params, or
+        it failed. The built HDWallet is only handed out once
+        """
+        params = self._params(mnemonic, path, passphrase, segwit, kwargs)
+
+        with self._lock:
+            task = self._task
+            if task is None or task.params != params:
+                return None
+
+            self._task = None
+
+        task.done.wait()
+        return task.result
+
+    def cancel(self):
+        with self._lock:
+            if self._task is not None:
+                self._task.cancelled.set()
+                self._task = None
@@ -0,0 +1,172 @@
+# Copyright (C) 2018  Gavin Shaughnessy
+#
+# Bit-Store is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" http client shared by all api sources: a pooled (keep-alive) requests.Session per host,
+retries of GET requests with jittered exponential backoff on connection errors, timeouts and
+429/5xx responses, a limit on concurrent requests per host, and latency/retry counters for each host
+"""
+
+import time
+import random
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import config
+
+
+class HTTPClient:
+
+    # responses that are worth retrying (rate limited, or a temporary server error)
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    # methods that are safe to send again, others (e.g a transaction broadcast) may have
+    # been acted on by the server even if the request failed, so they aren't retried
+    RETRY_METHODS = frozenset({'GET', 'HEAD'})
+
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=8, max_connections_per_host=4):
+        """
+        :param max_retries: number of times a GET request is retried before its error (or last
+        response) is returned
+        :param backoff: seconds waited before the first retry, doubling for each retry after
+        (a random amount up to the backoff is waited, so clients don't retry at the same time)
+        :param max_backoff: maximum seconds waited before a retry, also caps Retry-After headers
+        :param max_connections_per_host: maximum requests made to a host at the same time, and
+        connections kept open to it
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_connections_per_host = max_connections_per_host
+
+        self._sessions = {}
+        self._semaphores = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host(url):
+        return urlparse(url).netloc.lower()
+
+    def _host_state(self, host):
+        """ returns the session, semaphore and stats of host, creating them on its first request """
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections_per_host)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+
+                self._sessions[host] = session
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_connections_per_host)
+                self._stats[host] = {'requests': 0, 'retries': 0, 'errors': 0, 'latency': 0.0, 'max_latency': 0.0}
+
+            return self._sessions[host], self._semaphores[host], self._stats[host]
+
+    def _retry_wait(self, retry, response):
+        """ returns the seconds to wait before retry (starting at 0) """
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+
+        if retry_after is not None and retry_after.isdigit():
+            return min(int(retry_after), self.max_backoff)
+
+        return random.uniform(0, min(self.backoff * 2 ** retry, self.max_backoff))
+
+    def request(self, method, url, **kwargs):
+        """ makes a request with the session of url's host, retrying it as needed if method is
+        in RETRY_METHODS (kwargs are passed to requests). Returns the response, which may still be
+        an error response if retries ran out, or raises the requests.RequestException of the last attempt
+        """
+        session, semaphore, stats = self._host_state(self._host(url))
+        max_retries = self.max_retries if method.upper() in self.RETRY_METHODS else 0
+
+        for retry in range(max_retries + 1):
+            response = error = None
+            start = time.perf_counter()
+
+            try:
+                with semaphore:
+                    response = session.request(method, url, **kwargs)
+
+            except (requests.ConnectionError, requests.Timeout) as ex:
+                error = ex
+
+            latency = time.perf_counter() - start
+
+            with self._lock:
+                stats['requests'] += 1
+                stats['latency'] += latency
+                stats['max_latency'] = max(stats['max_latency'], latency)
+
+                if error is not None or response.status_code in self.RETRY_STATUSES:
+                    stats['errors'] += 1
+
+                    if retry < max_retries:
+                        stats['retries'] += 1
+
+            if error is None and response.status_code not in self.RETRY_STATUSES:
+                return response
+
+            if retry == max_retries:
+                break
+
+            time.sleep(self._retry_wait(retry, response))
+
+        if error is not None:
+            raise error
+
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    @property
+    def stats(self):
+        """ dict of hosts and their number of requests (including retries), retries, errors
+        (error responses and connection errors), and average and maximum latency in seconds
+        """
+        with self._lock:
+            return {host: {**s, 'latency': s['latency'] / s['requests'] if s['requests'] else 0.0}
+                    for host, s in self._stats.items()}
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+
+            self._sessions.clear()
+            self._semaphores.clear()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def client():
+    """ returns the HTTPClient shared by all api sources, so that their connections are reused """
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = HTTPClient(max_retries=config.get('HTTP_MAX_RETRIES'),
+                                 max_connections_per_host=config.get('HTTP_MAX_CONNECTIONS_PER_HOST'))
+
+        return _client
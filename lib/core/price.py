@@ -19,7 +19,7 @@ import json
 
 import requests
 
-from . import config
+from . import config, http_client
 
 
 class BtcPriceConnectionError(Exception):
@@ -95,6 +95,12 @@ class _BitcoinPriceBaseClass:
 
         return wrapper
 
+    def refresh(self):
+        """ makes the next price request the api, even if refresh_rate hasn't passed, for
+        callers that schedule requests themselves (i.e the wallet's api data updater)
+        """
+        self.last_request_time = 0
+
     @property
     def price(self):
         raise NotImplementedError
@@ -125,7 +131,7 @@ class Coinbase(_BitcoinPriceBaseClass):
         url = f'https://api.coinbase.com/v2/prices/BTC-{self.currency}/spot'
 
         try:
-            request = requests.get(url, timeout=self.timeout)
+            request = http_client.client().get(url, timeout=self.timeout)
             request.raise_for_status()
             data = request.json()
 
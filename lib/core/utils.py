@@ -23,16 +23,15 @@ from threading import Thread
 from queue import Empty
 from contextlib import suppress
 
-import base58
-
 from extern import bech32
+from extern.bip32utils import Base58
 
 
-def atomic_file_write(data: str, file_path: str):
-    """ atomically write data (string) to a file """
+def atomic_file_write(data, file_path: str):
+    """ atomically write data (string or bytes) to a file """
 
     tmp_file = file_path + '.tmp'
-    with open(tmp_file, 'w') as f:
+    with open(tmp_file, 'wb' if isinstance(data, bytes) else 'w') as f:
         f.write(data)
         f.flush()
         os.fsync(f.fileno())
@@ -65,8 +64,8 @@ def validate_address(address, allow_testnet=False, allow_bech32=True):
     if allow_testnet:
         possible_network_bytes += (0x6F, 0xC4)
 
-    with suppress(ValueError, TypeError):
-        if base58.b58decode_check(address)[0] in possible_network_bytes:
+    with suppress(ValueError, TypeError, IndexError):
+        if Base58.check_decode(address)[0] in possible_network_bytes:
             return True
 
     with suppress(ValueError, TypeError):
@@ -22,6 +22,7 @@ import json
 import pickle
 import hashlib
 import binascii
+from concurrent.futures import ThreadPoolExecutor
 
 from . import blockchain, config, data, tx, price, hd, structs, utils
 from ..exceptions.wallet_exceptions import *
@@ -48,6 +49,10 @@ def is_wallet(name):
 
 
 class _ApiDataUpdaterThread(threading.Thread):
+    """ keeps the wallet's api data up to date. The blockchain, fee and price apis are each
+    requested on their own schedule (their refresh rate) by a small thread pool, and their
+    data is written as soon as it arrives, so a slow or failing source doesn't hold up the others
+    """
 
     class ApiConnectionStatus(enum.Enum):
 
@@ -55,6 +60,22 @@ class _ApiDataUpdaterThread(threading.Thread):
         first_attempt = 1
         error = 2
 
+    class _ApiSource:
+        """ an api that is requested by the updater every refresh_rate seconds. fetch returns
+        a dict of its data, formatted for data_store write
+        """
+
+        def __init__(self, fetch, refresh_rate):
+            self.fetch = fetch
+            self.refresh_rate = refresh_rate
+
+            self.status = _ApiDataUpdaterThread.ApiConnectionStatus.first_attempt
+            self.timestamp = 0  # unix timestamp of the last successful fetch
+
+            # time.monotonic() time that the source is fetched at next
+            self.next_fetch = 0
+            self.future = None
+
     def __init__(self, wallet_instance, blockchain_refresh_rate, fee_refresh_rate, price_refresh_rate):
 
         if not isinstance(wallet_instance, Wallet):
@@ -68,61 +89,187 @@ class _ApiDataUpdaterThread(threading.Thread):
 
         # event will be set outside of this class
         self.event = threading.Event()
+        # set when a fetch finishes (or the thread is stopped), to wake up self.run
+        self._wake = threading.Event()
 
         self.wallet = wallet_instance
 
-        # minimum refresh rate will be used for wait amount in self.run loop
-        self.min_refresh_rate = min([blockchain_refresh_rate, fee_refresh_rate, price_refresh_rate])
-
         # API interface objects
         self.blockchain_interface = blockchain.blockchain_api(config.get('BLOCKCHAIN_API_SOURCE'),
                                                               self.wallet.all_addresses, blockchain_refresh_rate)
 
+        # the transactions stored from the last run are synced from where they got up to
+        self.blockchain_interface.set_sync_state(self.wallet.data_store.get_value('TXNS'),
+                                                 self.wallet.data_store.get_value('SYNC_CURSOR'))
+
         self.fees_interface = blockchain.fee_api(config.get('FEE_ESTIMATE_SOURCE'), fee_refresh_rate)
 
         self.price_interface = price.price_api(config.get('PRICE_API_SOURCE'), config.get('FIAT'), price_refresh_rate)
 
-        self.connection_status = self.ApiConnectionStatus.first_attempt
-        self.connection_timestamp = 0  # unix timestamp
+        self.sources = {
+            'blockchain': self._ApiSource(self._blockchain_data, blockchain_refresh_rate),
+            'fees': self._ApiSource(self._fee_data, fee_refresh_rate),
+            'price': self._ApiSource(self._price_data, price_refresh_rate)
+        }
+
+    @property
+    def connection_status(self):
+        """ error if the last request of any source failed, first_attempt until every
+        source has been requested, good otherwise
+        """
+        statuses = {s.status for s in self.sources.values()}
+
+        for status in (self.ApiConnectionStatus.error, self.ApiConnectionStatus.first_attempt):
+            if status in statuses:
+                return status
+
+        return self.ApiConnectionStatus.good
+
+    @property
+    def connection_timestamp(self):
+        """ unix timestamp of when all sources had last been updated """
+        return min(s.timestamp for s in self.sources.values())
+
+    def _blockchain_data(self):
+        """ returns the blockchain api data to be written, formatted for data_store write. If the
+        transactions were synced incrementally and the sync cursor hasn't moved, nothing has changed,
+        so an empty dict is returned without comparing (or working out values from) the transactions
+        """
+        # fetches are already scheduled every refresh_rate seconds by self.run
+        self.blockchain_interface.refresh()
+
+        transactions = self.blockchain_interface.transactions
+        sync_cursor = self.blockchain_interface.sync_cursor or {}
+
+        if sync_cursor and sync_cursor == self.wallet.data_store.get_value('SYNC_CURSOR'):
+            return {}
+
+        return {
+            'WALLET_BAL': self.blockchain_interface.wallet_balance,
+            'TXNS': transactions,
+            'ADDRESS_BALS': self.blockchain_interface.address_balances,
+            'UNSPENT_OUTS': self.blockchain_interface.unspent_outputs,
+            'SYNC_CURSOR': sync_cursor
+        }
+
+    def _fee_data(self):
+        # like the blockchain data, fetches are only limited by self.run's schedule
+        self.fees_interface.refresh()
+        return {'ESTIMATED_FEES': self.fees_interface.all_priorities}
+
+    def _price_data(self):
+        self.price_interface.refresh()
+        return {'PRICE': self.price_interface.price}
+
+    def _write(self, api_data):
+        # only values that have changed since last call are written
+        changed = {k: v for k, v in api_data.items() if self.wallet.data_store.get_value(k) != v}
+
+        if changed:
+            self.wallet.data_store.write_values(**changed)
+
+            # if new transactions have been updated, used addresses are set appropriately
+            if 'TXNS' in changed:
+                self.wallet.set_used_addresses()
+
+    def _fetched(self, source):
+        """ writes the data of source's finished fetch, and schedules its next fetch """
+        future, source.future = source.future, None
+
+        try:
+            api_data = future.result()
+
+        except (blockchain.BlockchainConnectionError, price.BtcPriceConnectionError):
+            source.status = self.ApiConnectionStatus.error
+
+        else:
+            source.status = self.ApiConnectionStatus.good
+            source.timestamp = time.time()
+
+            self._write(api_data)
+
+        # failed requests are also only tried again after refresh_rate
+        source.next_fetch = time.monotonic() + source.refresh_rate
 
     def run(self):
-        # returns a list of datastore values from input list keys
-        get_values = lambda vals: [self.wallet.data_store.get_value(v) for v in vals]
+        sources = list(self.sources.values())
+        executor = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix='API_DATA_FETCH')
 
-        while threading.main_thread().is_alive() and not self.event.is_set():
+        try:
+            while threading.main_thread().is_alive() and not self.event.is_set():
+                self._wake.clear()
 
-            try:
-                # formatted for data_store write
-                api_data = {
-                    'WALLET_BAL': self.blockchain_interface.wallet_balance,
-                    'TXNS': self.blockchain_interface.transactions,
-                    'ADDRESS_BALS': self.blockchain_interface.address_balances,
-                    'UNSPENT_OUTS': self.blockchain_interface.unspent_outputs,
-                    'PRICE': self.price_interface.price,
-                    'ESTIMATED_FEES': self.fees_interface.all_priorities
-                }
-                self.connection_status = self.ApiConnectionStatus.good
-                self.connection_timestamp = time.time()
-
-            except (blockchain.BlockchainConnectionError, price.BtcPriceConnectionError):
-                self.connection_status = self.ApiConnectionStatus.error
+                try:
+                    for source in sources:
+                        if source.future is not None and source.future.done():
+                            self._fetched(source)
 
-            else:
-                # if values have changed since last call
-                if get_values([k for k in api_data]) != [v for v in api_data.values()]:
-                    new_txns = api_data['TXNS'] != self.wallet.data_store.get_value('TXNS')
+                # the wallet was closed while api data was being fetched
+                except data.DataStoreClosedError:
+                    break
 
-                    self.wallet.data_store.write_values(**api_data)
+                now = time.monotonic()
+                for source in sources:
+                    if source.future is None and now >= source.next_fetch:
+                        source.future = executor.submit(source.fetch)
+                        source.future.add_done_callback(lambda _: self._wake.set())
 
-                    # if new transactions have been updated, used addresses are set appropriately
-                    if new_txns:
-                        self.wallet.set_used_addresses()
+                # woken up when a fetch finishes or the next source is due, and at least
+                # every second so that the main thread exiting is noticed
+                timeout = min([s.next_fetch - time.monotonic() for s in sources if s.future is None] + [1])
+                self._wake.wait(max(timeout, 0))
 
-            # reached if exception was raised in try block as well as normal execution of try block
-            self.event.wait(self.min_refresh_rate)
+        finally:
+            # fetches still running are left to finish on their own, their data isn't written
+            executor.shutdown(wait=False)
 
     def stop(self):
         self.event.set()
+        self._wake.set()
+
+
+class _WifKeyCache:
+    """ decrypted wif keys of addresses, kept for ttl seconds after keys were last added, so
+    that transactions signed one after another don't decrypt the same keys again. It is empty
+    (locked) until the wallet adds keys it has decrypted after validating the password, and
+    all keys are wiped once the ttl runs out. A ttl of 0 disables the cache.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def get(self, addresses):
+        """ returns a dict of the addresses that have cached wif keys, and their keys """
+        with self._lock:
+            return {a: self._keys[a] for a in addresses if a in self._keys}
+
+    def add(self, wif_keys):
+        """ wif_keys is a dict of addresses and their decrypted wif keys """
+        if self.ttl <= 0:
+            return
+
+        with self._lock:
+            self._keys.update(wif_keys)
+
+            if self._timer is not None:
+                self._timer.cancel()
+
+            self._timer = threading.Timer(self.ttl, self.clear)
+            self._timer.daemon = True
+            self._timer.name = 'WIF_KEY_CACHE_THREAD'
+            self._timer.start()
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
 
 
 class Wallet:
@@ -162,7 +309,11 @@ class Wallet:
 
             d_store = data.DataStore.new_data_store(wallet_data_file_path, password,
                                                     data_format=config.STANDARD_DATA_FORMAT,
-                                                    sensitive_keys=config.SENSITIVE_DATA)
+                                                    sensitive_keys=config.SENSITIVE_DATA,
+                                                    journal=True,
+                                                    segments=config.DATA_SEGMENTS,
+                                                    backend=config.get('DATA_STORE_BACKEND'),
+                                                    flush_latency=config.get('DATA_FLUSH_LATENCY'))
 
             addresses = hd_wallet_obj.addresses()
 
@@ -177,7 +328,11 @@ class Wallet:
                 'ADDRESSES_RECEIVING': addresses[0],
                 'ADDRESSES_CHANGE': addresses[1],
                 'ADDRESS_WIF_KEYS': hd_wallet_obj.address_wifkey_pairs(),
-                'DEFAULT_ADDRESSES': {'receiving': addresses[0], 'change': addresses[1]}
+                'DEFAULT_ADDRESSES': {'receiving': addresses[0], 'change': addresses[1]},
+                'CHAIN_XPRIVS': hd_wallet_obj.chain_keys() if hd_wallet_obj.is_private else None,
+                'CHAIN_XPUBS': hd_wallet_obj.chain_keys(private=False),
+                'DERIVED_INDEXES': {'receiving': hd_wallet_obj.gap_limit - 1,
+                                    'change': hd_wallet_obj.gap_limit - 1}
             }
 
             d_store.write_values(**info)
@@ -186,7 +341,11 @@ class Wallet:
                 w_data = {'watch_only': cls == WatchOnlyWallet}
                 json.dump(w_data, w_info_file)
 
-            return cls(name, password, offline=offline)
+            try:
+                return cls(name, password, offline=offline)
+            finally:
+                # the wallet opens the store itself, so this open is closed
+                d_store.close()
 
         except BaseException as ex:
 
@@ -199,16 +358,38 @@ class Wallet:
 
     def __init__(self, name, password, offline=False):
         self.name = name
+        self._wif_key_cache = _WifKeyCache(config.get('WIF_KEY_CACHE_TTL'))
+        self._closed = False
 
         data_file_path = os.path.join(config.WALLET_DATA_DIR, name, config.WALLET_DATA_FILE_NAME)
         self.data_store = data.DataStore(data_file_path, password,
                                          data_format=config.STANDARD_DATA_FORMAT,
-                                         sensitive_keys=config.SENSITIVE_DATA)
+                                         sensitive_keys=config.SENSITIVE_DATA,
+                                         journal=True,
+                                         segments=config.DATA_SEGMENTS,
+                                         flush_latency=config.get('DATA_FLUSH_LATENCY'))
 
         if not offline:
             self.updater_thread = None
             self._start_updater_thread()
 
+    def close(self):
+        """ stops the api data updater thread, wipes any cached keys and closes the wallet's
+        data store (writing anything not yet written), so that its data doesn't stay in memory
+        after the wallet is no longer used. The wallet can't be used after it is closed, but
+        other wallets using the same data store can be, until they are closed too
+        """
+        if self._closed:
+            return
+
+        self._closed = True
+
+        if getattr(self, 'updater_thread', None) is not None:
+            self.updater_thread.stop()
+
+        self._wif_key_cache.clear()
+        self.data_store.close()
+
     def _start_updater_thread(self):
         self.updater_thread = _ApiDataUpdaterThread(self, config.get('BLOCKCHAIN_API_REFRESH'),
                                                     config.get('FEE_API_REFRESH'),
@@ -216,9 +397,10 @@ class Wallet:
         self.updater_thread.start()
 
     def _set_addresses_used(self, addresses):
-        r_addrs = self.receiving_addresses
-        c_addrs = self.change_addresses
-        u_addrs = self.used_addresses
+        # copies, as data store values are read-only
+        r_addrs = list(self.receiving_addresses)
+        c_addrs = list(self.change_addresses)
+        u_addrs = list(self.used_addresses)
 
         for address in addresses:
 
@@ -286,6 +468,8 @@ class Wallet:
         return txn
 
     def sign_transaction(self, unsigned_txn, password):
+        # the wallet's state (e.g used change addresses) should be on disk before a transaction is signed
+        self.data_store.flush()
 
         input_addresses = unsigned_txn.input_addresses
         wif_keys = self.get_wif_keys(password, input_addresses)
@@ -383,7 +567,7 @@ class Wallet:
             return self.import_transaction(f.read())
 
     def clear_cached_api_data(self):
-        api_keys = ['TXNS', 'ADDRESS_BALS', 'WALLET_BAL', 'UNSPENT_OUTS', 'PRICE']
+        api_keys = ['TXNS', 'ADDRESS_BALS', 'WALLET_BAL', 'UNSPENT_OUTS', 'PRICE', 'SYNC_CURSOR']
         k_v = {k: None for k in api_keys}
         self.data_store.write_values(**k_v)
 
@@ -400,6 +584,40 @@ class Wallet:
 
         return blockchain.broadcast_transaction(signed_txn.hex_txn)
 
+    def _derivation_hd_wallet(self, gap_limit):
+        """ returns a HDWallet object for deriving new addresses and wif keys. It is built from the
+        chain keys in the derivation cache if they are there, otherwise from XPRIV (wallets created
+        before the cache existed) and the cache is filled in by the caller's next write
+        """
+        chain_xprivs = self.data_store.get_value('CHAIN_XPRIVS')
+
+        if chain_xprivs:
+            return hd.HDWallet.from_chain_keys(self.data_store.crypto.decrypt(chain_xprivs['receiving']),
+                                               self.data_store.crypto.decrypt(chain_xprivs['change']),
+                                               segwit=self.is_segwit, gap_limit=gap_limit)
+
+        return hd.HDWallet(key=self.data_store.get_value('XPRIV'), path=self.path,
+                           segwit=self.is_segwit, gap_limit=gap_limit)
+
+    def _derivation_cache_values(self, hd_obj, gap_limit):
+        """ derivation cache data_store values, after deriving up to gap_limit with hd_obj
+        (hd_obj may be None when no new keys were derived)
+        """
+        values = {'DERIVED_INDEXES': {'receiving': gap_limit - 1, 'change': gap_limit - 1}}
+
+        if hd_obj is not None:
+            values['CHAIN_XPRIVS'] = hd_obj.chain_keys()
+            values['CHAIN_XPUBS'] = hd_obj.chain_keys(private=False)
+
+        return values
+
+    def _next_derivation_index(self):
+        """ the index the next new address is derived at, i.e one after the highest derived index """
+        derived_indexes = self.data_store.get_value('DERIVED_INDEXES')
+
+        # both chains are always derived up to the same index
+        return derived_indexes.get('receiving', self.gap_limit - 1) + 1
+
     def change_gap_limit(self, new_gap_limit):
         gap_limit_min = 10
         gap_limit_max = 50
@@ -410,35 +628,35 @@ class Wallet:
         if not isinstance(new_gap_limit, int):
             raise TypeError('Gap limit must be an int')
 
-        if new_gap_limit > self.gap_limit:
-            xpriv = self.data_store.get_value('XPRIV')
+        hd_obj = None
 
-            hd_obj = hd.HDWallet(key=xpriv, path=self.path, segwit=self.is_segwit,
-                                 gap_limit=new_gap_limit)
+        if new_gap_limit > self.gap_limit:
+            hd_obj = self._derivation_hd_wallet(new_gap_limit)
+            start_idx = self._next_derivation_index()
 
             # only generate new addresses and wif keys
-            new_addresses = hd_obj.addresses(start_idx=self.gap_limit)
-            new_address_wif_keys = hd_obj.address_wifkey_pairs(start_idx=self.gap_limit)
+            new_addresses = {c: [a for _, a in hd_obj.iter_addresses(c, start_idx, new_gap_limit)]
+                             for c in ('receiving', 'change')}
+            new_wif_keys = {c: [w for _, w in hd_obj.iter_wif_keys(c, start_idx, new_gap_limit)]
+                            for c in ('receiving', 'change')}
 
-            r_addresses = self.default_addresses['receiving'] + new_addresses[0]
-            c_addresses = self.default_addresses['change'] + new_addresses[1]
+            r_addresses = self.default_addresses['receiving'] + new_addresses['receiving']
+            c_addresses = self.default_addresses['change'] + new_addresses['change']
 
-            cur_addr_wif_keys = self.data_store.get_value('ADDRESS_WIF_KEYS')
+            cur_addr_wif_keys = self._decrypted_address_wif_keys()
             r_keys = cur_addr_wif_keys['receiving']
             c_keys = cur_addr_wif_keys['change']
 
-            r_keys.update(new_address_wif_keys['receiving'])
-            c_keys.update(new_address_wif_keys['change'])
+            r_keys.update(zip(new_addresses['receiving'], new_wif_keys['receiving']))
+            c_keys.update(zip(new_addresses['change'], new_wif_keys['change']))
 
             addr_wif_keys = cur_addr_wif_keys
 
-            del hd_obj
-
         elif new_gap_limit < self.gap_limit:
             r_addresses = self.default_addresses['receiving'][:new_gap_limit]
             c_addresses = self.default_addresses['change'][:new_gap_limit]
 
-            cur_addr_wif_keys = self.data_store.get_value('ADDRESS_WIF_KEYS')
+            cur_addr_wif_keys = self._decrypted_address_wif_keys()
             addr_wif_keys = {}
 
             new_r_keys = dict(list(cur_addr_wif_keys['receiving'].items())[:new_gap_limit])
@@ -456,9 +674,12 @@ class Wallet:
                 'ADDRESSES_CHANGE': c_addresses,
                 'ADDRESSES_USED': [],
                 'ADDRESS_WIF_KEYS': addr_wif_keys,
-                'DEFAULT_ADDRESSES': {'receiving': r_addresses, 'change': c_addresses}
+                'DEFAULT_ADDRESSES': {'receiving': r_addresses, 'change': c_addresses},
+                **self._derivation_cache_values(hd_obj, new_gap_limit)
         }
 
+        del hd_obj
+
         self.data_store.write_values(**new_address_data)
 
         self.clear_cached_api_data()
@@ -486,19 +707,7 @@ class Wallet:
         if address not in self.all_addresses:
             raise ValueError(f'"{address}" is not a wallet address')
 
-        num_txns = 0
-        for t in self.transactions:
-            for i in t['inputs']:
-                if i['address'] == address:
-                    num_txns += 1
-                    break
-            else:
-                for o in t['outputs']:
-                    if o['address'] == address:
-                        num_txns += 1
-                        break
-
-        return num_txns
+        return len(self.data_store.address_transactions(address))
 
     @property
     def xpub(self):
@@ -552,6 +761,10 @@ class Wallet:
     def transactions(self):
         return self.data_store.get_value('TXNS')
 
+    def transactions_page(self, offset=0, limit=50):
+        """ returns limit transactions starting at offset, in the order of self.transactions """
+        return self.data_store.transactions_page(offset, limit)
+
     @property
     def price(self):
         # price class should return int by default
@@ -620,19 +833,18 @@ class Wallet:
         else:
             raise data.IncorrectPasswordError
 
-    def get_address_wif_keys(self, password):
-        if self.data_store.validate_password(password):
-            addr_wif_keys = self.data_store.get_value('ADDRESS_WIF_KEYS')
-
-            r_dict = addr_wif_keys['receiving']
-            for k, v in r_dict.items():
-                r_dict.update({k: self.data_store.crypto.decrypt(v)})
+    def _decrypted_address_wif_keys(self):
+        """ ADDRESS_WIF_KEYS with its values decrypted. Needed when the keys are written back
+        to the data store, as write_values will encrypt all of them again
+        """
+        addr_wif_keys = self.data_store.get_value('ADDRESS_WIF_KEYS')
+        decrypt_many = self.data_store.crypto.decrypt_many
 
-            c_dict = addr_wif_keys['change']
-            for K, V in c_dict.items():
-                c_dict.update({K: self.data_store.crypto.decrypt(V)})
+        return {chain: dict(zip(keys, decrypt_many(keys.values()))) for chain, keys in addr_wif_keys.items()}
 
-            return addr_wif_keys
+    def get_address_wif_keys(self, password):
+        if self.data_store.validate_password(password):
+            return self._decrypted_address_wif_keys()
 
         else:
             raise data.IncorrectPasswordError
@@ -640,20 +852,42 @@ class Wallet:
     def get_wif_keys(self, password, addresses):
 
         if self.data_store.validate_password(password):
-            wif_keys = []
-            addr_wif_keys = self.data_store.get_value('ADDRESS_WIF_KEYS')
+            wif_keys = self._wif_key_cache.get(addresses)
+            # (addresses may repeat, i.e an address's utxos that are spent together)
+            uncached = list(dict.fromkeys(a for a in addresses if a not in wif_keys))
 
-            for a in addresses:
-                addr_type = self.address_type(a)
+            if uncached:
+                addr_wif_keys = self.data_store.get_value('ADDRESS_WIF_KEYS')
+                tokens = []
+
+                # wif keys are stored by their address's default type, so it doesn't need to be looked up
+                for a in uncached:
+                    token = addr_wif_keys['receiving'].get(a) or addr_wif_keys['change'].get(a)
+                    if token is None:
+                        raise ValueError('Address not in wallet')
+
+                    tokens.append(token)
 
                 # only decrypt the values that we need
-                wif_keys.append(self.data_store.crypto.decrypt(addr_wif_keys[addr_type][a]))
+                decrypted = dict(zip(uncached, self.data_store.crypto.decrypt_many(tokens)))
+                self._wif_key_cache.add(decrypted)
+                wif_keys.update(decrypted)
 
-            return wif_keys
+            return [wif_keys[a] for a in addresses]
 
         else:
             raise data.IncorrectPasswordError
 
+    def change_password(self, old_password, new_password):
+        """ changes the password of the wallet's data, wiping any cached keys so that
+        they aren't available after the password they were decrypted with has changed
+        """
+        if not self.data_store.validate_password(old_password):
+            raise data.IncorrectPasswordError
+
+        self._wif_key_cache.clear()
+        self.data_store.change_password(new_password)
+
     # Below methods will increase gap limit if there are no more new addresses
     def next_receiving_address(self):
         gap_limit_increase = 5
@@ -689,6 +923,23 @@ class WatchOnlyWallet(Wallet):
     def get_wif_keys(self, password, addresses):
         raise WatchOnlyWalletError
 
+    def _derivation_hd_wallet(self, gap_limit):
+        chain_xpubs = self.data_store.get_value('CHAIN_XPUBS')
+
+        if chain_xpubs:
+            return hd.HDWallet.from_chain_keys(chain_xpubs['receiving'], chain_xpubs['change'],
+                                               segwit=self.is_segwit, gap_limit=gap_limit)
+
+        return hd.HDWallet(key=self.account_xpub, path='m', segwit=self.is_segwit, gap_limit=gap_limit)
+
+    def _derivation_cache_values(self, hd_obj, gap_limit):
+        values = {'DERIVED_INDEXES': {'receiving': gap_limit - 1, 'change': gap_limit - 1}}
+
+        if hd_obj is not None:
+            values['CHAIN_XPUBS'] = hd_obj.chain_keys(private=False)
+
+        return values
+
     def get_address_wif_keys(self, password):
         raise WatchOnlyWalletError
 
@@ -702,18 +953,17 @@ class WatchOnlyWallet(Wallet):
         if not isinstance(new_gap_limit, int):
             raise TypeError('Gap limit must be an int')
 
-        if new_gap_limit > self.gap_limit:
+        hd_obj = None
 
-            hd_obj = hd.HDWallet(key=self.account_xpub, path='m', segwit=self.is_segwit,
-                                 gap_limit=new_gap_limit)
+        if new_gap_limit > self.gap_limit:
+            hd_obj = self._derivation_hd_wallet(new_gap_limit)
+            start_idx = self._next_derivation_index()
 
             # only generate new addresses
-            new_addresses = hd_obj.addresses(start_idx=self.gap_limit)
-
-            r_addresses = self.default_addresses['receiving'] + new_addresses[0]
-            c_addresses = self.default_addresses['change'] + new_addresses[1]
-
-            del hd_obj
+            r_addresses = self.default_addresses['receiving'] + \
+                [a for _, a in hd_obj.iter_addresses('receiving', start_idx, new_gap_limit)]
+            c_addresses = self.default_addresses['change'] + \
+                [a for _, a in hd_obj.iter_addresses('change', start_idx, new_gap_limit)]
 
         elif new_gap_limit < self.gap_limit:
             r_addresses = self.default_addresses['receiving'][:new_gap_limit]
@@ -727,7 +977,8 @@ class WatchOnlyWallet(Wallet):
                 'ADDRESSES_RECEIVING': r_addresses,
                 'ADDRESSES_CHANGE': c_addresses,
                 'ADDRESSES_USED': [],
-                'DEFAULT_ADDRESSES': {'receiving': r_addresses, 'change': c_addresses}
+                'DEFAULT_ADDRESSES': {'receiving': r_addresses, 'change': c_addresses},
+                **self._derivation_cache_values(hd_obj, new_gap_limit)
         }
 
         self.data_store.write_values(**new_address_data)
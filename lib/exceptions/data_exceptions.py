@@ -20,3 +20,7 @@ class IncorrectPasswordError(Exception):
 
 class InvalidFileFormat(Exception):
     pass
+
+
+class DataStoreClosedError(Exception):
+    pass
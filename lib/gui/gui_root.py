@@ -26,7 +26,7 @@ import qrcode
 from PIL import ImageTk
 
 from extern import ttk_simpledialog as simpledialog
-from ..core import config, wallet, price
+from ..core import config, wallet, price, hd
 
 from .wallet_select import WalletSelect
 from .wallet_creation import (WalletCreation, WalletCreationLoading,
@@ -41,8 +41,9 @@ def main():
 
     # stopping api_data_updater thread of Wallet instance after
     # tkinter mainloop closes
-    if app.btc_wallet is not None:
-        app.btc_wallet.updater_thread.stop()
+    app.close_wallet()
+
+    hd.shutdown_derivation_pool()
 
 
 class RootApplication(tk.Tk):
@@ -155,8 +156,22 @@ class RootApplication(tk.Tk):
     def set_style(self):
         self.style.configure('Treeview.Heading', font=(config.get('FONT'), 10))
 
+    def set_wallet(self, btc_wallet):
+        """ sets the wallet used by the gui, closing the wallet that was used before it """
+        if btc_wallet is not self.btc_wallet:
+            self.close_wallet()
+
+        self.btc_wallet = btc_wallet
+
+    def close_wallet(self):
+        if self.btc_wallet is not None:
+            self.btc_wallet.close()
+            self.btc_wallet = None
+
     def wallet_init(self, name, password, show_frame=False):
-        self.btc_wallet = wallet.get_wallet(name, password)
+        # the previous wallet is closed first, as it may be the same wallet being opened again
+        self.close_wallet()
+        self.set_wallet(wallet.get_wallet(name, password))
 
         if show_frame:
             if self.btc_wallet.get_metadata(name)['watch_only']:
@@ -92,11 +92,11 @@ class AddressDisplay(ttk.Frame):
             addr_bals = self.root.btc_wallet.address_balances
 
             # sorted showing addresses with balances first
-            _r_addresses = self.root.btc_wallet.default_addresses['receiving']
-            _r_addresses.sort(key=lambda x: sum(addr_bals[x]), reverse=True)
+            _r_addresses = sorted(self.root.btc_wallet.default_addresses['receiving'],
+                                  key=lambda x: sum(addr_bals[x]), reverse=True)
 
-            _c_addresses = self.root.btc_wallet.default_addresses['change']
-            _c_addresses.sort(key=lambda x: sum(addr_bals[x]), reverse=True)
+            _c_addresses = sorted(self.root.btc_wallet.default_addresses['change'],
+                                  key=lambda x: sum(addr_bals[x]), reverse=True)
 
             # then combine the two lists with both halves sorted
             addresses = _r_addresses + _c_addresses
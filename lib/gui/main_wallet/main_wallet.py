@@ -228,14 +228,14 @@ class MainWallet(ttk.Frame):
         status_frame.grid(pady=(10, 0))
 
     def _change_password_window(self):
-        data_store = self.root.btc_wallet.data_store
+        btc_wallet = self.root.btc_wallet
 
         change_pass_window = self.root.get_toplevel(self)
         change_pass_window.grab_set()
 
         def on_ok():
             incorrect = False
-            if not data_store.validate_password(old_password_entry.get()):
+            if not btc_wallet.data_store.validate_password(old_password_entry.get()):
                 tk.messagebox.showerror('Incorrect Password', 'Old Password is incorrect, try again.',
                                         parent=change_pass_window)
                 incorrect = True
@@ -256,7 +256,7 @@ class MainWallet(ttk.Frame):
                 new_password_confirm_entry.delete(0, tk.END)
                 return
 
-            data_store.change_password(new_password_entry.get())
+            btc_wallet.change_password(old_password_entry.get(), new_password_entry.get())
             change_pass_window.destroy()
             tk.messagebox.showinfo('Password Changed', 'Password change successful.')
 
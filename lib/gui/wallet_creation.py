@@ -28,6 +28,9 @@ MAX_NAME_LENGTH = 25
 
 class WalletCreation(ttk.Frame):
 
+    # ms without typing before the HDWallet is rebuilt for the changed entries
+    PRECOMPUTE_DELAY = 300
+
     def __init__(self, root):
         self.root = root
         ttk.Frame.__init__(self, self.root.master_frame)
@@ -59,6 +62,14 @@ class WalletCreation(ttk.Frame):
         }
         self._adv_warning_shown = False
 
+        # the HDWallet is built in the background while the rest of the form is filled in
+        self.precompute = hd.HDWalletPrecompute()
+        # mnemonic of the wallet to be created, generated when the frame is drawn
+        self.new_mnemonic = None
+        # (mnemonic, passphrase) last requested, and the id of a build that is waiting on typing to stop
+        self._precompute_params = None
+        self._scheduled_precompute = None
+
     def gui_draw(self):
         self.title = ttk.Label(self, text='Wallet Creation:', font=self.root.bold_title_font)
         self.title.grid(row=0, column=0, sticky='w', pady=10)
@@ -109,8 +120,7 @@ class WalletCreation(ttk.Frame):
         self.mnemonic_passphrase_entry = ttk.Entry(self)
         self.mnemonic_passphrase_entry.grid(row=6, column=1, pady=5, columnspan=2)
 
-        self.back_button = ttk.Button(self, text='Back',
-                                      command=lambda: self.root.show_frame('WalletSelect'))
+        self.back_button = ttk.Button(self, text='Back', command=self.on_back)
         self.back_button.grid(row=7, column=0, sticky='e', padx=10, pady=20)
 
         self.create_button = ttk.Button(self, text='Create', command=self.create_wallet)
@@ -119,6 +129,61 @@ class WalletCreation(ttk.Frame):
         self.advanced_button = ttk.Button(self, text='Advanced', command=self.advanced_window)
         self.advanced_button.grid(row=7, column=3, sticky='w', padx=10, pady=20)
 
+        self.bind_precompute()
+
+    def bind_precompute(self):
+        """ starts building the new wallet's HDWallet, and rebuilds it whenever an entry it depends on changes """
+        self.new_mnemonic = hd.HDWallet.gen_mnemonic()
+
+        def on_change(_event=None):
+            self.schedule_precompute(self.new_mnemonic, self.mnemonic_passphrase_entry.get())
+
+        self.path_entry.bind('<KeyRelease>', on_change)
+        self.mnemonic_passphrase_entry.bind('<KeyRelease>', on_change)
+        self.segwit_check.trace_add('write', lambda *_: on_change())
+
+        self.precompute_hd_wallet(self.new_mnemonic, self.mnemonic_passphrase_entry.get())
+
+    def precompute_hd_wallet(self, mnemonic, passphrase):
+        """ starts building the HDWallet for mnemonic in the background, with the current entries.
+        Does nothing if they are invalid (the build is only picked up if nothing changes)
+        """
+        self._cancel_scheduled_precompute()
+        self._precompute_params = (mnemonic, passphrase)
+
+        self.precompute.request(mnemonic, self._get_path(), passphrase,
+                                self.segwit_check.get() == 1, **self.adv_settings)
+
+    def schedule_precompute(self, mnemonic, passphrase):
+        """ precompute_hd_wallet, once PRECOMPUTE_DELAY ms have passed without another change,
+        so that a build isn't started (and cancelled) for every key pressed
+        """
+        self._cancel_scheduled_precompute()
+        self._precompute_params = (mnemonic, passphrase)
+        self._scheduled_precompute = self.root.after(self.PRECOMPUTE_DELAY, self.precompute_hd_wallet,
+                                                     mnemonic, passphrase)
+
+    def _cancel_scheduled_precompute(self):
+        if self._scheduled_precompute is not None:
+            self.root.after_cancel(self._scheduled_precompute)
+            self._scheduled_precompute = None
+
+    def cancel_precompute(self):
+        self._cancel_scheduled_precompute()
+        self._precompute_params = None
+        self.precompute.cancel()
+
+    def on_back(self):
+        self.cancel_precompute()
+        self.root.show_frame('WalletSelect')
+
+    def _get_path(self):
+        if self.path_entry.get() == '':
+            # setting default path
+            return config.BIP32_PATHS['bip49path']
+
+        return self.path_entry.get()
+
     def _verify_password(self):
         return self.password_entry.get() == self.confirm_pass_entry.get()
 
@@ -126,12 +191,7 @@ class WalletCreation(ttk.Frame):
         """ invalid entries raise ValueError """
         name = self.name_entry.get().strip()
         password = self.password_entry.get()
-
-        if self.path_entry.get() == '':
-            # setting default path
-            path = config.BIP32_PATHS['bip49path']
-        else:
-            path = self.path_entry.get()
+        path = self._get_path()
 
         if not name:
             raise ValueError('No name entered')
@@ -176,6 +236,10 @@ class WalletCreation(ttk.Frame):
             toplevel.destroy()
 
             if self.adv_settings != prev_settings:
+                # the HDWallet being built has the previous settings
+                if self._precompute_params is not None:
+                    self.precompute_hd_wallet(*self._precompute_params)
+
                 messagebox.showinfo('Saved', 'Advanced settings saved')
 
         if not self._adv_warning_shown:
@@ -225,8 +289,12 @@ class WalletCreation(ttk.Frame):
         # getting any advanced settings that were set
         hd_wallet_adv_data = self.adv_settings
 
+        # a build waiting on typing to stop is started now, so it can be picked up
+        if self._scheduled_precompute is not None:
+            self.precompute_hd_wallet(*self._precompute_params)
+
         if mnemonic is None and xkey is None:
-            mnemonic = hd.HDWallet.gen_mnemonic()
+            mnemonic = self.new_mnemonic or hd.HDWallet.gen_mnemonic()
 
         if passphrase is None:
             passphrase = self.mnemonic_passphrase_entry.get()
@@ -234,12 +302,7 @@ class WalletCreation(ttk.Frame):
         try:
             name = self.name_entry.get().strip()
             password = self.password_entry.get()
-
-            if self.path_entry.get() == '':
-                # setting default path
-                path = config.BIP32_PATHS['bip49path']
-            else:
-                path = self.path_entry.get()
+            path = self._get_path()
 
             is_segwit = True if self.segwit_check.get() == 1 else False
 
@@ -286,11 +349,20 @@ class WalletCreation(ttk.Frame):
         try:
             if wallet_data.xkey is None:
                 message_queue.put('Deriving addresses from mnemonic...')
-                hd_ = hd.HDWallet.from_mnemonic(wallet_data.mnemonic,
-                                                wallet_data.path,
-                                                wallet_data.passphrase,
-                                                wallet_data.is_segwit,
-                                                **hd_adv_data)
+
+                # picks up the HDWallet built in the background, if the entries haven't changed since
+                hd_ = self.precompute.get(wallet_data.mnemonic,
+                                          wallet_data.path,
+                                          wallet_data.passphrase,
+                                          wallet_data.is_segwit,
+                                          **hd_adv_data)
+
+                if hd_ is None:
+                    hd_ = hd.HDWallet.from_mnemonic(wallet_data.mnemonic,
+                                                    wallet_data.path,
+                                                    wallet_data.passphrase,
+                                                    wallet_data.is_segwit,
+                                                    **hd_adv_data)
                 watch_only_wallet = not hd_.is_private
                 bypass_mnemonic_display = watch_only_wallet
 
@@ -313,7 +385,7 @@ class WalletCreation(ttk.Frame):
                 w = wallet.Wallet.new_wallet(wallet_data.name, wallet_data.password, hd_)
             message_queue.put('Wallet created...')
 
-            self.root.btc_wallet = w
+            self.root.set_wallet(w)
 
             if bypass_mnemonic_display or force_no_mnemonic_display:
                 if watch_only_wallet:
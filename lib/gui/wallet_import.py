@@ -34,6 +34,10 @@ class WalletImport(WalletCreation):
         self.mnemonic_passphrase_label.grid_remove()
         self.mnemonic_passphrase_entry.grid_remove()
 
+    def bind_precompute(self):
+        # the mnemonic is only entered on WalletImportPage2, which starts the build
+        self.new_mnemonic = None
+
     def import_type_dialog(self):
         dialog = tk.Toplevel(self)
         dialog.grab_set()
@@ -129,6 +133,10 @@ class WalletImportPage2(ttk.Frame):
             self.passphrase_entry = ttk.Entry(self)
             self.passphrase_entry.grid(row=2, column=1, pady=10, sticky='ew')
 
+            # the wallet starts being built as soon as a valid mnemonic is entered
+            self.entry.bind('<KeyRelease>', self.on_mnemonic_change)
+            self.passphrase_entry.bind('<KeyRelease>', self.on_mnemonic_change)
+
         back_button = ttk.Button(self, text='Back', command=self.on_back)
         back_button.grid(row=3, column=0, padx=10, pady=20, sticky='e')
 
@@ -142,7 +150,15 @@ class WalletImportPage2(ttk.Frame):
 
         col_2_button_frame.grid(row=3, column=1, sticky='ew')
 
+    def on_mnemonic_change(self, _event=None):
+        mnemonic = self.entry.get(1.0, 'end-1c').strip()
+        passphrase = self.passphrase_entry.get().strip()
+
+        self.wallet_import.schedule_precompute(mnemonic, passphrase)
+
     def on_back(self):
+        self.wallet_import.cancel_precompute()
+
         # remove the optional widgets, or labels that change due to different
         # attributes, because if the user goes back and doesn't select the
         # mnemonic import, these widgets will still be
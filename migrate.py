@@ -0,0 +1,40 @@
+# Copyright (C) 2018  Gavin Shaughnessy
+#
+# Bit-Store is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" converts a wallet's data file to another DataStore backend, e.g:
+
+    python migrate.py <wallet name> --backend sqlite
+"""
+
+import argparse
+import getpass
+import os
+
+from lib.core import config, data
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert a wallet\'s data file to another storage backend. '
+                                                 'The wallet must not be open.')
+    parser.add_argument('wallet', help='name of the wallet')
+    parser.add_argument('--backend', choices=list(data.BACKENDS), default='sqlite')
+    args = parser.parse_args()
+
+    file_path = os.path.join(config.WALLET_DATA_DIR, args.wallet, config.WALLET_DATA_FILE_NAME)
+    if not os.path.isfile(file_path):
+        parser.error(f'wallet "{args.wallet}" does not exist')
+
+    data.migrate_data_file(file_path, getpass.getpass('Password: '), args.backend, segments=config.DATA_SEGMENTS)
+    print(f'Migrated "{args.wallet}" to the {args.backend} backend, the old file is at {file_path}.bak')
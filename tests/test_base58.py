@@ -0,0 +1,89 @@
+# Copyright (C) 2018  Gavin Shaughnessy
+#
+# Bit-Store is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import random
+from hashlib import sha256
+
+import pytest
+
+from extern.bip32utils import Base58
+from lib.core import utils
+
+
+ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+
+def _reference_encode(data):
+    """ the previous (256**i / 58**i loop based) Base58.encode, used as a reference """
+    val = 0
+    for (i, c) in enumerate(data[::-1]):
+        val += (256 ** i) * c
+
+    enc = ''
+    while val >= 58:
+        val, mod = divmod(val, 58)
+        enc = ALPHABET[mod] + enc
+    if val:
+        enc = ALPHABET[val] + enc
+
+    n = len(data) - len(data.lstrip(b'\0'))
+    return ALPHABET[0] * n + enc
+
+
+def _random_payloads(n=500, max_len=80):
+    random.seed(0)
+    payloads = [b'', b'\0', b'\0\0\1', b'\xff' * 32]
+    for _ in range(n):
+        zeros = b'\0' * random.randrange(3)
+        payloads.append(zeros + bytes(random.randrange(256) for _ in range(random.randrange(max_len))))
+
+    return payloads
+
+
+def test_encode_matches_reference():
+    for p in _random_payloads():
+        assert Base58.encode(p) == _reference_encode(p)
+
+
+def test_round_trip():
+    payloads = _random_payloads()
+
+    for p in payloads:
+        assert Base58.decode(Base58.encode(p)) == p
+        assert Base58.check_decode(Base58.check_encode(p)) == p
+
+    assert Base58.check_encode_many(payloads) == [_reference_encode(p + sha256(sha256(p).digest()).digest()[:4])
+                                                  for p in payloads]
+
+
+def test_check_decode_errors():
+    address = '1E9emJj63vhNNzVLNDAHHbiTQgdF6dzG83'
+    assert Base58.check_decode(address)[0] == 0
+
+    with pytest.raises(ValueError):
+        Base58.check_decode(address[:-1] + '4')
+
+    with pytest.raises(ValueError):
+        Base58.decode('0OIl')
+
+
+def test_validate_address():
+    assert utils.validate_address('1E9emJj63vhNNzVLNDAHHbiTQgdF6dzG83')
+    assert utils.validate_address('3CcNeJbf3umiAJbWDQU7s444PATicEfxr8')
+    assert not utils.validate_address('3CcNeJbf3umiAJbWDQU7s444PATicEfxr9')
+    assert not utils.validate_address('mipcBbFg9gMiCh81Kj8tqqdgoZub1ZJRfn')
+    assert utils.validate_address('mipcBbFg9gMiCh81Kj8tqqdgoZub1ZJRfn', allow_testnet=True)
+    assert not utils.validate_address('')
+    assert not utils.validate_address(['1E9emJj63vhNNzVLNDAHHbiTQgdF6dzG83'])
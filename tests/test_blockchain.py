@@ -13,6 +13,13 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
 from lib.core import blockchain
 from ._blockchain_test_vectors import *
 
@@ -45,11 +52,304 @@ class TestBlockchainInfo(blockchain.BlockchainInfo):
 
     __test__ = False
 
-    @property
-    def _blockchain_data(self):
+    def _get_page(self, addresses, offset):
         return RAW_API_DATA
 
 
 def test_blockchain_info_tx_gen():
     blockchain_info = TestBlockchainInfo(addresses=ADDRESSES, refresh_rate=0, timeout=10)
     assert blockchain_info.transactions == TRANSACTIONS
+
+
+BLOCK_HEIGHT = 600000
+
+
+def _raw_txn(i, address):
+    """ a blockchain.info multiaddr txn, paying i + 1000 satoshis to address """
+    return {
+        'hash': f'{i:064x}',
+        'time': 1535066359 + i,
+        # the 10 newest txns are unconfirmed
+        **({'block_height': BLOCK_HEIGHT - i // 10} if i >= 10 else {}),
+        'fee': 500,
+        'weight': 533,
+        'vin_sz': 1,
+        'vout_sz': 1,
+        'inputs': [{'prev_out': {'value': i + 1500, 'addr': '3HL5qTXE6ZApkJc2g8q3x1mDR8Q4SeN3cU', 'n': 0}}],
+        'out': [{'value': i + 1000, 'addr': address, 'n': 0, 'spent': i % 2 == 0, 'script': ''}]
+    }
+
+
+class MultiaddrServer(ThreadingHTTPServer):
+    """ local stand-in for blockchain.info's multiaddr api, serving self.txs newest first """
+
+    def __init__(self, txs):
+        super().__init__(('127.0.0.1', 0), MultiaddrHandler)
+        self.txs = txs
+        self.block_height = BLOCK_HEIGHT
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def active_txs(self, addresses):
+        """ returns the txs with inputs or outputs of addresses """
+        return [tx for tx in self.txs
+                if any(io['addr'] in addresses for io in (*(i['prev_out'] for i in tx['inputs']), *tx['out']))]
+
+    def balances(self, addresses):
+        balances = {a: 0 for a in addresses}
+        for tx in self.txs:
+            for out in tx['out']:
+                if not out['spent'] and out['addr'] in balances:
+                    balances[out['addr']] += out['value']
+
+        return [{'address': a, 'final_balance': b} for a, b in balances.items()]
+
+    def spend(self, i, spent_tx):
+        """ adds txn i, spending the output of spent_tx """
+        with self.lock:
+            out = next(tx for tx in self.txs if tx['hash'] == f'{spent_tx:064x}')['out'][0]
+            out['spent'] = True
+
+            # unconfirmed
+            tx = _raw_txn(i, '14t7TjgZc337dsnVKf4wKdsTxw3NN9ppHk')
+            del tx['block_height']
+            tx['inputs'] = [{'prev_out': {'value': out['value'], 'addr': out['addr'], 'n': 0}}]
+            self.txs.insert(0, tx)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/multiaddr'
+
+
+class MultiaddrHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        offset, n = int(query['offset'][0]), int(query['n'][0])
+
+        addresses = query['active'][0].split('|')
+
+        with self.server.lock:
+            self.server.requests.append((addresses, offset, n))
+            txs = self.server.active_txs(set(addresses))
+
+            data = {
+                'info': {'latest_block': {'height': self.server.block_height}},
+                'wallet': {'n_tx': len(txs)},
+                'addresses': self.server.balances(addresses),
+                'txs': txs[offset:offset + min(n, 100)]
+            }
+
+        body = json.dumps(data).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def multiaddr_server():
+    server = MultiaddrServer([_raw_txn(i, ADDRESSES[i % 3]) for i in range(5000)])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def _blockchain_info(server):
+    blockchain_info = blockchain.BlockchainInfo(addresses=ADDRESSES, refresh_rate=0, timeout=10)
+    blockchain_info.url = server.url
+    return blockchain_info
+
+
+def test_blockchain_info_pages(multiaddr_server):
+    transactions = _blockchain_info(multiaddr_server).transactions
+
+    # every transaction, in the order of the api, requested a page at a time
+    assert [t['txid'] for t in transactions] == [f'{i:064x}' for i in range(5000)]
+    assert sorted(o for _, o, _ in multiaddr_server.requests) == list(range(0, 5000, 100))
+    assert all(a == ADDRESSES and n == 100 for a, _, n in multiaddr_server.requests)
+
+    assert transactions[0]['confirmations'] == 0 and transactions[0]['block_height'] is None
+    assert transactions[4999]['confirmations'] == 500 and transactions[4999]['block_height'] == BLOCK_HEIGHT - 499
+    assert transactions[4999]['wallet_amount'] == 5999 and transactions[4999]['vsize'] == 134
+
+    utxos = _blockchain_info(multiaddr_server).unspent_outputs
+    assert len(utxos) == 2500 and {u[0] for u in utxos} == {f'{i:064x}' for i in range(1, 5000, 2)}
+
+
+@pytest.mark.parametrize('new_txns', [1, blockchain.BlockchainInfo.max_sync_attempts])
+def test_blockchain_info_changed_pages(multiaddr_server, new_txns):
+    blockchain_info = _blockchain_info(multiaddr_server)
+    get_page = blockchain_info._get_page
+    first_pages = []
+
+    def new_txn_get_page(addresses, offset):
+        data = get_page(addresses, offset)
+
+        # a new transaction is made after the first page is requested
+        if offset == 0:
+            first_pages.append(data)
+            if len(first_pages) <= new_txns:
+                with multiaddr_server.lock:
+                    multiaddr_server.txs.insert(0, _raw_txn(5000 + len(first_pages), ADDRESSES[0]))
+
+        return data
+
+    blockchain_info._get_page = new_txn_get_page
+
+    if new_txns < blockchain_info.max_sync_attempts:
+        # the sync starts again from the first page
+        assert len(blockchain_info.transactions) == 5000 + new_txns
+        assert len(first_pages) == new_txns + 1
+        return
+
+    with pytest.raises(blockchain.TransactionsChangedError):
+        blockchain_info.transactions
+
+    assert len(first_pages) == blockchain_info.max_sync_attempts
+
+    # the next request gets all of them
+    del blockchain_info._get_page
+    assert len(blockchain_info.transactions) == 5000 + new_txns
+
+
+def test_blockchain_info_incremental_sync(multiaddr_server):
+    blockchain_info = _blockchain_info(multiaddr_server)
+    transactions, sync_cursor = blockchain_info.transactions, blockchain_info.sync_cursor
+
+    assert sync_cursor['block_height'] == BLOCK_HEIGHT and sync_cursor['n_tx'] == 5000
+    assert sync_cursor['unconfirmed'] == [f'{i:064x}' for i in range(10)]
+
+    # two blocks later: two unconfirmed txns are confirmed, one output is spent by
+    # an unconfirmed txn, and a new txn is received
+    with multiaddr_server.lock:
+        multiaddr_server.block_height = BLOCK_HEIGHT + 2
+        for tx in multiaddr_server.txs[:2]:
+            tx['block_height'] = BLOCK_HEIGHT + 1
+
+    multiaddr_server.spend(5000, spent_tx=3001)
+    with multiaddr_server.lock:
+        multiaddr_server.txs.insert(0, {**_raw_txn(5001, ADDRESSES[1]), 'block_height': BLOCK_HEIGHT + 2})
+
+    multiaddr_server.requests.clear()
+
+    synced = _blockchain_info(multiaddr_server)
+    synced.set_sync_state(transactions, sync_cursor)
+
+    # only the first page was needed, and the result is the same as requesting every page
+    synced.transactions
+    assert [o for _, o, _ in multiaddr_server.requests] == [0]
+    assert synced.transactions == _blockchain_info(multiaddr_server).transactions
+
+    assert synced.sync_cursor['block_height'] == BLOCK_HEIGHT + 2 and synced.sync_cursor['n_tx'] == 5002
+    assert synced.sync_cursor['unconfirmed'] == [f'{i:064x}' for i in [5000, *range(2, 10)]]
+
+    assert synced.transactions[-1]['confirmations'] == 502
+    assert next(t for t in synced.transactions if t['txid'] == f'{3001:064x}')['outputs'][0]['spent'] is True
+    assert len(synced.unspent_outputs) == 2500
+
+
+def test_blockchain_info_incremental_sync_fallback(multiaddr_server):
+    blockchain_info = _blockchain_info(multiaddr_server)
+    transactions, sync_cursor = blockchain_info.transactions, blockchain_info.sync_cursor
+
+    # a cursor of other addresses, or that doesn't match the transactions, isn't used
+    other = blockchain.BlockchainInfo(addresses=ADDRESSES[:-1], refresh_rate=0, timeout=10)
+    other.set_sync_state(transactions, sync_cursor)
+    assert other.sync_cursor is None
+
+    other = _blockchain_info(multiaddr_server)
+    other.set_sync_state(transactions[1:], sync_cursor)
+    assert other.sync_cursor is None
+
+    # an old output spent without a new txn (which can't be synced incrementally) is found
+    # by the balances not matching, and every page is requested again
+    with multiaddr_server.lock:
+        multiaddr_server.txs[-1]['out'][0]['spent'] = True
+
+    multiaddr_server.requests.clear()
+
+    synced = _blockchain_info(multiaddr_server)
+    synced.set_sync_state(transactions, sync_cursor)
+
+    assert synced.transactions[-1]['outputs'][0]['spent'] is True
+    assert len(multiaddr_server.requests) == 51
+
+
+def test_shard_planner():
+    planner = blockchain.AddressShardPlanner(max_size=4, min_size=1, max_length=1000, target_latency=1)
+
+    assert planner.shards(ADDRESSES[:10]) == [ADDRESSES[:4], ADDRESSES[4:8], ADDRESSES[8:10]]
+    assert planner.shards([]) == []
+
+    # shards are also kept under max_length (34 character addresses, plus a separator)
+    planner.max_length = 70
+    assert [len(s) for s in planner.shards(ADDRESSES[:5])] == [2, 2, 1]
+    planner.max_length = 1000
+
+    # slow requests make shards smaller, and fast ones make them bigger again
+    planner.record_latency(1.5)
+    assert planner.size == 2
+    planner.record_latency(0.75)
+    assert planner.size == 2
+    planner.record_latency(0.1)
+    assert planner.size == 3
+    planner.record_latency(0.1)
+    planner.record_latency(0.1)
+    assert planner.size == 4
+
+    for _ in range(5):
+        planner.record_latency(5)
+    assert planner.size == 1
+
+
+def _sharded_blockchain_info(server, shard_size):
+    blockchain_info = _blockchain_info(server)
+    blockchain_info.shard_planner = blockchain.AddressShardPlanner(max_size=shard_size, min_size=shard_size)
+    return blockchain_info
+
+
+def test_blockchain_info_shards(multiaddr_server):
+    # a txn with outputs to addresses in different shards
+    with multiaddr_server.lock:
+        tx = _raw_txn(5000, ADDRESSES[0])
+        del tx['block_height']
+        tx['out'].append({'value': 700, 'addr': ADDRESSES[39], 'n': 1, 'spent': False, 'script': ''})
+        tx['vout_sz'] = 2
+        multiaddr_server.txs.insert(0, tx)
+
+    transactions = _blockchain_info(multiaddr_server).transactions
+    multiaddr_server.requests.clear()
+
+    sharded = _sharded_blockchain_info(multiaddr_server, 10)
+    sharded_transactions = sharded.transactions
+
+    # each shard was requested separately, and txns in more than one shard are only included once
+    assert sorted(len(a) for a, o, _ in multiaddr_server.requests if o == 0) == [10, 10, 10, 10]
+    assert len(sharded_transactions) == len(transactions) == 5001
+    assert sorted(sharded_transactions, key=lambda t: t['txid']) == sorted(transactions, key=lambda t: t['txid'])
+
+    assert sharded_transactions[0]['txid'] == f'{5000:064x}' and sharded_transactions[0]['wallet_amount'] == 6700
+    assert sharded.wallet_balance == _blockchain_info(multiaddr_server).wallet_balance
+
+    # synced incrementally per shard
+    multiaddr_server.spend(5001, spent_tx=3001)
+    multiaddr_server.requests.clear()
+
+    synced = _sharded_blockchain_info(multiaddr_server, 10)
+    synced.set_sync_state(sharded_transactions, sharded.sync_cursor)
+    synced_transactions = synced.transactions
+
+    assert [o for _, o, _ in multiaddr_server.requests] == [0, 0, 0, 0]
+    assert synced.sync_cursor['n_tx'] == 5002
+    assert (sorted(synced_transactions, key=lambda t: t['txid'])
+            == sorted(_blockchain_info(multiaddr_server).transactions, key=lambda t: t['txid']))
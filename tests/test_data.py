@@ -0,0 +1,697 @@
+# Copyright (C) 2018  Gavin Shaughnessy
+#
+# Bit-Store is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import gc
+import copy
+import json
+import pickle
+import zlib
+
+import pytest
+import cryptography.fernet as fernet
+
+from lib.core import data
+
+
+DATA_FORMAT = {
+    'PASSWORD_HASH': str,
+    'TXNS': list,
+    'GAP_LIMIT': int,
+    'KEYS': dict,
+    'SECRET': str
+}
+
+SENSITIVE_DATA = ['KEYS', 'SECRET']
+
+
+@pytest.fixture
+def data_store(tmp_path):
+    file_path = str(tmp_path / 'wallet_data')
+    yield data.DataStore.new_data_store(file_path, 'password', DATA_FORMAT, SENSITIVE_DATA)
+    data.DataStore._instances.pop(file_path, None)
+
+
+def test_frozen_values():
+    value = data.freeze({'a': [1, {'b': [2]}]})
+
+    assert value == {'a': [1, {'b': [2]}]}
+    assert isinstance(value, dict) and isinstance(value['a'], list)
+    assert json.loads(json.dumps(value)) == value
+
+    for modify in (lambda: value.update(a=1), lambda: value.pop('a'), lambda: value['a'].append(3),
+                   lambda: value['a'][1].clear(), lambda: value['a'][1]['b'].sort()):
+        with pytest.raises(TypeError):
+            modify()
+
+    thawed = copy.deepcopy(value)
+    thawed['a'][1]['b'].append(3)
+    assert type(thawed['a']) is list and value['a'][1]['b'] == [2]
+
+    assert pickle.loads(pickle.dumps(value)) == value
+
+
+def test_snapshot_reads(data_store):
+    txns = [{'txid': 'a', 'outputs': [1, 2]}]
+    data_store.write_values(TXNS=txns, GAP_LIMIT=20)
+
+    # later changes to the written object don't change the data store's copy
+    txns.append({'txid': 'b'})
+
+    read = data_store.get_value('TXNS')
+    assert read == [{'txid': 'a', 'outputs': [1, 2]}]
+    assert read is data_store.get_value('TXNS')
+
+    with pytest.raises(TypeError):
+        read.append({'txid': 'c'})
+
+    # a write replaces the value, earlier snapshots are left as they were
+    data_store.write_values(TXNS=list(read) + [{'txid': 'c'}])
+    assert len(read) == 1 and len(data_store.get_value('TXNS')) == 2
+
+    # values are still the same when the file is read again
+    data.DataStore._instances.pop(data_store.file_path, None)
+    reopened = data.DataStore(data_store.file_path, 'password', DATA_FORMAT, SENSITIVE_DATA)
+    assert reopened.get_value('TXNS') == data_store.get_value('TXNS')
+    assert reopened.get_value('GAP_LIMIT') == 20
+
+
+def test_sensitive_values(data_store):
+    keys = {'receiving': {'address': 'wif key'}}
+    data_store.write_values(KEYS=keys, SECRET='secret')
+
+    # the written dict isn't encrypted in place
+    assert keys == {'receiving': {'address': 'wif key'}}
+
+    assert data_store.get_value('SECRET') == 'secret'
+
+    stored = data_store.get_value('KEYS')['receiving']['address']
+    assert stored != 'wif key' and data_store.crypto.decrypt(stored) == 'wif key'
+
+
+@pytest.fixture
+def journal_data_store(tmp_path):
+    file_path = str(tmp_path / 'wallet_data')
+    yield data.DataStore.new_data_store(file_path, 'password', DATA_FORMAT, SENSITIVE_DATA, journal=True)
+    data.DataStore._instances.pop(file_path, None)
+
+
+def _journal_records(journal_path):
+    """ returns the (start, end) offsets of each of the journal's records """
+    with open(journal_path, 'rb') as f:
+        content = f.read()
+
+    records = []
+    pos = len(data.DataFile.HEADER) + data.DataFile.HASH_SIZE
+    while pos < len(content):
+        end = pos + 4 + int.from_bytes(content[pos:pos + 4], 'big')
+        records.append((pos, end))
+        pos = end
+
+    return records
+
+
+def _reopen(data_store, journal=True):
+    data.DataStore._instances.pop(data_store.file_path, None)
+    return data.DataStore(data_store.file_path, 'password', DATA_FORMAT, SENSITIVE_DATA, journal=journal)
+
+
+def test_journal_writes(journal_data_store):
+    snapshot = open(journal_data_store.file_path, 'rb').read()
+
+    for i in range(5):
+        journal_data_store.write_values(GAP_LIMIT=i, TXNS=[{'txid': str(i)}])
+
+    # writes were only appended to the journal
+    assert open(journal_data_store.file_path, 'rb').read() == snapshot
+    # (the first record is the PASSWORD_HASH written when the data store was created)
+    assert len(_journal_records(journal_data_store.data_file.journal_path)) == 6
+
+    reopened = _reopen(journal_data_store)
+    assert reopened.get_value('GAP_LIMIT') == 4
+    assert reopened.get_value('TXNS') == [{'txid': '4'}]
+
+    # a data store that isn't in journal mode still reads the journal, and removes it on its next write
+    reopened = _reopen(reopened, journal=False)
+    assert reopened.get_value('GAP_LIMIT') == 4
+    reopened.write_values(GAP_LIMIT=5)
+    assert not os.path.exists(reopened.data_file.journal_path)
+    assert _reopen(reopened).get_value('GAP_LIMIT') == 5
+
+
+@pytest.mark.parametrize('torn_bytes', [1, 10, 50])
+def test_journal_torn_write(journal_data_store, torn_bytes):
+    journal_data_store.write_values(GAP_LIMIT=1)
+    journal_data_store.write_values(GAP_LIMIT=2)
+
+    journal_path = journal_data_store.data_file.journal_path
+    with open(journal_path, 'rb') as f:
+        records = f.read()
+
+    # the last write was cut off part way through
+    last_record_start = _journal_records(journal_path)[-1][0]
+    with open(journal_path, 'wb') as f:
+        f.write(records[:len(records) - torn_bytes])
+
+    reopened = _reopen(journal_data_store)
+    assert reopened.get_value('GAP_LIMIT') == 1
+    assert os.path.getsize(journal_path) == last_record_start
+
+    # writes after the recovery are appended after the last complete record
+    reopened.write_values(GAP_LIMIT=3)
+    assert _reopen(reopened).get_value('GAP_LIMIT') == 3
+
+
+def test_journal_corrupt_record(journal_data_store):
+    journal_data_store.write_values(GAP_LIMIT=1)
+
+    with open(journal_data_store.data_file.journal_path, 'ab') as f:
+        f.write(len(b'not a record').to_bytes(4, 'big') + b'not a record')
+
+    journal_data_store.write_values(GAP_LIMIT=2)
+
+    # records after one that can't be authenticated aren't trusted
+    assert _reopen(journal_data_store).get_value('GAP_LIMIT') == 1
+
+
+@pytest.mark.parametrize('order, gap_limit, kept', [([0, 1, 3, 2], 1, 2), ([0, 1, 3], 1, 2), ([0, 1, 2, 2, 3], 2, 3)])
+def test_journal_record_order(journal_data_store, order, gap_limit, kept):
+    for i in range(1, 4):
+        journal_data_store.write_values(GAP_LIMIT=i)
+
+    journal_path = journal_data_store.data_file.journal_path
+    with open(journal_path, 'rb') as f:
+        content = f.read()
+
+    records = _journal_records(journal_path)
+    with open(journal_path, 'wb') as f:
+        f.write(content[:records[0][0]] + b''.join(content[slice(*records[i])] for i in order))
+
+    # records that are reordered, replayed or follow a gap aren't applied
+    reopened = _reopen(journal_data_store)
+    assert reopened.get_value('GAP_LIMIT') == gap_limit
+    assert len(_journal_records(journal_path)) == kept
+
+
+def test_journal_other_snapshot(journal_data_store):
+    journal_data_store.write_values(GAP_LIMIT=1)
+
+    journal_path = journal_data_store.data_file.journal_path
+    with open(journal_path, 'rb') as f:
+        journal = f.read()
+
+    journal_data_store.data_file.rewrite(journal_data_store.data_file.read())
+    journal_data_store.write_values(GAP_LIMIT=2)
+    journal_data_store.data_file.rewrite(journal_data_store.data_file.read())
+
+    # the journal was written for an older snapshot of the same data
+    with open(journal_path, 'wb') as f:
+        f.write(journal)
+
+    reopened = _reopen(journal_data_store)
+    assert reopened.get_value('GAP_LIMIT') == 2
+    assert os.path.getsize(journal_path) == 0
+
+
+def test_journal_unfinished_compaction(journal_data_store):
+    for i in range(1, 4):
+        journal_data_store.write_values(GAP_LIMIT=i)
+
+    data_file = journal_data_store.data_file
+    data_file.compact_size = 0
+
+    # the compaction's snapshot is written, but the journal isn't replaced before a crash
+    compacted = {}
+    data_file._compact = lambda data, *args: compacted.update(data=data, args=args)
+    journal_data_store.write_values(GAP_LIMIT=4)
+    journal_data_store.write_values(GAP_LIMIT=5)
+
+    journal_hash, journal_records, _ = compacted['args']
+    data_file._write_snapshot(compacted['data'], base=(journal_hash, journal_records))
+
+    reopened = _reopen(journal_data_store)
+    assert reopened.get_value('GAP_LIMIT') == 5
+    # the data was rewritten, so the journal follows the new snapshot
+    assert not os.path.exists(data_file.journal_path)
+    assert _reopen(reopened).get_value('GAP_LIMIT') == 5
+
+
+def test_journal_compaction(journal_data_store):
+    journal_data_store.data_file.compact_size = 2000
+
+    for i in range(20):
+        journal_data_store.write_values(GAP_LIMIT=i, TXNS=[{'txid': 'a' * 100}] * i)
+
+    journal_data_store.data_file.wait_for_compaction()
+    assert os.path.getsize(journal_data_store.data_file.journal_path) < 20 * 2000
+
+    reopened = _reopen(journal_data_store)
+    assert reopened.get_value('GAP_LIMIT') == 19
+    assert len(reopened.get_value('TXNS')) == 19
+
+    # changing password replaces the journal with a snapshot encrypted with the new key
+    reopened.change_password('new password')
+    assert not os.path.exists(reopened.data_file.journal_path)
+
+    data.DataStore._instances.pop(reopened.file_path, None)
+    with pytest.raises(data.IncorrectPasswordError):
+        data.DataStore(reopened.file_path, 'password', DATA_FORMAT, SENSITIVE_DATA, journal=True)
+
+    data.DataStore._instances.pop(reopened.file_path, None)
+    reopened = data.DataStore(reopened.file_path, 'new password', DATA_FORMAT, SENSITIVE_DATA, journal=True)
+    assert reopened.get_value('GAP_LIMIT') == 19
+
+
+SEGMENTS = {'secrets': ['KEYS', 'SECRET'], 'api': ['TXNS']}
+
+
+def _segment_payloads(file_path):
+    """ returns the encrypted payload of each of the file's segments """
+    with open(file_path, 'rb') as f:
+        content = f.read()
+
+    assert content.startswith(data.DataFile.HEADER)
+
+    segments = {}
+    # (after the wrapped data key and the snapshot's base)
+    pos = len(data.DataFile.HEADER) + 1 + content[len(data.DataFile.HEADER)] + data.DataFile.HASH_SIZE + 4
+    while pos < len(content):
+        name = content[pos + 1:pos + 1 + content[pos]].decode('utf-8')
+        pos += 1 + content[pos]
+        end = pos + 4 + int.from_bytes(content[pos:pos + 4], 'big')
+        segments[name] = content[pos + 4:end]
+        pos = end
+
+    return segments
+
+
+def test_segments(tmp_path):
+    file_path = str(tmp_path / 'wallet_data')
+    data_store = data.DataStore.new_data_store(file_path, 'password', DATA_FORMAT, SENSITIVE_DATA,
+                                               segments=SEGMENTS)
+    data_store.write_values(KEYS={'receiving': {'address': 'wif key'}}, SECRET='secret', GAP_LIMIT=20)
+
+    tokens = _segment_payloads(file_path)
+    assert set(tokens) == {'secrets', 'api', data.DataFile.DEFAULT_SEGMENT}
+
+    encrypted = []
+    encrypt_bytes = data_store.crypto.encrypt_bytes
+    data_store.crypto.encrypt_bytes = lambda b, ad=None: encrypted.append(b) or encrypt_bytes(b, ad)
+
+    data_store.write_values(TXNS=[{'txid': 'a'}])
+
+    # only the api segment was encrypted again
+    new_tokens = _segment_payloads(file_path)
+    assert len(encrypted) == 1 and json.loads(zlib.decompress(encrypted[0])) == {'TXNS': [{'txid': 'a'}]}
+    assert new_tokens['api'] != tokens['api']
+    assert all(new_tokens[s] == tokens[s] for s in tokens if s != 'api')
+
+    data.DataStore._instances.pop(file_path, None)
+    reopened = data.DataStore(file_path, 'password', DATA_FORMAT, SENSITIVE_DATA, segments=SEGMENTS)
+    assert reopened.get_value('TXNS') == [{'txid': 'a'}] and reopened.get_value('SECRET') == 'secret'
+    data.DataStore._instances.pop(file_path, None)
+
+
+def test_single_blob_migration(tmp_path):
+    file_path = str(tmp_path / 'wallet_data')
+    # files from before the data key were encrypted with fernet, with the password's key
+    crypto = fernet.Fernet(data.Crypto.key_from_password('password'))
+    # (sensitive values were fernet tokens too)
+    old_data = {'PASSWORD_HASH': '', 'TXNS': [{'txid': 'a'}], 'GAP_LIMIT': 20,
+                'KEYS': {'receiving': {'address': crypto.encrypt(b'wif key').decode()}},
+                'SECRET': crypto.encrypt(b'secret').decode()}
+    token = crypto.encrypt(json.dumps(old_data).encode()).decode()
+
+    # new files were written with json.dump, and rewritten with the token as it is
+    for content in (json.dumps(token), token):
+        with open(file_path, 'w') as f:
+            f.write(content)
+
+        with pytest.raises(data.IncorrectPasswordError):
+            data.DataStore(file_path, 'wrong password', DATA_FORMAT, SENSITIVE_DATA, segments=SEGMENTS)
+        data.DataStore._instances.pop(file_path, None)
+
+        data_store = data.DataStore(file_path, 'password', DATA_FORMAT, SENSITIVE_DATA, segments=SEGMENTS)
+        assert data_store.get_value('TXNS') == [{'txid': 'a'}] and data_store.get_value('GAP_LIMIT') == 20
+
+        with open(file_path, 'rb') as f:
+            assert f.read().startswith(data.DataFile.HEADER)
+        assert set(_segment_payloads(file_path)) == {'secrets', 'api', data.DataFile.DEFAULT_SEGMENT}
+
+        # the sensitive values are encrypted with the data key, so they can still be
+        # decrypted after a password change
+        assert data_store._data['SECRET'].startswith(data.Crypto.TOKEN_PREFIX)
+        assert data_store._data['KEYS']['receiving']['address'].startswith(data.Crypto.TOKEN_PREFIX)
+
+        data_store.write_values(GAP_LIMIT=25)
+        data_store.change_password('new password')
+        data.DataStore._instances.pop(file_path, None)
+
+        data_store = data.DataStore(file_path, 'new password', DATA_FORMAT, SENSITIVE_DATA, segments=SEGMENTS)
+        assert data_store.get_value('GAP_LIMIT') == 25 and data_store.get_value('SECRET') == 'secret'
+        assert data_store.crypto.decrypt(data_store.get_value('KEYS')['receiving']['address']) == 'wif key'
+        data.DataStore._instances.pop(file_path, None)
+
+
+SQLITE_DATA_FORMAT = {
+    **DATA_FORMAT,
+    'UNSPENT_OUTS': list,
+    'ADDRESS_BALS': dict
+}
+
+
+def _sqlite_txn(txid, input_address, output_address):
+    return {'txid': txid, 'block_height': None,
+            'inputs': [{'address': input_address, 'value': 2000, 'n': 0}],
+            'outputs': [{'address': output_address, 'value': 1000, 'n': 0, 'spent': False}]}
+
+
+def test_sqlite_backend(tmp_path):
+    file_path = str(tmp_path / 'wallet_data')
+    data_store = data.DataStore.new_data_store(file_path, 'password', SQLITE_DATA_FORMAT, SENSITIVE_DATA,
+                                               backend='sqlite')
+    assert isinstance(data_store.data_file, data.SQLiteDataFile)
+
+    txns = [_sqlite_txn(f'txid{i}', f'address{i}', f'address{i + 1}') for i in range(10)]
+    utxos = [['txid9', 0, 'address10', 'script', 1000, 1]]
+    data_store.write_values(TXNS=txns, UNSPENT_OUTS=utxos, ADDRESS_BALS={'address10': [1000, 0]},
+                            SECRET='secret', GAP_LIMIT=20)
+
+    assert data_store.transactions_page(2, 3) == txns[2:5]
+    assert data_store.address_transactions('address5') == txns[4:6]
+    assert data_store.data_file.transaction('txid3') == txns[3]
+    assert data_store.data_file.address_utxos('address10') == utxos
+
+    # txids, addresses and values aren't stored in plain text
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    assert b'txid3' not in content and b'address5' not in content and b'secret' not in content
+
+    encrypted = []
+    encrypt = data_store.crypto.encrypt
+    data_store.crypto.encrypt = lambda string: encrypted.append(string) or encrypt(string)
+
+    statements = []
+    data_store.data_file._connection.set_trace_callback(statements.append)
+
+    # only the new transaction is written, the others keep their rows as they are
+    data_store.write_values(TXNS=[_sqlite_txn('txid10', 'address10', 'address11'), *txns])
+    assert len(encrypted) == 1 and json.loads(encrypted[0])['txid'] == 'txid10'
+    assert not any(s.startswith('UPDATE') for s in statements)
+    data_store.data_file._connection.set_trace_callback(None)
+    assert data_store.transactions_page(0, 2) == [_sqlite_txn('txid10', 'address10', 'address11'), txns[0]]
+    assert data_store.address_transactions('address11') == [_sqlite_txn('txid10', 'address10', 'address11')]
+
+    data_store.write_values(TXNS=txns[5:])
+    assert data_store.address_transactions('address1') == []
+    data_store.crypto.encrypt = encrypt
+
+    data.DataStore._instances.pop(file_path, None)
+    with pytest.raises(data.IncorrectPasswordError):
+        data.DataStore(file_path, 'wrong password', SQLITE_DATA_FORMAT, SENSITIVE_DATA)
+    data.DataStore._instances.pop(file_path, None)
+
+    data_store = data.DataStore(file_path, 'password', SQLITE_DATA_FORMAT, SENSITIVE_DATA)
+    assert isinstance(data_store.data_file, data.SQLiteDataFile)
+    assert data_store.get_value('TXNS') == txns[5:] and data_store.get_value('UNSPENT_OUTS') == utxos
+    assert data_store.get_value('ADDRESS_BALS') == {'address10': [1000, 0]}
+    assert data_store.get_value('SECRET') == 'secret' and data_store.get_value('GAP_LIMIT') == 20
+
+    data_store.change_password('new password')
+    data.DataStore._instances.pop(file_path, None)
+
+    data_store = data.DataStore(file_path, 'new password', SQLITE_DATA_FORMAT, SENSITIVE_DATA)
+    assert data_store.address_transactions('address6') == txns[5:7]
+    data_store.data_file.close()
+    data.DataStore._instances.pop(file_path, None)
+
+
+def test_sqlite_positions(tmp_path):
+    file_path = str(tmp_path / 'wallet_data')
+    data_store = data.DataStore.new_data_store(file_path, 'password', SQLITE_DATA_FORMAT, SENSITIVE_DATA,
+                                               backend='sqlite')
+
+    txns = [_sqlite_txn(f'txid{i}', f'address{i}', f'address{i + 1}') for i in range(10)]
+    new_txns = [_sqlite_txn(f'txid{i}', f'address{i}', f'address{i + 1}') for i in range(10, 20)]
+    changed = {**txns[4], 'block_height': 600000}
+
+    # added to the start, end and middle (where there's no room left), changed, removed and moved
+    for value in ([*new_txns[:2], *txns], [*new_txns[:2], *txns, *new_txns[2:4]],
+                  [*txns[:3], *new_txns[4:], *txns[3:]], [*txns[:4], changed, *txns[6:]],
+                  [*txns[5:], *txns[:5]]):
+        data_store.write_values(TXNS=value)
+        assert data_store.transactions_page(0, 50) == value
+
+        data.DataStore._instances.pop(file_path, None)
+        data_store.data_file.close()
+        data_store = data.DataStore(file_path, 'password', SQLITE_DATA_FORMAT, SENSITIVE_DATA)
+        assert data_store.get_value('TXNS') == value
+
+    data_store.close()
+
+
+def test_sqlite_write_behind(tmp_path):
+    file_path = str(tmp_path / 'wallet_data')
+    data_store = data.DataStore.new_data_store(file_path, 'password', SQLITE_DATA_FORMAT, SENSITIVE_DATA,
+                                               backend='sqlite', flush_latency=60)
+    data_store.flush()
+    flush_count = data_store.flush_count
+
+    # the TXNS are only in memory until they are paged, which writes them first
+    txns = [_sqlite_txn(f'txid{i}', f'address{i}', f'address{i + 1}') for i in range(10)]
+    data_store.write_values(TXNS=txns)
+    assert data_store.flush_count == flush_count
+
+    assert data_store.transactions_page(2, 3) == txns[2:5]
+    assert data_store.flush_count == flush_count + 1
+
+    data_store.write_values(TXNS=txns[5:])
+    assert data_store.address_transactions('address1') == []
+    assert data_store.address_transactions('address6') == txns[5:7]
+
+    # other pending values don't have to be written to page the TXNS
+    data_store.write_values(GAP_LIMIT=5)
+    flush_count = data_store.flush_count
+    assert data_store.transactions_page(0, 1) == txns[5:6]
+    assert data_store.flush_count == flush_count
+
+    data_store.close()
+
+
+def test_sqlite_migration(tmp_path):
+    file_path = str(tmp_path / 'wallet_data')
+    txns = [_sqlite_txn('txid0', 'address0', 'address1')]
+
+    data_store = data.DataStore.new_data_store(file_path, 'password', SQLITE_DATA_FORMAT, SENSITIVE_DATA,
+                                               journal=True, segments=SEGMENTS)
+    data_store.write_values(TXNS=txns, SECRET='secret')
+    data.DataStore._instances.pop(file_path, None)
+
+    with pytest.raises(data.IncorrectPasswordError):
+        data.migrate_data_file(file_path, 'wrong password', 'sqlite')
+
+    data.migrate_data_file(file_path, 'password', 'sqlite')
+    assert os.path.exists(file_path + '.bak') and not os.path.exists(file_path + '.journal')
+
+    data_store = data.DataStore(file_path, 'password', SQLITE_DATA_FORMAT, SENSITIVE_DATA)
+    assert isinstance(data_store.data_file, data.SQLiteDataFile)
+    assert data_store.get_value('TXNS') == txns and data_store.get_value('SECRET') == 'secret'
+    data_store.data_file.close()
+    data.DataStore._instances.pop(file_path, None)
+
+    # and back again
+    data.migrate_data_file(file_path, 'password', 'file', segments=SEGMENTS)
+    data_store = data.DataStore(file_path, 'password', SQLITE_DATA_FORMAT, SENSITIVE_DATA, segments=SEGMENTS)
+    assert isinstance(data_store.data_file, data.DataFile)
+    assert data_store.get_value('TXNS') == txns and data_store.address_transactions('address1') == txns
+    data.DataStore._instances.pop(file_path, None)
+
+
+def test_write_behind(tmp_path):
+    file_path = str(tmp_path / 'wallet_data')
+    data_store = data.DataStore.new_data_store(file_path, 'password', DATA_FORMAT, SENSITIVE_DATA,
+                                               journal=True, flush_latency=60)
+    data_store.flush()
+    stats = data_store.stats
+    journal_size = os.path.getsize(file_path + '.journal')
+
+    for i in range(5):
+        data_store.write_values(GAP_LIMIT=i, TXNS=[{'txid': str(i)}])
+
+    # written in memory straight away, but not to file
+    assert data_store.get_value('GAP_LIMIT') == 4
+    assert data_store.stats['bytes_written'] == stats['bytes_written']
+    assert os.path.getsize(file_path + '.journal') == journal_size
+
+    with data_store:
+        data_store.write_values(SECRET='secret')
+
+    assert data_store.stats['writes'] - stats['writes'] == 6
+    assert data_store.stats['writes_coalesced'] - stats['writes_coalesced'] == 5
+    assert data_store.stats['flushes'] - stats['flushes'] == 1
+    assert data_store.stats['bytes_written'] > stats['bytes_written']
+
+    # one record for the PASSWORD_HASH written when it was opened, and one for the writes since
+    assert len(_journal_records(file_path + '.journal')) == 2
+
+    data_store.flush()
+    assert data_store.stats['flushes'] - stats['flushes'] == 1
+
+    # the flush thread writes within flush_latency
+    data_store.flush_latency = 0.01
+    data_store.write_values(GAP_LIMIT=20)
+    data_store._flush_timer.join()
+
+    data.DataStore._instances.pop(file_path, None)
+    reopened = data.DataStore(file_path, 'password', DATA_FORMAT, SENSITIVE_DATA)
+    assert reopened.get_value('GAP_LIMIT') == 20 and reopened.get_value('TXNS') == [{'txid': '4'}]
+    assert reopened.get_value('SECRET') == 'secret'
+    data.DataStore._instances.pop(file_path, None)
+
+
+def test_open_reads_once(tmp_path, monkeypatch):
+    file_path = str(tmp_path / 'wallet_data')
+    data.DataStore.new_data_store(file_path, 'password', DATA_FORMAT, SENSITIVE_DATA, journal=True,
+                                  segments=SEGMENTS)
+    data.DataStore._instances.pop(file_path, None)
+
+    decrypted = []
+    decrypt_bytes = data.Crypto.decrypt_bytes
+    monkeypatch.setattr(data.Crypto, 'decrypt_bytes',
+                        lambda self, b, *args: decrypted.append(b) or decrypt_bytes(self, b, *args))
+
+    with open(file_path, 'rb') as f:
+        content = f.read()
+
+    data_store = data.DataStore(file_path, 'password', DATA_FORMAT, SENSITIVE_DATA, journal=True, segments=SEGMENTS)
+
+    # the 3 segments and the journal record of the PASSWORD_HASH are each decrypted
+    # once, and nothing is written as the file's keys are already up to date
+    assert len(decrypted) == len(set(decrypted)) == 4
+    assert data_store.stats['bytes_written'] == 0
+    with open(file_path, 'rb') as f:
+        assert f.read() == content
+
+    assert isinstance(data_store._data['TXNS'], data.FrozenList)
+    data.DataStore._instances.pop(file_path, None)
+
+
+def test_newer_version(tmp_path):
+    file_path = str(tmp_path / 'wallet_data')
+    data.DataStore.new_data_store(file_path, 'password', DATA_FORMAT, SENSITIVE_DATA)
+    data.DataStore._instances.pop(file_path, None)
+
+    # files from a newer version aren't read
+    with open(file_path, 'r+b') as f:
+        f.seek(len(data.DataFile.MAGIC))
+        f.write(bytes([data.DataFile.VERSION + 1]))
+
+    with pytest.raises(data.InvalidFileFormat):
+        data.DataStore(file_path, 'password', DATA_FORMAT, SENSITIVE_DATA)
+    data.DataStore._instances.pop(file_path, None)
+
+
+def test_envelope_encryption(tmp_path):
+    file_path = str(tmp_path / 'wallet_data')
+    data_store = data.DataStore.new_data_store(file_path, 'password', DATA_FORMAT, SENSITIVE_DATA,
+                                               journal=True, segments=SEGMENTS)
+    keys = {'receiving': {f'address{i}': f'wif key {i}' for i in range(10)}, 'change': {}}
+    data_store.write_values(KEYS=keys, SECRET='secret', TXNS=[{'txid': 'a'}])
+
+    # sensitive values are encrypted with the data key, each with its own nonce
+    tokens = list(data_store.get_value('KEYS')['receiving'].values())
+    assert all(t.startswith(data.Crypto.TOKEN_PREFIX) for t in tokens) and len(set(tokens)) == len(tokens)
+    assert data_store.crypto.decrypt_many(tokens) == list(keys['receiving'].values())
+
+    # (the journal's changes are compacted into the snapshot when the key is written)
+    data_store.data_file.rewrite(data_store._data)
+
+    encrypted = []
+    for name in ('encrypt', 'encrypt_many', 'encrypt_bytes'):
+        func = getattr(data_store.crypto, name)
+        setattr(data_store.crypto, name, lambda *args, _f=func, _n=name: encrypted.append(_n) or _f(*args))
+
+    # changing the password only wraps the data key again (and writes the new password hash)
+    data_store.change_password('new password')
+    assert encrypted == ['encrypt_bytes']
+    assert not os.path.exists(file_path + '.journal')
+
+    data.DataStore._instances.pop(file_path, None)
+    with pytest.raises(data.IncorrectPasswordError):
+        data.DataStore(file_path, 'password', DATA_FORMAT, SENSITIVE_DATA, segments=SEGMENTS)
+    data.DataStore._instances.pop(file_path, None)
+
+    data_store = data.DataStore(file_path, 'new password', DATA_FORMAT, SENSITIVE_DATA, segments=SEGMENTS)
+    assert data_store.validate_password('new password')
+    assert data_store.get_value('SECRET') == 'secret' and data_store.get_value('TXNS') == [{'txid': 'a'}]
+    assert data_store.crypto.decrypt(data_store.get_value('KEYS')['receiving']['address3']) == 'wif key 3'
+    data.DataStore._instances.pop(file_path, None)
+
+
+def test_close(tmp_path):
+    file_path = str(tmp_path / 'wallet_data')
+    data_store = data.DataStore.new_data_store(file_path, 'password', DATA_FORMAT, SENSITIVE_DATA,
+                                               journal=True, flush_latency=60)
+    data_store.write_values(GAP_LIMIT=5)
+
+    assert data.DataStore.open_stores() == {file_path: data_store}
+    assert data.DataStore(file_path, 'password', DATA_FORMAT, SENSITIVE_DATA, journal=True) is data_store
+
+    # the store was opened twice, so it stays open until it is closed twice
+    data_store.close()
+    assert not data_store.closed and data.DataStore.open_stores() == {file_path: data_store}
+
+    # a wrong password doesn't open the store (or change the key of the open store)
+    with pytest.raises(data.IncorrectPasswordError):
+        data.DataStore(file_path, 'wrong password', DATA_FORMAT, SENSITIVE_DATA, journal=True)
+    assert data_store.get_value('GAP_LIMIT') == 5
+
+    # pending writes are written when the store is closed
+    data_store.close()
+    assert data_store.closed and data_store._flush_timer is None
+    assert file_path not in data.DataStore.open_stores()
+
+    with pytest.raises(data.DataStoreClosedError):
+        data_store.get_value('GAP_LIMIT')
+
+    with pytest.raises(data.DataStoreClosedError):
+        data_store.write_values(GAP_LIMIT=10)
+
+    reopened = data.DataStore(file_path, 'password', DATA_FORMAT, SENSITIVE_DATA, journal=True)
+    assert reopened is not data_store and reopened.get_value('GAP_LIMIT') == 5
+
+    # closing an old store doesn't remove the store that replaced it
+    data_store.close()
+    assert data.DataStore.open_stores() == {file_path: reopened}
+
+    # stores that aren't used anymore are removed without being closed
+    del data_store, reopened
+    gc.collect()
+    assert file_path not in data.DataStore.open_stores()
+
+
+def test_memory_usage(data_store):
+    usage = data_store.memory_usage
+    assert usage > 0 and data.DataStore.memory_report()[data_store.file_path] == usage
+
+    # only counted again once the data changes
+    assert data_store._memory_usage is not None and data_store.memory_usage == usage
+
+    data_store.write_values(TXNS=[{'txid': str(i) * 64} for i in range(100)])
+    assert data_store._memory_usage is None
+    assert data_store.memory_usage > usage + 100 * 64
+
+    data_store.close()
+    assert data_store.file_path not in data.DataStore.memory_report()
@@ -0,0 +1,168 @@
+# Copyright (C) 2018  Gavin Shaughnessy
+#
+# Bit-Store is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+
+import pytest
+
+from lib.core import blockchain
+from lib.core.discovery import AccountDiscovery, discover_accounts, PublicHDWalletObjectError, _ChainScan
+from lib.core.hd import HDWallet
+from extern.bip32utils.BIP32Key import BIP32Key
+
+
+MNEMONIC = 'abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon about'
+
+# first receiving address of account 0 of each purpose (BIP44, BIP49 and BIP84 test vectors)
+BIP44_ADDRESS = '1LqBGSKuX5yYUonjxT5qGfpUsXKYYWeabA'
+BIP49_ADDRESS = '37VucYSaXLCAsxYyAPfbSi9eh4iEcbShgf'
+BIP84_ADDRESS = 'bc1qcr8te4kr609gcawutmrza0j4xv80jy8z306fyu'
+
+EXTERNAL_ADDRESS = '1E9emJj63vhNNzVLNDAHHbiTQgdF6dzG83'
+
+
+def _addresses(path, gap_limit=50):
+    return HDWallet.from_mnemonic(MNEMONIC, path, segwit=False, gap_limit=gap_limit,
+                                  multi_processing=False).addresses()
+
+
+def _txn(txid, address, value, confirmations=1, spent=False):
+    return {
+        'txid': txid,
+        'date': '2018-01-01 00:00:00',
+        'block_height': None,
+        'confirmations': confirmations,
+        'fee': 1000,
+        'vsize': 200,
+        'inputs': [{'value': value + 1000, 'address': EXTERNAL_ADDRESS, 'n': 0}],
+        'outputs': [{'value': value, 'address': address, 'n': 0, 'spent': spent, 'script': ''}],
+        'wallet_amount': value
+    }
+
+
+class StubApi(blockchain._BlockchainBaseClass):
+    """ serves the transactions in self.ledger that involve the requested addresses """
+
+    __test__ = False
+
+    bech32_support = True
+
+    ledger = []
+    requests = []
+    lock = threading.Lock()
+
+    def __init__(self, addresses, refresh_rate, timeout):
+        super().__init__(addresses, refresh_rate, timeout)
+
+        with self.lock:
+            self.requests.append(list(addresses))
+
+    @property
+    def transactions(self):
+        return [t for t in self.ledger
+                if any(o['address'] in self.addresses for o in t['outputs'])]
+
+
+@pytest.fixture
+def stub_api():
+    account_0 = _addresses("44'/0'/0'")
+    account_1 = _addresses("44'/0'/1'")
+    account_3 = _addresses("44'/0'/3'")
+
+    StubApi.ledger = [
+        _txn('a', BIP44_ADDRESS, 10000),
+        _txn('b', account_0[0][15], 20000, confirmations=0),
+        # more than the gap limit after the last used address, so it isn't found
+        _txn('c', account_0[0][40], 40000),
+        _txn('d', account_0[1][3], 5000, spent=True),
+        _txn('e', account_1[0][2], 30000),
+        # account 2 is unused, so account 3 is never scanned
+        _txn('f', account_3[0][0], 50000),
+        _txn('g', BIP84_ADDRESS, 60000),
+    ]
+    StubApi.requests = []
+
+    return lambda addresses: StubApi(addresses, refresh_rate=0, timeout=10)
+
+
+def test_discovery(stub_api):
+    accounts = discover_accounts(MNEMONIC, api_factory=stub_api, bech32_support=True)
+
+    assert [(a.purpose, a.account, a.path) for a in accounts] == [
+        (44, 0, "44'/0'/0'"), (44, 1, "44'/0'/1'"), (84, 0, "84'/0'/0'")
+    ]
+
+    account_0, account_1, bip84_account = accounts
+
+    assert account_0.receiving_index == 16
+    assert account_0.change_index == 4
+    assert account_0.tx_count == 3
+    assert account_0.balance == [10000, 20000]
+    assert account_0.has_funds
+    assert account_0.account_public_key == HDWallet.from_mnemonic(
+        MNEMONIC, "44'/0'/0'", multi_processing=False).account_public_key
+
+    assert account_1.receiving_index == 3
+    assert account_1.change_index == 0
+    assert account_1.tx_count == 1
+
+    assert bip84_account.address_type == 'p2wpkh'
+    assert bip84_account.balance == [60000, 0]
+
+    # every request is one gap limit sized batch (or less), and no address is requested twice
+    requested = [a for r in StubApi.requests for a in r]
+    assert max(len(r) for r in StubApi.requests) == 20
+    assert len(requested) == len(set(requested))
+
+
+def test_chain_scan():
+    chain_ck = BIP32Key.fromExtendedKey(HDWallet.from_mnemonic(MNEMONIC, "44'/0'/0'", multi_processing=False)
+                                        .chain_keys()['receiving'])
+    addresses = _addresses("44'/0'/0'")[0]
+    scan = _ChainScan(chain_ck, 44, gap_limit=5)
+
+    assert scan.next_batch() == addresses[:5]
+    scan.update(addresses[:5], {addresses[2]})
+
+    # only the addresses up to the gap limit after the last used one are derived
+    assert scan.next_batch() == addresses[5:8]
+    scan.update(addresses[5:8], set())
+    assert scan.done and scan.stream.cursor == 8
+
+
+def test_discovery_without_bech32(stub_api):
+    accounts = discover_accounts(MNEMONIC, api_factory=stub_api, purposes=(49, 84))
+    assert accounts == []
+
+    StubApi.ledger.append(_txn('h', BIP49_ADDRESS, 70000))
+    accounts = discover_accounts(MNEMONIC, api_factory=stub_api, purposes=(49, 84))
+
+    assert [(a.purpose, a.account) for a in accounts] == [(49, 0)]
+
+
+def test_discovery_limits(stub_api):
+    accounts = discover_accounts(MNEMONIC, api_factory=stub_api, purposes=(44,), gap_limit=10, max_accounts=1)
+
+    assert [(a.purpose, a.account) for a in accounts] == [(44, 0)]
+    assert accounts[0].receiving_index == 1
+
+    master_key = HDWallet.from_mnemonic(MNEMONIC, 'm', multi_processing=False).master_private_key
+    public_key = BIP32Key.fromExtendedKey(master_key).ExtendedKey(private=False)
+
+    with pytest.raises(PublicHDWalletObjectError):
+        AccountDiscovery(public_key, api_factory=stub_api)
+
+    with pytest.raises(ValueError):
+        AccountDiscovery(master_key, purposes=(45,), api_factory=stub_api)
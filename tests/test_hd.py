@@ -15,7 +15,10 @@
 
 import pytest
 
-from lib.core.hd import HDWallet, PublicHDWalletObjectError, InvalidPath
+from lib.core.hd import (HDWallet, AddressStream, HDWalletPrecompute, PublicHDWalletObjectError, InvalidPath,
+                         shutdown_derivation_pool, chain_addresses, WORDLIST)
+from extern.bip32utils import curve
+from extern.bip32utils.BIP32Key import BIP32Key, BIP32_HARDEN
 
 
 VALID_MNEMONIC = 'lion harvest elbow beauty butter spirit park jungle dose need flock hobby'
@@ -87,6 +90,22 @@ def test_address_gen():
     assert segwit_addresses[1][0] == '33kxurPZvAZLeM7PYg5F2ekq6yS7DahrUe'
 
 
+def test_chain_addresses():
+    def chain_ck(hd_):
+        return BIP32Key.fromExtendedKey(hd_.chain_keys()['receiving'])
+
+    assert chain_addresses(chain_ck(bip32_), 'p2pkh', 0, 1) == normal_addresses[0]
+    assert chain_addresses(chain_ck(segwit_bip32_), 'p2sh-p2wpkh', 0, 1) == segwit_addresses[0]
+
+    # BIP84 test vector
+    bip84_ = HDWallet.from_mnemonic('abandon ' * 11 + 'about', "84'/0'/0'", multi_processing=False)
+    assert chain_addresses(chain_ck(bip84_), 'p2wpkh', 0, 2) == ['bc1qcr8te4kr609gcawutmrza0j4xv80jy8z306fyu',
+                                                               'bc1qnjg0jd8228aq7egyzacy8cys3knf9xvrerkf9g']
+
+    with pytest.raises(ValueError):
+        chain_addresses(chain_ck(bip32_), 'p2tr', 0, 1)
+
+
 def test_wif_gen():
     assert normal_wif_keys[0][0] == 'L4XqkXusVoxrNH91cQrCDXbJLJ3ThvJXvecMAnzPfnL3pXPeSDt2'
     assert normal_wif_keys[1][0] == 'L5UPjSsf7VWhqFSbzWZKLEU1ymdPKCih2yHQATT73hKnTtS7NPiE'
@@ -99,3 +118,196 @@ def test_address_wifkey_pairs():
     assert bip32_.address_wifkey_pairs() ==\
            {'receiving': dict(zip(normal_addresses[0], normal_wif_keys[0])),
             'change': dict(zip(normal_addresses[1], normal_wif_keys[1]))}
+
+
+# BIP32 test vector 1, chain m/0H/1/2H/2/1000000000
+BIP32_TV1_SEED = '000102030405060708090a0b0c0d0e0f'
+BIP32_TV1_PATH = (0 + BIP32_HARDEN, 1, 2 + BIP32_HARDEN, 2, 1000000000)
+BIP32_TV1_XPUB = 'xpub6H1LXWLaKsWFhvm6RVpEL9P4KfRZSW7abD2ttkWP3SSQvnyA8FSVqNTEcYFgJS2UaFcxupHiYkro49S8yGasTvXEYBVPamhGW6cFJodrTHy'
+BIP32_TV1_XPRV = 'xprvA41z7zogVVwxVSgdKUHDy1SKmdb533PjDz7J6N6mV6uS3ze1ai8FHa8kmHScGpWmj4WggLyQjgPie1rFSruoUihUZREPSL39UNdE3BBDu76'
+
+
+@pytest.fixture(params=list(curve.BACKENDS))
+def curve_backend(request):
+    curve.set_backend(request.param)
+    yield request.param
+    curve.set_backend(curve.DEFAULT_BACKEND)
+
+
+def test_curve_backend_bip32_vectors(curve_backend):
+    key = BIP32Key.fromEntropy(bytes.fromhex(BIP32_TV1_SEED))
+    for i in BIP32_TV1_PATH:
+        key = key.ChildKey(i)
+
+    assert key.ExtendedKey(private=True) == BIP32_TV1_XPRV
+    assert key.ExtendedKey(private=False) == BIP32_TV1_XPUB
+
+    # public derivation of the non-hardened tail of the path
+    key = BIP32Key.fromEntropy(bytes.fromhex(BIP32_TV1_SEED))
+    for i in BIP32_TV1_PATH[:3]:
+        key = key.ChildKey(i)
+
+    public_key = BIP32Key.fromExtendedKey(key.ExtendedKey(private=False))
+    assert public_key.ChildKey(2).ChildKey(1000000000).ExtendedKey(private=False) == BIP32_TV1_XPUB
+    assert public_key.ChildKeys([2])[0].ChildKeys([1000000000])[0].ExtendedKey(private=False) == BIP32_TV1_XPUB
+
+
+def test_curve_backend_address_gen(curve_backend):
+    hd_ = HDWallet.from_mnemonic(VALID_MNEMONIC, '0', gap_limit=GAP_LIMIT, segwit=False, multi_processing=False)
+    segwit_hd = HDWallet.from_mnemonic(VALID_MNEMONIC, "49'/0'/0'", gap_limit=GAP_LIMIT, multi_processing=False)
+
+    assert hd_.addresses() == normal_addresses
+    assert hd_.wif_keys() == normal_wif_keys
+    assert segwit_hd.addresses() == segwit_addresses
+    assert HDWallet(PUBLIC_KEY, '0', gap_limit=GAP_LIMIT, segwit=False).addresses() == public_addresses
+
+
+def test_bip32_key_memoization(monkeypatch):
+    key = BIP32Key.fromExtendedKey(PUBLIC_KEY)
+    assert not hasattr(key, '__dict__')
+
+    compress_calls = []
+    compress = curve.compress
+    monkeypatch.setattr(curve, 'compress', lambda point: compress_calls.append(point) or compress(point))
+
+    children = key.ChildKeys(range(10)) + [key.ChildKey(i) for i in range(10, 20)]
+    assert len(compress_calls) == 1
+    assert all(c.parent_fpr == key.Fingerprint() == key.Identifier()[:4] for c in children)
+
+    child = children[0]
+    child.Address(), child.P2WPKHoP2SHAddress(), child.ExtendedKey(private=False)
+    assert len(compress_calls) == 2
+
+
+def test_curve_set_backend():
+    with pytest.raises(ValueError):
+        curve.set_backend('not a backend')
+
+
+def test_iter_addresses():
+    stream = bip32_.iter_addresses('receiving')
+    assert next(stream) == (0, normal_addresses[0][0])
+    assert stream.cursor == 1
+
+    # resuming a stream from its cursor continues where it left off
+    hd_ = HDWallet.from_mnemonic(VALID_MNEMONIC, '0', gap_limit=3, segwit=False, multi_processing=False)
+    expected = hd_.addresses()
+    first = hd_.iter_addresses('change', stop=2)
+    first_addresses = [a for _, a in first]
+    resumed = hd_.iter_addresses('change', start=first.cursor, stop=3)
+    assert first_addresses + [a for _, a in resumed] == expected[1]
+
+    assert list(hd_.iter_wif_keys('receiving', 1, 3)) == list(enumerate(hd_.wif_keys()[0]))[1:]
+    assert public_bip32_.iter_wif_keys('receiving') is None
+
+    # take derives the values it needs in one batch, and picks up the ones already derived
+    batches = []
+    stream = AddressStream(lambda start, stop: batches.append((start, stop)) or list(range(start, stop)),
+                           batch_size=2, stop=10)
+    assert next(stream) == (0, 0)
+    assert stream.take(5) == [(i, i) for i in range(1, 6)]
+    assert stream.take(20) == [(i, i) for i in range(6, 10)] and stream.take(1) == []
+    assert batches == [(0, 2), (2, 6), (6, 10)]
+
+    with pytest.raises(ValueError):
+        bip32_.iter_addresses('not a chain')
+
+
+def test_derivation_pool():
+    hd_ = HDWallet.from_mnemonic(VALID_MNEMONIC, "49'/0'/0'", gap_limit=40)
+    serial_hd = HDWallet.from_mnemonic(VALID_MNEMONIC, "49'/0'/0'", gap_limit=40, multi_processing=False)
+
+    assert hd_.addresses() == serial_hd.addresses()
+    assert hd_.wif_keys(start_idx=35) == serial_hd.wif_keys(start_idx=35)
+    assert list(hd_.iter_addresses('change', 10, 40)) == list(serial_hd.iter_addresses('change', 10, 40))
+
+    # the pool is restarted if it is used after being shut down
+    shutdown_derivation_pool()
+    assert hd_.addresses(start_idx=39) == serial_hd.addresses(start_idx=39)
+
+
+def test_public_derivation_pool():
+    account_xpub = HDWallet.from_mnemonic(VALID_MNEMONIC, "49'/0'/0'", gap_limit=1).account_public_key
+    public_hd = HDWallet(account_xpub, 'm', gap_limit=40)
+    serial_public_hd = HDWallet(account_xpub, 'm', gap_limit=40, multi_processing=False)
+
+    assert public_hd.multi_processed
+    assert public_hd.addresses() == serial_public_hd.addresses()
+    assert public_hd.addresses()[0][0] == segwit_addresses[0][0]
+
+
+def test_from_chain_keys():
+    chain_hd = HDWallet.from_chain_keys(**{f'{k}_key': v for k, v in segwit_bip32_.chain_keys().items()},
+                                        gap_limit=GAP_LIMIT)
+    public_chain_hd = HDWallet.from_chain_keys(**{f'{k}_key': v for k, v in
+                                                  segwit_bip32_.chain_keys(private=False).items()},
+                                               gap_limit=GAP_LIMIT)
+
+    assert chain_hd.is_private and not public_chain_hd.is_private
+    assert chain_hd.addresses() == public_chain_hd.addresses() == segwit_addresses
+    assert chain_hd.wif_keys() == segwit_wif_keys
+
+    with pytest.raises(PublicHDWalletObjectError):
+        public_bip32_.chain_keys()
+
+
+# BIP39 test vectors (entropy, mnemonic)
+BIP39_VECTORS = [
+    ('00000000000000000000000000000000',
+     'abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon about'),
+    ('7f7f7f7f7f7f7f7f7f7f7f7f7f7f7f7f',
+     'legal winner thank year wave sausage worth useful legal winner thank yellow'),
+    ('80808080808080808080808080808080',
+     'letter advice cage absurd amount doctor acoustic avoid letter advice cage above'),
+    ('ffffffffffffffffffffffffffffffff',
+     'zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo wrong'),
+    ('0000000000000000000000000000000000000000000000000000000000000000',
+     'abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon '
+     'abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon art')
+]
+
+
+def test_wordlist():
+    assert len(WORDLIST) == 2048 and WORDLIST.is_valid
+    assert WORDLIST.prefix_matches('zo') == ['zone', 'zoo']
+    assert WORDLIST.prefix_matches('ab', limit=2) == ['abandon', 'ability']
+    assert WORDLIST.prefix_matches('xyz') == []
+
+    for entropy, mnemonic in BIP39_VECTORS:
+        assert WORDLIST.mnemonic_from_entropy(bytes.fromhex(entropy)) == mnemonic
+
+    mnemonics = [m for _, m in BIP39_VECTORS]
+    invalid = [VALID_MNEMONIC.replace('hobby', 'zoo'), 'NOT A MNEMONIC', VALID_MNEMONIC + ' ']
+    assert WORDLIST.validate_many(mnemonics + invalid) == [True] * len(mnemonics) + [False] * len(invalid)
+
+
+def test_precompute():
+    precompute = HDWalletPrecompute()
+
+    assert not precompute.request(VALID_MNEMONIC.replace('hobby', 'zoo'), '0')
+    assert not precompute.request(VALID_MNEMONIC, 'not a path')
+    assert precompute.get(VALID_MNEMONIC, '0') is None
+
+    assert precompute.request(VALID_MNEMONIC, "49'/0'/0'", gap_limit=GAP_LIMIT, multi_processing=False)
+    first_task = precompute._task
+
+    # changing the params cancels the previous build
+    assert precompute.request(VALID_MNEMONIC, '0', segwit=False, gap_limit=GAP_LIMIT, multi_processing=False)
+    assert first_task.cancelled.is_set()
+
+    assert precompute.get(VALID_MNEMONIC, '0', segwit=True, gap_limit=GAP_LIMIT, multi_processing=False) is None
+
+    precompute.request(VALID_MNEMONIC, '0', segwit=False, gap_limit=GAP_LIMIT, multi_processing=False)
+    hd_ = precompute.get(VALID_MNEMONIC, '0', segwit=False, gap_limit=GAP_LIMIT, multi_processing=False)
+
+    # addresses and WIF keys were already derived in the background
+    assert (0, GAP_LIMIT) in hd_._addresses and hd_._precomputed_wif_keys is not None
+    assert hd_.addresses() == normal_addresses
+    assert hd_.wif_keys() == normal_wif_keys
+
+    # the WIF keys are only handed over once, and aren't kept after
+    assert hd_._precomputed_wif_keys is None
+    assert hd_.wif_keys() == normal_wif_keys and hd_._precomputed_wif_keys is None
+
+    # a build is only handed out once
+    assert precompute.get(VALID_MNEMONIC, '0', segwit=False, gap_limit=GAP_LIMIT, multi_processing=False) is None
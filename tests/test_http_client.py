@@ -0,0 +1,159 @@
+# Copyright (C) 2018  Gavin Shaughnessy
+#
+# Bit-Store is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from lib.core.http_client import HTTPClient
+
+
+class StandInServer(ThreadingHTTPServer):
+    """ local http server that responds with the statuses in self.statuses (then 200), and
+    records the connections it was sent requests on, and the most concurrent requests
+    """
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.statuses = []
+        self.delay = 0
+        self.connections = set()
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def url(self, path='/'):
+        return f'http://127.0.0.1:{self.server_address[1]}{path}'
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+
+    # keep-alive
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        with self.server.lock:
+            self.server.connections.add(self.client_address)
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+            status = self.server.statuses.pop(0) if self.server.statuses else 200
+
+        time.sleep(self.server.delay)
+
+        with self.server.lock:
+            self.server.active -= 1
+
+        body = b'{"ok": true}'
+
+        self.send_response(status)
+        if status == 429:
+            self.send_header('Retry-After', '0')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = StandInServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_keep_alive(server):
+    client = HTTPClient(backoff=0)
+
+    for _ in range(5):
+        assert client.get(server.url(), timeout=10).json() == {'ok': True}
+
+    # every request was made on the same connection
+    assert len(server.connections) == 1
+
+    stats = client.stats[f'127.0.0.1:{server.server_address[1]}']
+    assert stats['requests'] == 5 and stats['retries'] == 0 and stats['errors'] == 0
+    assert 0 < stats['latency'] <= stats['max_latency']
+
+    client.close()
+
+
+def test_retries(server):
+    client = HTTPClient(max_retries=3, backoff=0.01)
+    host = f'127.0.0.1:{server.server_address[1]}'
+
+    server.statuses = [503, 429, 500]
+    assert client.get(server.url(), timeout=10).status_code == 200
+    assert client.stats[host]['requests'] == 4 and client.stats[host]['retries'] == 3
+
+    # the last response is returned once retries run out
+    server.statuses = [503] * 4
+    assert client.get(server.url(), timeout=10).status_code == 503
+    assert client.stats[host]['retries'] == 6 and client.stats[host]['errors'] == 7
+
+    # other errors aren't retried
+    server.statuses = [404]
+    assert client.get(server.url(), timeout=10).status_code == 404
+    assert client.stats[host]['retries'] == 6
+
+    # posts may have been acted on even if they failed, so aren't sent again
+    server.statuses = [503]
+    assert client.post(server.url(), data={'tx_hex': '00'}, timeout=10).status_code == 503
+    assert client.stats[host]['requests'] == 10 and client.stats[host]['retries'] == 6
+
+    client.close()
+
+
+def test_connection_errors(server):
+    client = HTTPClient(max_retries=2, backoff=0.01)
+    url = server.url()
+
+    server.shutdown()
+    server.server_close()
+
+    with pytest.raises(requests.ConnectionError):
+        client.get(url, timeout=1)
+
+    assert client.stats[f'127.0.0.1:{server.server_address[1]}']['requests'] == 3
+
+
+def test_concurrency_limit(server):
+    client = HTTPClient(max_connections_per_host=2)
+    server.delay = 0.05
+
+    threads = [threading.Thread(target=client.get, args=(server.url(),), kwargs={'timeout': 10}) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert server.max_active == 2
+    assert len(server.connections) <= 2
+
+    client.close()
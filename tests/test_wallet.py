@@ -0,0 +1,254 @@
+# Copyright (C) 2018  Gavin Shaughnessy
+#
+# Bit-Store is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+import time
+
+import pytest
+
+from lib.core import blockchain, config, data, price, wallet
+from lib.core.hd import HDWallet
+
+
+MNEMONIC = 'lion harvest elbow beauty butter spirit park jungle dose need flock hobby'
+GAP_LIMIT = 5
+
+
+@pytest.fixture
+def btc_wallet(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'WALLET_DATA_DIR', str(tmp_path))
+
+    hd_wallet = HDWallet.from_mnemonic(MNEMONIC, "49'/0'/0'", gap_limit=GAP_LIMIT, multi_processing=False)
+    btc_wallet = wallet.Wallet.new_wallet('test_wallet', 'password', hd_wallet, offline=True)
+
+    yield btc_wallet
+
+    btc_wallet.close()
+
+
+def test_get_wif_keys(btc_wallet, monkeypatch):
+    hd_wallet = HDWallet.from_mnemonic(MNEMONIC, "49'/0'/0'", gap_limit=GAP_LIMIT, multi_processing=False)
+    addresses, wif_keys = hd_wallet.addresses(), hd_wallet.wif_keys()
+
+    # a used address still has its key
+    btc_wallet._set_addresses_used([addresses[0][1]])
+
+    decrypted = []
+    decrypt_many = btc_wallet.data_store.crypto.decrypt_many
+    monkeypatch.setattr(btc_wallet.data_store.crypto, 'decrypt_many',
+                        lambda tokens: decrypted.extend(tokens) or decrypt_many(tokens))
+
+    inputs = [addresses[0][1], addresses[1][3], addresses[0][1]]
+    assert btc_wallet.get_wif_keys('password', inputs) == [wif_keys[0][1], wif_keys[1][3], wif_keys[0][1]]
+    # only the keys of the addresses, once each
+    assert len(decrypted) == 2
+
+    # the keys are kept for the next signing (after the password is validated again)
+    assert btc_wallet.get_wif_keys('password', inputs[:2]) == [wif_keys[0][1], wif_keys[1][3]]
+    assert len(decrypted) == 2
+
+    with pytest.raises(data.IncorrectPasswordError):
+        btc_wallet.get_wif_keys('wrong password', inputs)
+
+    with pytest.raises(ValueError):
+        btc_wallet.get_wif_keys('password', ['1E9emJj63vhNNzVLNDAHHbiTQgdF6dzG83'])
+
+
+def test_wif_key_cache():
+    cache = wallet._WifKeyCache(ttl=0.05)
+    assert cache.get(['a']) == {}
+
+    cache.add({'a': 'wif key a', 'b': 'wif key b'})
+    assert cache.get(['a', 'c']) == {'a': 'wif key a'}
+
+    # wiped once the ttl runs out
+    time.sleep(0.2)
+    assert cache.get(['a', 'b']) == {}
+
+    disabled = wallet._WifKeyCache(ttl=0)
+    disabled.add({'a': 'wif key a'})
+    assert disabled.get(['a']) == {}
+
+
+def test_change_password(btc_wallet):
+    address = btc_wallet.receiving_addresses[0]
+    btc_wallet.get_wif_keys('password', [address])
+    assert btc_wallet._wif_key_cache.get([address])
+
+    with pytest.raises(data.IncorrectPasswordError):
+        btc_wallet.change_password('wrong password', 'new password')
+    assert btc_wallet._wif_key_cache.get([address])
+
+    # the keys decrypted with the old password aren't kept
+    btc_wallet.change_password('password', 'new password')
+    assert btc_wallet._wif_key_cache.get([address]) == {}
+    assert btc_wallet.data_store.validate_password('new password')
+
+
+def test_close(btc_wallet):
+    address = btc_wallet.receiving_addresses[0]
+    btc_wallet.get_wif_keys('password', [address])
+    assert btc_wallet._wif_key_cache.get([address])
+
+    data_store = btc_wallet.data_store
+    btc_wallet.close()
+
+    assert data_store.closed and data_store.file_path not in data.DataStore.open_stores()
+    assert btc_wallet._wif_key_cache.get([address]) == {}
+
+
+def test_shared_data_store(btc_wallet):
+    other_wallet = wallet.get_wallet('test_wallet', 'password', offline=True)
+    assert other_wallet.data_store is btc_wallet.data_store
+
+    with pytest.raises(data.IncorrectPasswordError):
+        wallet.get_wallet('test_wallet', 'wrong password', offline=True)
+
+    # closing one wallet doesn't close the store used by the other
+    other_wallet.close()
+    other_wallet.close()
+    assert not btc_wallet.data_store.closed
+    assert btc_wallet.get_wif_keys('password', btc_wallet.receiving_addresses[:1])
+
+
+def test_updater_sync_cursor(btc_wallet):
+    updater = wallet._ApiDataUpdaterThread(btc_wallet, 10, 60, 60)
+
+    class SyncedApi(blockchain._BlockchainBaseClass):
+        transactions = []
+
+    sync_cursor = {'block_height': 600000, 'n_tx': 0, 'unconfirmed': [], 'addresses': ''}
+
+    updater.blockchain_interface = SyncedApi(btc_wallet.all_addresses, refresh_rate=0, timeout=10)
+    updater.blockchain_interface.sync_cursor = sync_cursor
+
+    api_data = updater._blockchain_data()
+    assert api_data['SYNC_CURSOR'] == sync_cursor and api_data['TXNS'] == []
+    btc_wallet.data_store.write_values(**api_data)
+
+    # nothing is worked out from the transactions until the cursor moves
+    assert updater._blockchain_data() == {}
+
+    updater.blockchain_interface.sync_cursor = {**sync_cursor, 'block_height': 600001}
+    assert updater._blockchain_data()['SYNC_CURSOR']['block_height'] == 600001
+
+
+def test_updater_refresh(btc_wallet):
+    updater = wallet._ApiDataUpdaterThread(btc_wallet, 10, 60, 60)
+    requests_made = []
+
+    class CountingApi(blockchain._BlockchainBaseClass):
+
+        @property
+        @blockchain._BlockchainBaseClass.limit_requests
+        def _blockchain_data(self):
+            requests_made.append(time.time())
+            return []
+
+        @property
+        def transactions(self):
+            return self._blockchain_data
+
+    # the updater's schedule is the only limit on requests, the api's refresh_rate doesn't hold them back
+    updater.blockchain_interface = CountingApi(btc_wallet.all_addresses, refresh_rate=60, timeout=10)
+
+    updater._blockchain_data()
+    updater._blockchain_data()
+    assert len(requests_made) == 2
+
+    # the values of one fetch come from one request
+    updater.blockchain_interface.wallet_balance
+    assert len(requests_made) == 2
+
+    class CountingFeeApi(blockchain._EstimateFeeBaseClass):
+
+        @property
+        @blockchain._EstimateFeeBaseClass.limit_requests
+        def all_priorities(self):
+            requests_made.append(time.time())
+            return [1, 2, 3]
+
+    class CountingPriceApi(price._BitcoinPriceBaseClass):
+        currencies = ['USD']
+
+        @property
+        @price._BitcoinPriceBaseClass.limit_requests
+        def price(self):
+            requests_made.append(time.time())
+            return 50000.0
+
+    # the same goes for the fees and price
+    updater.fees_interface = CountingFeeApi(refresh_rate=60, timeout=10)
+    updater.price_interface = CountingPriceApi('USD', refresh_rate=60, timeout=10)
+
+    assert updater._fee_data() == updater._fee_data() == {'ESTIMATED_FEES': [1, 2, 3]}
+    assert updater._price_data() == updater._price_data() == {'PRICE': 50000.0}
+    assert len(requests_made) == 6
+
+
+def _wait_for(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.01)
+
+    return condition()
+
+
+def test_updater_sources(btc_wallet):
+    address = btc_wallet.receiving_addresses[0]
+    price_released = threading.Event()
+
+    class BlockchainApi(blockchain._BlockchainBaseClass):
+        transactions = [{
+            'txid': 'a' * 64, 'date': '2018-01-01 00:00:00', 'block_height': 600000, 'confirmations': 1,
+            'fee': 1000, 'vsize': 200, 'inputs': [{'value': 6000, 'address': '1E9emJj63vhNNzVLNDAHHbiTQgdF6dzG83', 'n': 0}],
+            'outputs': [{'value': 5000, 'address': address, 'n': 0, 'spent': False, 'script': ''}], 'wallet_amount': 5000
+        }]
+
+    class FeeApi(blockchain._EstimateFeeBaseClass):
+        @property
+        def all_priorities(self):
+            raise blockchain.BlockchainConnectionError
+
+    class PriceApi(price._BitcoinPriceBaseClass):
+        currencies = ['USD']
+
+        @property
+        def price(self):
+            price_released.wait(10)
+            return 50000.0
+
+    updater = wallet._ApiDataUpdaterThread(btc_wallet, 60, 60, 60)
+    updater.blockchain_interface = BlockchainApi(btc_wallet.all_addresses, refresh_rate=0, timeout=10)
+    updater.fees_interface = FeeApi(refresh_rate=0, timeout=10)
+    updater.price_interface = PriceApi('USD', refresh_rate=0, timeout=10)
+
+    updater.start()
+
+    # the balance is written while the price is still being requested, and the fees have failed
+    assert _wait_for(lambda: btc_wallet.wallet_balance == 5000)
+    assert _wait_for(lambda: updater.sources['fees'].status == updater.ApiConnectionStatus.error)
+
+    assert address in btc_wallet.used_addresses
+    assert updater.sources['blockchain'].status == updater.ApiConnectionStatus.good
+    assert updater.sources['price'].status == updater.ApiConnectionStatus.first_attempt
+    assert updater.connection_status == updater.ApiConnectionStatus.error
+
+    price_released.set()
+    assert _wait_for(lambda: btc_wallet.price == 50000.0)
+
+    updater.stop()
+    updater.join(5)
+    assert not updater.is_alive()